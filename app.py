@@ -1,122 +1,249 @@
+from functools import partial
+
 import streamlit as st
-import pdfplumber
-import io
-# Importação dos Mappers específicos
-from services.fatura_mapper import extrair_fatura as extrair_B
-from services.fatura_mapperA import extrair_fatura as extrair_A
-# Importação dos Writers específicos
-from services.excel_writer import preparar_planilha as prep_B, salvar_dados_multiplos as salvar_B
-from services.excel_writterA import preparar_planilha as prep_A, salvar_dados_A as salvar_A
+# Extração paralela (pdfplumber + mappers específicos de cada grupo; o pdfplumber só é
+# importado quando a primeira fatura é lida)
+from services.extracao import AUTO, LEITOR_POR_GRUPO, workers_padrao
+# Saída alternativa para BI/conciliação: faturas por UC e mês em CSV/Parquet, sem openpyxl
+from services.exportacao import MIME, formatos_disponiveis
+from services.leitores_pdf import disponiveis as leitores_disponiveis
+# Tempos por fatura, por aba e da gravação (expander + JSON para análise offline)
+from services.rastreio import Rastreio
+# Processamento em segundo plano: a página só acompanha o progresso e baixa o resultado
+from services.tarefas import (
+    CONCLUIDA, ERRO, PADRAO_ID, congelar_envio, congelar_uploads, processar_balanco, processar_envio_em_massa
+)
+from utils.arquivos import ler_bytes
+# Fila, base e cache de faturas, logo: criados uma vez por servidor, não a cada rerun
+from utils.recursos import obter_base_faturas, obter_cache_faturas, obter_fila_tarefas, obter_logo
+
+st.set_page_config(page_title="Balanço Multi-UC", layout="wide", page_icon=obter_logo())
+
+
+def obter_sessao_incremental():
+    if "incremental" not in st.session_state:
+        # Estado entre reruns: só PDFs novos são lidos e só UCs alteradas são regravadas
+        # (os writers de cada grupo são escolhidos em services.pipeline). Importada só no
+        # primeiro processamento; o openpyxl e os writers, só quando uma planilha é gerada
+        from services.incremental import SessaoIncremental
+        st.session_state["incremental"] = SessaoIncremental(obter_cache_faturas())
+    return st.session_state["incremental"]
 
-st.set_page_config(page_title="Balanço Multi-UC", layout="wide", page_icon="logo3.png")
 
 st.title("Sistema de Balanço Energético")
 st.subheader("Essencial Energia Eficiente")
 
 # --- BARRA LATERAL PARA CONFIGURAÇÃO ---
 with st.sidebar:
-    st.image("logo3.png", use_container_width=True)
+    st.image(obter_logo(), use_container_width=True)
     st.header("⚙️ Configuração")
     
     # 1. Input crucial: Define qual lógica de código o sistema seguirá
     grupo_selecionado = st.radio(
         "Selecione o Grupo Tarifário:", 
-        ["A", "B"], 
-        help="Grupo A: Alta Tensão (Demanda e Postos Tarifários). Grupo B: Baixa Tensão (Consumo Único)."
+        [AUTO, "A", "B"], 
+        format_func=lambda g: "Detectar pela fatura" if g == AUTO else g,
+        help="Grupo A: Alta Tensão (Demanda e Postos Tarifários). Grupo B: Baixa Tensão (Consumo Único). "
+             "Na detecção, cada fatura é lida com o mapper do seu layout e a planilha fica com o "
+             "grupo da maioria; as faturas do outro grupo são listadas no resultado."
     )
+    rotulo_grupo = "(grupo detectado)" if grupo_selecionado == AUTO else f"Grupo {grupo_selecionado}"
     
     st.markdown("---")
     qtd_geradoras = st.number_input("Qtd. de UCs Geradoras", min_value=1, value=1, step=1)
     qtd_beneficiarias = st.number_input("Qtd. de UCs Beneficiárias", min_value=0, value=0, step=1)
+    qtd_processos = st.number_input(
+        "Processos de extração", min_value=1, value=workers_padrao(), step=1,
+        help="Quantidade de PDFs lidos em paralelo. Use 1 para leitura sequencial."
+    )
+    leitores = leitores_disponiveis()
+    leitor_padrao = LEITOR_POR_GRUPO.get(grupo_selecionado)
+    leitor_pdf = st.selectbox(
+        "Leitor de PDF", leitores,
+        index=leitores.index(leitor_padrao) if leitor_padrao in leitores else 0,
+        help="pdfplumber é a referência das regex. Outros leitores são mais rápidos; "
+             "confira com benchmarks/bench_leitores.py se dão o mesmo resultado para o grupo."
+    )
+    completar_base = st.checkbox(
+        "Completar meses sem PDF com faturas já processadas", value=True,
+        help="Toda fatura lida fica guardada na base local. Marcado, os meses dos últimos 12 "
+             "de cada UC que não vieram no envio são preenchidos com as faturas guardadas."
+    )
+    formato_saida = st.radio(
+        "Resultado", ["xlsx", *formatos_disponiveis()],
+        format_func=lambda f: "Planilha de balanço (xlsx)" if f == "xlsx" else f"Tabela de faturas ({f.upper()})",
+        help="A tabela traz uma linha por UC e mês (faturas e histórico), com os postos do Grupo A "
+             "ou a energia ativa do Grupo B. Não usa a planilha modelo e é bem mais rápida."
+    )
 
 # --- 2. UPLOAD DA PLANILHA BASE ---
-st.subheader("1. Planilha Modelo")
-tipo_template = "BALANÇO_A.xlsx" if grupo_selecionado == "A" else "BALANÇO_B.xlsx"
-arquivo_excel = st.file_uploader(f"Envie o arquivo Excel para o Grupo {grupo_selecionado}", type=["xlsx"])
+arquivo_excel = None
+if formato_saida == "xlsx":
+    st.subheader("1. Planilha Modelo")
+    tipo_template = "BALANÇO_A.xlsx" if grupo_selecionado == "A" else "BALANÇO_B.xlsx"
+    arquivo_excel = st.file_uploader(f"Envie o arquivo Excel para o {rotulo_grupo}", type=["xlsx"])
 
-if arquivo_excel:
+if arquivo_excel or formato_saida != "xlsx":
     dados_processamento = []
     
     # --- 3. UPLOAD DAS FATURAS ---
-    st.subheader(f"2. Upload das Faturas (Grupo {grupo_selecionado})")
-    
-    abas_titulos = [f"Geradora {i+1}" for i in range(qtd_geradoras)] + \
-                   [f"Beneficiária {i+1}" for i in range(qtd_beneficiarias)]
-    tabs = st.tabs(abas_titulos)
-    
-    idx_tab = 0
-    # Interface dinâmica para Geradoras
-    for i in range(qtd_geradoras):
-        with tabs[idx_tab]:
-            pdfs = st.file_uploader(f"Faturas - Geradora {i+1}", type=["pdf"], accept_multiple_files=True, key=f"ger_{i}")
-            if pdfs:
-                dados_processamento.append({'tipo': 'geradora', 'indice': i + 1, 'arquivos': pdfs})
-            idx_tab += 1
-
-    # Interface dinâmica para Beneficiárias
-    for i in range(qtd_beneficiarias):
-        with tabs[idx_tab]:
-            pdfs = st.file_uploader(f"Faturas - Beneficiária {i+1}", type=["pdf"], accept_multiple_files=True, key=f"ben_{i}")
-            if pdfs:
-                dados_processamento.append({'tipo': 'beneficiaria', 'indice': i + 1, 'arquivos': pdfs})
-            idx_tab += 1
+    st.subheader(f"2. Upload das Faturas ({rotulo_grupo})")
+    modo_envio = st.radio(
+        "Forma de envio", ["Por UC", "Envio em massa (ZIP)"], horizontal=True,
+        help="No envio em massa, as faturas são agrupadas pelo número da UC e as UCs com "
+             "geração viram geradoras; as quantidades da barra lateral são ignoradas."
+    )
+    envio_em_massa = []
+
+    if modo_envio == "Por UC":
+        abas_titulos = [f"Geradora {i+1}" for i in range(qtd_geradoras)] + \
+                       [f"Beneficiária {i+1}" for i in range(qtd_beneficiarias)]
+        tabs = st.tabs(abas_titulos)
+        
+        idx_tab = 0
+        # Interface dinâmica para Geradoras
+        for i in range(qtd_geradoras):
+            with tabs[idx_tab]:
+                pdfs = st.file_uploader(f"Faturas - Geradora {i+1}", type=["pdf"], accept_multiple_files=True, key=f"ger_{i}")
+                if pdfs:
+                    dados_processamento.append({'tipo': 'geradora', 'indice': i + 1, 'arquivos': pdfs})
+                idx_tab += 1
+
+        # Interface dinâmica para Beneficiárias
+        for i in range(qtd_beneficiarias):
+            with tabs[idx_tab]:
+                pdfs = st.file_uploader(f"Faturas - Beneficiária {i+1}", type=["pdf"], accept_multiple_files=True, key=f"ben_{i}")
+                if pdfs:
+                    dados_processamento.append({'tipo': 'beneficiaria', 'indice': i + 1, 'arquivos': pdfs})
+                idx_tab += 1
+    else:
+        envio_em_massa = st.file_uploader(
+            "ZIPs e/ou PDFs de todas as UCs", type=["zip", "pdf"], accept_multiple_files=True, key="envio_em_massa"
+        ) or []
 
     # --- 4. PROCESSAMENTO ---
     st.markdown("---")
-    if st.button(f"🚀 Processar Balanço Grupo {grupo_selecionado}"):
-        if not dados_processamento:
+    if st.button(f"🚀 Processar Balanço {rotulo_grupo}"):
+        modelo = ler_bytes(arquivo_excel) if arquivo_excel else None
+        if not dados_processamento and not envio_em_massa:
             st.warning("Envie PDFs para pelo menos uma UC.")
+        elif envio_em_massa:
+            id_tarefa = obter_fila_tarefas().submeter(
+                processar_envio_em_massa, obter_sessao_incremental(),
+                congelar_envio(envio_em_massa), grupo_selecionado, modelo,
+                processos=int(qtd_processos), leitor=leitor_pdf, base=obter_base_faturas(), completar=completar_base,
+                formato=formato_saida,
+                descricao=f"{rotulo_grupo} · envio em massa ({len(envio_em_massa)} arquivos) · {leitor_pdf} · {formato_saida}"
+            )
         else:
-            progresso = st.progress(0)
-            status = st.empty()
-            lista_dados_finais = []
-            
-            # ESCOLHA DO MAPPER (LÓGICA DE LEITURA)
-            mapper_func = extrair_A if grupo_selecionado == "A" else extrair_B
-            
-            # Fase 1: Extração
-            for idx, item in enumerate(dados_processamento):
-                status.text(f"Lendo faturas da {item['tipo']} {item['indice']}...")
-                faturas_extraidas = []
-                
-                for pdf_file in item['arquivos']:
-                    with pdfplumber.open(pdf_file) as pdf:
-                        texto = "".join([p.extract_text() or "" for p in pdf.pages])
-                    
-                    # Chama o mapper correto baseado na seleção do radio button
-                    faturas_extraidas.append(mapper_func(texto))
-                
-                lista_dados_finais.append({
-                    'tipo': item['tipo'],
-                    'indice': item['indice'],
-                    'dados': faturas_extraidas
-                })
-                progresso.progress((idx + 1) / (len(dados_processamento) + 1))
-
-            # Fase 2: Escrita no Excel (LÓGICA DE GRAVAÇÃO)
-            status.text("Gravando dados no Excel...")
-            try:
-                if grupo_selecionado == "A":
-                    # Usa o Writer exclusivo para Alta Tensão (Colunas B, C, D, L, M, N)
-                    wb = prep_A(arquivo_excel, qtd_geradoras, qtd_beneficiarias)
-                    wb_final = salvar_A(wb, lista_dados_finais)
-                else:
-                    # Usa o Writer original para Baixa Tensão (Consumo Único)
-                    wb = prep_B(arquivo_excel, qtd_geradoras, qtd_beneficiarias)
-                    wb_final = salvar_B(wb, lista_dados_finais)
-                
-                # Download em memória
-                output = io.BytesIO()
-                wb_final.save(output)
-                
-                progresso.progress(1.0)
-                status.success(f"Planilha Grupo {grupo_selecionado} concluída!")
-                
-                st.download_button(
-                    label="📥 Baixar Resultado Final",
-                    data=output.getvalue(),
-                    file_name=f"BALANCO_COMPENSAÇÃO_GRUPO_{grupo_selecionado}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            except Exception as e:
-                st.error(f"Erro no processamento do Excel: {e}")
\ No newline at end of file
+            # Grupo A: writer de Alta Tensão (Colunas B, C, D, L, M, N)
+            # Grupo B: writer original de Baixa Tensão (Consumo Único)
+            total_pdfs = sum(len(item['arquivos']) for item in dados_processamento)
+            id_tarefa = obter_fila_tarefas().submeter(
+                processar_balanco, obter_sessao_incremental(), congelar_uploads(dados_processamento),
+                grupo_selecionado, modelo, int(qtd_geradoras), int(qtd_beneficiarias),
+                processos=int(qtd_processos), leitor=leitor_pdf, base=obter_base_faturas(), completar=completar_base,
+                formato=formato_saida,
+                descricao=f"{rotulo_grupo} · {total_pdfs} PDFs · {leitor_pdf} · {formato_saida}"
+            )
+        if dados_processamento or envio_em_massa:
+            st.session_state.setdefault("tarefas", []).append(id_tarefa)
+            # O id vai para a URL: depois de um refresh a página volta a acompanhar a tarefa
+            st.query_params["tarefas"] = ",".join(st.session_state["tarefas"])
+
+
+def mostrar_tempos(rastreio, chave):
+    with st.expander("⏱️ Tempos do processamento"):
+        st.dataframe(rastreio.resumo(), use_container_width=True)
+        lentas = rastreio.mais_lentos('fatura')
+        if lentas:
+            st.markdown("**Faturas mais lentas**")
+            st.dataframe(lentas, use_container_width=True)
+        abas = rastreio.mais_lentos('escrita_aba')
+        if abas:
+            st.markdown("**Abas mais lentas**")
+            st.dataframe(abas, use_container_width=True)
+        st.download_button(
+            label="Exportar tempos (JSON)",
+            data=rastreio.para_json(),
+            file_name=f"tempos_balanco_{chave}.json",
+            mime="application/json",
+            key=f"tempos_{chave}"
+        )
+
+
+def mostrar_tarefa(fila, status):
+    st.markdown(f"**{status['descricao']}**")
+    if status['estado'] == ERRO:
+        st.error(f"Erro no processamento: {status['mensagem']}")
+        return
+    if status['estado'] != CONCLUIDA:
+        st.progress(status['progresso'], text=status['mensagem'])
+        return
+
+    info = status['detalhes']['info']
+    grupo = status['detalhes']['rastreio']['contexto'].get('grupo', '')
+    extensao = status['detalhes'].get('extensao', 'xlsx')
+    if info['modo'] == 'exportacao':
+        st.success(f"Tabela de faturas Grupo {grupo} concluída: {info['linhas']} linhas (UC x mês).")
+    else:
+        st.success(f"Planilha Grupo {grupo} concluída!")
+    st.caption(f"Faturas já lidas nesta sessão: {info['lidas_na_sessao']} de {info['pdfs']}")
+    if info.get('da_base'):
+        st.caption(f"Meses sem PDF preenchidos com a base de faturas: {info['da_base']}")
+    if info['modo'] == 'reaproveitada':
+        st.caption("Nenhuma fatura mudou desde o último processamento: planilha reaproveitada.")
+    elif info['modo'] == 'incremental':
+        st.caption(f"Regravadas {info['ucs_regravadas']} de {info['total_ucs']} UCs (as demais não mudaram).")
+    elif info['modo'] == 'streaming':
+        st.caption(f"{info['total_ucs']} UCs gravadas aba por aba direto em arquivo (memória constante).")
+
+    if status['detalhes'].get('ucs'):
+        with st.expander(f"UCs identificadas no envio ({len(status['detalhes']['ucs'])})"):
+            st.dataframe(
+                [{k: v for k, v in uc.items() if k != 'arquivos'} for uc in status['detalhes']['ucs']],
+                use_container_width=True
+            )
+    if status['detalhes'].get('ignorados'):
+        st.warning("Arquivos sem número de UC reconhecido (ignorados): " + ", ".join(status['detalhes']['ignorados']))
+    if status['detalhes'].get('outro_grupo'):
+        st.warning(f"Faturas fora da planilha do Grupo {grupo} (envie com o modelo do grupo delas): "
+                   + ", ".join(status['detalhes']['outro_grupo']))
+
+    if fila.tem_resultado(status['id']):
+        # O resultado só é lido do disco quando o botão é clicado, não a cada rerun da página
+        st.download_button(
+            label="📥 Baixar Resultado Final",
+            data=partial(fila.resultado, status['id']),
+            file_name=(f"BALANCO_COMPENSAÇÃO_GRUPO_{grupo}.xlsx" if extensao == "xlsx"
+                       else f"FATURAS_GRUPO_{grupo}.{extensao}"),
+            mime=MIME.get(extensao, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+            key=f"xlsx_{status['id']}"
+        )
+    mostrar_tempos(Rastreio.de_dict(status['detalhes']['rastreio']), status['id'])
+
+
+# --- 5. ACOMPANHAMENTO DOS PROCESSAMENTOS ---
+if "tarefas" not in st.session_state:
+    # A URL pode ter sido editada: só ids no formato de tarefa
+    st.session_state["tarefas"] = [t for t in st.query_params.get("tarefas", "").split(",") if PADRAO_ID.fullmatch(t)]
+
+fila = obter_fila_tarefas()
+tarefas = [s for s in (fila.status(t) for t in reversed(st.session_state["tarefas"])) if s]
+em_andamento = any(s['estado'] not in (CONCLUIDA, ERRO) for s in tarefas)
+
+
+@st.fragment(run_every=1.5 if em_andamento else None)
+def painel_tarefas():
+    atuais = [s for s in (fila.status(t['id']) for t in tarefas) if s]
+    for status in atuais:
+        with st.container(border=True):
+            mostrar_tarefa(fila, status)
+    if em_andamento and all(s['estado'] in (CONCLUIDA, ERRO) for s in atuais):
+        st.rerun()  # tudo terminou: recarrega a página inteira e para de consultar
+
+
+if tarefas:
+    st.markdown("---")
+    st.subheader("Processamentos")
+    painel_tarefas()
@@ -0,0 +1,117 @@
+"""
+Custo de subida e de rerun do app.py.
+
+- importação: num interpretador novo (python -X importtime), o tempo dos módulos que o
+  app.py importa no topo e quais dependências pesadas (openpyxl, pandas, pdfplumber)
+  eles carregam; para comparação, os módulos do processamento (planilha e exportação),
+  que o app só importa quando o usuário clica em processar;
+- reruns: o app.py rodado pelo AppTest do Streamlit, a primeira execução (fria) e a
+  mediana dos reruns alternando o Grupo Tarifário na barra lateral, como um usuário.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_app
+    python -m benchmarks.bench_app --reruns 50 --json app.json
+"""
+import argparse
+import ast
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app.py")
+PESADOS = ("openpyxl", "pandas", "numpy", "pdfplumber", "pyarrow")
+# Importados só ao processar (planilha, lote; a exportação tabular importa o pandas)
+PROCESSAMENTO = ("services.incremental", "services.pipeline", "services.lote", "pandas")
+
+
+def modulos_do_app(caminho=APP) -> list:
+    """Módulos importados no nível do script (os imports dentro de funções ficam de fora)."""
+    with open(caminho, encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos += [alias.name for alias in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+
+def medir_importacao(modulos) -> dict:
+    """{'segundos', 'pesados'} da importação de `modulos` num interpretador novo."""
+    codigo = (f"import sys\nfor m in {modulos!r}: __import__(m)\n"
+              f"print(','.join(p for p in {PESADOS!r} if p in sys.modules))")
+    saida = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=RAIZ,
+                           capture_output=True, text=True, check=True)
+    # Linhas "import time: próprio | acumulado | módulo"; o acumulado de nível 0 soma tudo
+    total = 0
+    for linha in saida.stderr.splitlines():
+        partes = linha.split("|")
+        if linha.startswith("import time:") and len(partes) == 3 and not partes[2].startswith("  "):
+            if partes[1].strip().isdigit():
+                total += int(partes[1])
+    return {'segundos': round(total / 1e6, 4), 'pesados': [p for p in saida.stdout.strip().split(",") if p]}
+
+
+def medir_reruns(reruns) -> dict:
+    """Primeira execução e mediana dos reruns do app.py no AppTest (este processo)."""
+    from streamlit.testing.v1 import AppTest
+
+    logging.disable(logging.WARNING)
+    app = AppTest.from_file(APP, default_timeout=60)
+    inicio = time.perf_counter()
+    app.run()
+    primeira = time.perf_counter() - inicio
+    tempos = []
+    for i in range(reruns):
+        app.sidebar.radio[0].set_value(["A", "B"][i % 2])
+        inicio = time.perf_counter()
+        app.run()
+        tempos.append(time.perf_counter() - inicio)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return {'primeira_s': round(primeira, 4), 'rerun_mediana_ms': round(statistics.median(tempos) * 1000, 2),
+            'rerun_max_ms': round(max(tempos) * 1000, 2), 'pesados': [p for p in PESADOS if p in sys.modules]}
+
+
+def executar(reruns=20) -> dict:
+    modulos = modulos_do_app()
+    with tempfile.TemporaryDirectory() as pasta:
+        # Fila de tarefas descartável: o benchmark não mexe nos resultados do servidor
+        os.environ.setdefault("BALANCO_TAREFAS_DIR", pasta)
+        return {
+            'modulos_app': modulos,
+            'importacao_app': medir_importacao(modulos),
+            'importacao_processamento': medir_importacao(list(PROCESSAMENTO)),
+            'reruns': medir_reruns(reruns),
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Subida e reruns do app.py")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--json", default=None, help="grava o resultado neste arquivo")
+    args = parser.parse_args(argv)
+
+    r = executar(args.reruns)
+    for chave, rotulo in (('importacao_app', "Importação do app"), ('importacao_processamento', "Processamento")):
+        m = r[chave]
+        print(f"{rotulo:<20}{m['segundos']:>8.3f} s   pesados: {', '.join(m['pesados']) or '-'}")
+    m = r['reruns']
+    print(f"Primeira execução  {m['primeira_s']:>8.3f} s   pesados: {', '.join(m['pesados']) or '-'}")
+    print(f"Rerun (mediana)    {m['rerun_mediana_ms']:>8.1f} ms  (máx. {m['rerun_max_ms']:.1f} ms, {args.reruns} reruns)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
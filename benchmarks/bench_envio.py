@@ -0,0 +1,106 @@
+"""
+Memória da extração de um envio em massa (um ZIP por UC): PDFs descompactados para a
+memória da tarefa (como o app fazia) x gravados em disco numa PastaEnvio
+(services.ingestao), com cada PDF mapeado em memória (mmap) só quando é lido.
+
+Os ZIPs (BytesIO, como os UploadedFile do Streamlit) já existem antes da medição;
+mede-se com tracemalloc o pico de memória alocada de congelamento + leitura do envio +
+extração, para tamanhos de lote crescentes: em memória o pico cresce com o lote, em
+disco fica plano. Os PDFs sintéticos levam uma página de anexo (`--anexo-kb`) para
+terem o peso de uma fatura real. Confere também se os dois modos extraem o mesmo.
+
+Uso (na raiz do projeto; requer reportlab):
+    python -m benchmarks.bench_envio --pdfs 24 96
+    python -m benchmarks.bench_envio --pdfs 48 --anexo-kb 800 --processos 4 --json envio.json
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+import zipfile
+
+from benchmarks.sintetico import gerar_lote, gerar_pdf
+from services.extracao import extrair_lote
+from services.ingestao import ler_envio
+from services.tarefas import congelar_envio
+
+MODOS = {
+    'memoria': ler_envio,
+    'disco': lambda arquivos: ler_envio(congelar_envio(arquivos)),
+}
+
+
+def gerar_zips(quantidade, anexo_kb, semente=42) -> list:
+    """ZIPs (um por UC, 12 meses cada) somando `quantidade` PDFs distintos."""
+    ucs = max(1, -(-quantidade // 12))
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=ucs - 1, meses=12, semente=semente)
+    zips, restantes = [], quantidade
+    for item in lote:
+        if restantes <= 0:
+            break
+        upload = io.BytesIO()
+        with zipfile.ZipFile(upload, "w", zipfile.ZIP_DEFLATED) as zf:
+            for mes, texto in enumerate(item['textos'][:restantes]):
+                zf.writestr(f"{mes + 1:02d}.pdf", gerar_pdf(texto, anexo_kb=anexo_kb))
+        restantes -= len(item['textos'][:restantes])
+        upload.name = f"{item['tipo']}_{item['indice']}.zip"
+        zips.append(upload)
+    return zips
+
+
+def medir(ler, zips, processos) -> tuple:
+    """(faturas extraídas, segundos, pico de memória alocada em bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        pdfs = ler(zips)
+        (lido,) = extrair_lote([{'tipo': 'envio', 'indice': 1, 'arquivos': pdfs}], "B", max_workers=processos)
+        duracao = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return lido['dados'], duracao, pico
+
+
+def executar(tamanhos, anexo_kb=300, processos=1) -> dict:
+    resultados = []
+    for quantidade in tamanhos:
+        zips = gerar_zips(quantidade, anexo_kb)
+        linha = {'pdfs': quantidade, 'mb_enviados': round(sum(len(z.getvalue()) for z in zips) / 2**20, 2)}
+        extraidos = {}
+        for modo, ler in MODOS.items():
+            extraidos[modo], duracao, pico = medir(ler, zips, processos)
+            linha[modo] = {'segundos': round(duracao, 3), 'pico_mb': round(pico / 2**20, 2)}
+        linha['identicas'] = extraidos['memoria'] == extraidos['disco']
+        resultados.append(linha)
+    return {'anexo_kb': anexo_kb, 'processos': processos, 'lotes': resultados}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Extração de um envio em massa: PDFs em memória x em disco (mmap)")
+    parser.add_argument("--pdfs", type=int, nargs="+", default=[24, 96], help="tamanhos de lote")
+    parser.add_argument("--anexo-kb", type=int, default=300)
+    parser.add_argument("--processos", type=int, default=1,
+                        help="1 mede o pdfplumber no próprio processo; com mais, só o processo principal")
+    parser.add_argument("--json", default=None, help="grava o resultado neste arquivo")
+    args = parser.parse_args(argv)
+
+    r = executar(args.pdfs, args.anexo_kb, args.processos)
+    print(f"{'PDFs':>6}{'MB':>8}{'memória MB':>13}{'disco MB':>11}{'memória s':>12}{'disco s':>10}  iguais")
+    for linha in r['lotes']:
+        print(f"{linha['pdfs']:>6}{linha['mb_enviados']:>8.1f}{linha['memoria']['pico_mb']:>13.2f}"
+              f"{linha['disco']['pico_mb']:>11.2f}{linha['memoria']['segundos']:>12.2f}"
+              f"{linha['disco']['segundos']:>10.2f}  {linha['identicas']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, ensure_ascii=False, indent=2)
+    return 0 if all(linha['identicas'] for linha in r['lotes']) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
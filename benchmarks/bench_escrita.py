@@ -0,0 +1,119 @@
+"""
+Escrita das faturas no workbook: gravação célula a célula (como os writers faziam, com
+`ws["B5"] = ...` e a busca do intervalo mesclado a cada escrita) x plano de escrita
+aplicado de uma vez (services.plano_escrita).
+
+O plano é montado uma vez pelos writers do grupo e aplicado pelos dois caminhos sobre
+cópias do mesmo workbook preparado; confere se as planilhas ficam iguais.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_escrita --grupo B --beneficiarias 100
+    python -m benchmarks.bench_escrita --grupo A --plano plano_A.json   # exporta o plano (dry-run)
+"""
+import argparse
+import json
+import sys
+import time
+
+from openpyxl.cell.cell import MergedCell
+from openpyxl.utils.cell import get_column_letter
+
+from benchmarks.sintetico import gerar_lote, modelo_sintetico_A
+from services.excel_writer import planejar_resumo as resumo_B, planejar_uc as uc_B
+from services.excel_writterA import aba_geral, planejar_resumo as resumo_A, planejar_uc as uc_A
+from services.modelo_planilha import preparar_planilha
+from services.plano_escrita import PlanoEscrita, aplicar, diferencas
+
+MODELO_B = "BALANÇO_FINAL.xlsx"
+
+
+def escrever_direto(wb, plano):
+    """Caminho antigo: cada escrita por coordenada; célula mesclada procura o intervalo."""
+    for escrita in plano:
+        ws = wb[escrita.aba]
+        coord = f"{get_column_letter(escrita.coluna)}{escrita.linha}"
+        cell = ws[coord]
+        if isinstance(cell, MergedCell):
+            for rng in ws.merged_cells.ranges:
+                if coord in rng:
+                    ws[rng.start_cell.coordinate].value = escrita.valor
+                    break
+        else:
+            cell.value = escrita.valor
+
+
+def montar_plano(grupo, wb, dados) -> PlanoEscrita:
+    plano = PlanoEscrita()
+    if grupo == "A":
+        geral = aba_geral(wb)
+        for item in dados:
+            uc_A(wb, item, plano, geral)
+        resumo_A(wb, dados, plano)
+    else:
+        for item in dados:
+            uc_B(wb, item, plano)
+        resumo_B(wb, dados, plano)
+    return plano
+
+
+def _valores(wb):
+    return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb}
+
+
+def executar(grupo, qtd_geradoras, qtd_beneficiarias, meses, modelo=None, repeticoes=3, semente=42) -> dict:
+    modelo = modelo or (modelo_sintetico_A() if grupo == "A" else MODELO_B)
+    lote = gerar_lote(grupo, qtd_geradoras, qtd_beneficiarias, meses, semente=semente)
+    dados = [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote]
+
+    wb = preparar_planilha(modelo, qtd_geradoras, qtd_beneficiarias)
+    inicio = time.perf_counter()
+    plano = montar_plano(grupo, wb, dados)
+    planejamento = time.perf_counter() - inicio
+    mudancas = len(diferencas(wb, plano))
+
+    tempos, valores = {}, {}
+    for nome, aplicador in (('direto', escrever_direto), ('plano', aplicar)):
+        melhor = None
+        for _ in range(repeticoes):
+            wb = preparar_planilha(modelo, qtd_geradoras, qtd_beneficiarias)
+            inicio = time.perf_counter()
+            aplicador(wb, plano)
+            duracao = time.perf_counter() - inicio
+            melhor = duracao if melhor is None else min(melhor, duracao)
+        tempos[nome] = round(melhor, 4)
+        valores[nome] = _valores(wb)
+
+    return {
+        'grupo': grupo, 'ucs': qtd_geradoras + qtd_beneficiarias, 'escritas': len(plano),
+        'celulas_alteradas': mudancas, 'planejamento_s': round(planejamento, 4),
+        'aplicacao_s': tempos, 'ganho': round(tempos['direto'] / tempos['plano'], 2) if tempos['plano'] else None,
+        'identicas': valores['direto'] == valores['plano'], 'plano': plano.registros(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Escrita no workbook: célula a célula x plano de escrita")
+    parser.add_argument("--grupo", choices=["A", "B"], default="B")
+    parser.add_argument("--geradoras", type=int, default=1)
+    parser.add_argument("--beneficiarias", type=int, default=50)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--modelo", default=None, help="planilha modelo (padrão: BALANÇO_FINAL.xlsx / sintético A)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--plano", default=None, help="grava o plano de escrita (JSON) neste arquivo")
+    args = parser.parse_args(argv)
+
+    r = executar(args.grupo, args.geradoras, args.beneficiarias, args.meses, args.modelo, args.repeticoes)
+    print(f"Grupo {r['grupo']}: {r['ucs']} UCs, {r['escritas']} escritas planejadas em {r['planejamento_s']:.3f} s "
+          f"({r['celulas_alteradas']} células mudam; mesmas planilhas: {r['identicas']})")
+    for nome, segundos in r['aplicacao_s'].items():
+        print(f"{nome:<10}{segundos:>9.4f} s")
+    print(f"Ganho do plano: {r['ganho']}x")
+
+    if args.plano:
+        with open(args.plano, "w", encoding="utf-8") as f:
+            json.dump(r['plano'], f, ensure_ascii=False, indent=1, default=str)
+    return 0 if r['identicas'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
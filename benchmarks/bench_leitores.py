@@ -0,0 +1,115 @@
+"""
+Benchmark dos leitores de PDF (services.leitores_pdf): velocidade e fidelidade.
+
+Para cada leitor, extrai o texto completo de cada PDF do corpus, mede segundos por
+página e confere se o `extrair_fatura` do grupo devolve exatamente o mesmo dicionário
+que com o leitor de referência (pdfplumber). Um leitor só deve virar padrão de um grupo
+(LEITOR_POR_GRUPO / BALANCO_LEITOR_PDF_<grupo>) com 100% de dicionários idênticos.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_leitores --grupo B --pasta faturas/
+    python -m benchmarks.bench_leitores --grupo A --sinteticos 20 --paginas-extras 2   # requer reportlab
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from services import leitores_pdf
+from services.extracao import MAPPERS
+
+
+def carregar_pasta(pasta) -> list:
+    pdfs = []
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in sorted(arquivos):
+            if nome.lower().endswith(".pdf"):
+                with open(os.path.join(raiz, nome), "rb") as f:
+                    pdfs.append((os.path.relpath(os.path.join(raiz, nome), pasta), f.read()))
+    return pdfs
+
+
+def carregar_sinteticos(grupo, quantidade, paginas_extras) -> list:
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    lote = gerar_lote(grupo, qtd_geradoras=1, qtd_beneficiarias=max(0, quantidade // 12), meses=12)
+    textos = [t for item in lote for t in item['textos']][:quantidade]
+    return [(f"sintetico_{i + 1}.pdf", gerar_pdf(t, paginas_extras)) for i, t in enumerate(textos)]
+
+
+def executar(grupo, pdfs, leitores) -> dict:
+    mapper = MAPPERS[grupo]
+    referencia = {}
+    resultados = {}
+    for leitor in [leitores_pdf.PADRAO] + [l for l in leitores if l != leitores_pdf.PADRAO]:
+        segundos = paginas = identicos = falhas = 0
+        divergencias = Counter()
+        exemplos = []
+        for nome, conteudo in pdfs:
+            try:
+                inicio = time.perf_counter()
+                textos = list(leitores_pdf.paginas(conteudo, leitor))
+                segundos += time.perf_counter() - inicio
+                paginas += len(textos)
+                dados = mapper("".join(textos))
+            except Exception as e:
+                falhas += 1
+                exemplos.append({'arquivo': nome, 'erro': f"{type(e).__name__}: {e}"})
+                continue
+            if leitor == leitores_pdf.PADRAO:
+                referencia[nome] = dados
+            ref = referencia.get(nome)
+            if dados == ref:
+                identicos += 1
+            else:
+                campos = sorted(k for k in set(dados) | set(ref or {}) if dados.get(k) != (ref or {}).get(k))
+                divergencias.update(campos)
+                if len(exemplos) < 5:
+                    exemplos.append({'arquivo': nome, 'campos': campos})
+        resultados[leitor] = {
+            'pdfs': len(pdfs), 'paginas': paginas, 'segundos': round(segundos, 4),
+            's_por_pagina': round(segundos / paginas, 5) if paginas else None,
+            'identicos': identicos, 'falhas': falhas,
+            'campos_divergentes': dict(divergencias.most_common()), 'exemplos': exemplos,
+        }
+    return resultados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Velocidade e fidelidade dos leitores de PDF")
+    parser.add_argument("--grupo", choices=sorted(MAPPERS), required=True)
+    corpus = parser.add_mutually_exclusive_group(required=True)
+    corpus.add_argument("--pasta", help="pasta com PDFs reais (busca recursiva)")
+    corpus.add_argument("--sinteticos", type=int, help="quantidade de faturas sintéticas")
+    parser.add_argument("--paginas-extras", type=int, default=0, help="páginas de verso nos sintéticos")
+    parser.add_argument("--leitores", nargs="+", default=None, help="padrão: todos os instalados")
+    parser.add_argument("--json", default=None, help="grava o resultado neste arquivo")
+    args = parser.parse_args(argv)
+
+    pdfs = carregar_pasta(args.pasta) if args.pasta else \
+        carregar_sinteticos(args.grupo, args.sinteticos, args.paginas_extras)
+    if not pdfs:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 1
+    leitores = args.leitores or leitores_pdf.disponiveis()
+    resultados = executar(args.grupo, pdfs, leitores)
+
+    print(f"Grupo {args.grupo}: {len(pdfs)} PDFs (referência: {leitores_pdf.PADRAO})")
+    print(f"{'leitor':<12}{'páginas':>9}{'s/página':>11}{'ganho':>8}{'idênticos':>12}{'falhas':>8}")
+    base = resultados[leitores_pdf.PADRAO]['s_por_pagina']
+    for leitor, r in resultados.items():
+        ganho = f"{base / r['s_por_pagina']:.1f}x" if base and r['s_por_pagina'] else "-"
+        print(f"{leitor:<12}{r['paginas']:>9}{r['s_por_pagina'] or 0:>11.4f}{ganho:>8}"
+              f"{r['identicos']:>7}/{r['pdfs']:<4}{r['falhas']:>8}")
+        if r['campos_divergentes']:
+            print(f"{'':<12}campos divergentes: {r['campos_divergentes']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'grupo': args.grupo, 'leitores': resultados}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Microbenchmark do parse por fatura: mappers atuais x cópia congelada anterior.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_mappers [--repeticoes 2000] [--arquivo texto.txt ...]
+"""
+import argparse
+import timeit
+
+from services import fatura_mapper, fatura_mapperA
+from benchmarks import legado_fatura_mapper, legado_fatura_mapperA
+
+# Campos extraídos só pelos mappers atuais (fora da comparação com a cópia congelada)
+CAMPOS_NOVOS = ("titular",)
+
+PARES = {
+    "B": (legado_fatura_mapper.extrair_fatura, fatura_mapper.extrair_fatura),
+    "A": (legado_fatura_mapperA.extrair_fatura, fatura_mapperA.extrair_fatura),
+}
+
+
+def medir(func, texto, repeticoes) -> float:
+    """Melhor tempo médio por fatura (µs) em 5 rodadas."""
+    rodadas = timeit.repeat(lambda: func(texto), number=repeticoes, repeat=5)
+    return min(rodadas) / repeticoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--arquivo", nargs="+", default=["texto.txt"])
+    args = parser.parse_args()
+
+    print(f"{'arquivo':<24}{'grupo':<7}{'legado (µs)':>13}{'atual (µs)':>13}{'ganho':>8}  iguais")
+    for caminho in args.arquivo:
+        with open(caminho, "r", encoding="utf-8") as f:
+            texto = f.read()
+        for nome_grupo, (legado, atual) in PARES.items():
+            t_legado = medir(legado, texto, args.repeticoes)
+            t_atual = medir(atual, texto, args.repeticoes)
+            novos = {campo: valor for campo, valor in atual(texto).items() if campo not in CAMPOS_NOVOS}
+            iguais = legado(texto) == novos
+            print(f"{caminho:<24}{nome_grupo:<7}{t_legado:>13.1f}{t_atual:>13.1f}"
+                  f"{t_legado / t_atual:>7.2f}x  {iguais}")
+
+
+if __name__ == "__main__":
+    main()
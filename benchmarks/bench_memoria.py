@@ -0,0 +1,90 @@
+"""
+Memória ocupada por faturas extraídas: dicionários dos mappers x registros compactos
+(services.registros), com o custo de converter de um para o outro.
+
+As faturas são textos sintéticos passados pelo mapper do grupo, como no app. Mede com
+tracemalloc a memória retida por N faturas em cada formato.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_memoria --grupo B --faturas 20000
+    python -m benchmarks.bench_memoria --grupo A --faturas 5000 --json memoria_A.json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.sintetico import gerar_lote
+from services.extracao import MAPPERS
+from services.registros import compactar, expandir
+
+
+def faturas_sinteticas(grupo, quantidade) -> list:
+    # 12 meses por UC; o mapper roda uma vez por texto distinto e as cópias seguintes
+    # são dicionários novos (como faturas diferentes seriam)
+    lote = gerar_lote(grupo, qtd_geradoras=1, qtd_beneficiarias=min(49, quantidade // 12), meses=12)
+    modelos = [MAPPERS[grupo](texto) for item in lote for texto in item['textos']]
+    return [json.loads(json.dumps(modelos[i % len(modelos)])) for i in range(quantidade)]
+
+
+def memoria_retida(construir) -> tuple:
+    """(objeto construído, bytes alocados e ainda vivos ao final)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        objeto = construir()
+        atual, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return objeto, atual
+
+
+def executar(grupo, quantidade) -> dict:
+    textos_json = [json.dumps(d) for d in faturas_sinteticas(grupo, quantidade)]
+    dicionarios, bytes_dict = memoria_retida(lambda: [json.loads(t) for t in textos_json])
+    registros, bytes_registro = memoria_retida(lambda: [compactar(json.loads(t)) for t in textos_json])
+
+    inicio = time.perf_counter()
+    compactados = [compactar(d) for d in dicionarios]
+    compactar_s = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    expandidos = [expandir(r) for r in compactados]
+    expandir_s = time.perf_counter() - inicio
+
+    return {
+        'grupo': grupo, 'faturas': quantidade,
+        'compactadas': sum(1 for r in registros if not isinstance(r, dict)),
+        'identicas': expandidos == dicionarios,
+        'bytes_dict': bytes_dict, 'bytes_registro': bytes_registro,
+        'bytes_por_fatura_dict': round(bytes_dict / quantidade),
+        'bytes_por_fatura_registro': round(bytes_registro / quantidade),
+        'reducao': round(1 - bytes_registro / bytes_dict, 4),
+        'compactar_us': round(compactar_s / quantidade * 1e6, 2),
+        'expandir_us': round(expandir_s / quantidade * 1e6, 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memória: dicionários x registros compactos")
+    parser.add_argument("--grupo", choices=["A", "B"], default="B")
+    parser.add_argument("--faturas", type=int, default=10000)
+    parser.add_argument("--json", default=None, help="grava o resultado neste arquivo")
+    args = parser.parse_args(argv)
+
+    r = executar(args.grupo, args.faturas)
+    print(f"Grupo {r['grupo']}: {r['faturas']} faturas ({r['compactadas']} compactadas, idênticas ao expandir: {r['identicas']})")
+    print(f"{'formato':<12}{'MB':>10}{'bytes/fatura':>15}")
+    print(f"{'dict':<12}{r['bytes_dict'] / 2**20:>10.2f}{r['bytes_por_fatura_dict']:>15}")
+    print(f"{'registro':<12}{r['bytes_registro'] / 2**20:>10.2f}{r['bytes_por_fatura_registro']:>15}")
+    print(f"Redução: {r['reducao']:.1%} | compactar {r['compactar_us']} µs/fatura | expandir {r['expandir_us']} µs/fatura")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, ensure_ascii=False, indent=2)
+    return 0 if r['identicas'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
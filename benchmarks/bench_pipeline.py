@@ -0,0 +1,125 @@
+"""
+Benchmark do pipeline completo com faturas sintéticas: parse, preparação do modelo,
+escrita e gravação medidos separadamente (tempo, vazão e pico de memória).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_pipeline --grupo B --geradoras 2 --beneficiarias 30 --meses 12
+    python -m benchmarks.bench_pipeline --grupo A --pdf          # inclui extração de PDF (reportlab)
+    python -m benchmarks.bench_pipeline --pdf --paginas-extras 3 # PDFs com verso/anexos
+    python -m benchmarks.bench_pipeline --json atual.json --comparar base.json --tolerancia 0.25
+
+Com --comparar, sai com código 1 se alguma etapa ficar mais lenta que a referência
+além da tolerância (para pegar regressões em CI ou antes de um merge).
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.sintetico import gerar_lote, gerar_pdf, modelo_sintetico_A
+from services.extracao import MAPPERS, ler_ate_completar
+from services.modelo_planilha import preparar_planilha, salvar_planilha
+from services.pipeline import WRITERS
+
+MODELO_B = "BALANÇO_FINAL.xlsx"
+
+
+def medir(nome, func, itens, resultados):
+    """Executa `func()` medindo tempo e pico de memória alocada (tracemalloc)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    retorno = func()
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resultados[nome] = {
+        "segundos": round(duracao, 4),
+        "itens": itens,
+        "itens_por_segundo": round(itens / duracao, 1) if duracao else None,
+        "pico_mb": round(pico / 1024 / 1024, 2),
+    }
+    return retorno
+
+
+def executar(grupo, qtd_geradoras, qtd_beneficiarias, meses, com_pdf, modelo, semente, paginas_extras=0) -> dict:
+    lote = gerar_lote(grupo, qtd_geradoras, qtd_beneficiarias, meses, semente=semente)
+    total_faturas = sum(len(item['textos']) for item in lote)
+    mapper = MAPPERS[grupo]
+    _, salvar = WRITERS[grupo]
+    modelo = modelo or (modelo_sintetico_A() if grupo == "A" else MODELO_B)
+    resultados = {}
+
+    if com_pdf:
+        pdfs = [[gerar_pdf(t, paginas_extras) for t in item['textos']] for item in lote]
+        textos = medir("extracao_pdf", lambda: [[ler_ate_completar(p, grupo)[0] for p in ps] for ps in pdfs],
+                       total_faturas, resultados)
+    else:
+        textos = [item['textos'] for item in lote]
+
+    faturas = medir("parse", lambda: [[mapper(t) for t in ts] for ts in textos], total_faturas, resultados)
+    dados = [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': fs} for item, fs in zip(lote, faturas)]
+
+    abas = qtd_geradoras + qtd_beneficiarias
+    # Primeira preparação (modelo ainda fora do cache) e a seguinte (snapshot em memória)
+    medir("preparacao_fria", lambda: preparar_planilha(modelo, qtd_geradoras, qtd_beneficiarias), abas, resultados)
+    wb = medir("preparacao", lambda: preparar_planilha(modelo, qtd_geradoras, qtd_beneficiarias), abas, resultados)
+    wb = medir("escrita", lambda: salvar(wb, dados), total_faturas, resultados)
+    conteudo = medir("gravacao", lambda: salvar_planilha(wb), abas, resultados)
+
+    return {
+        "grupo": grupo, "geradoras": qtd_geradoras, "beneficiarias": qtd_beneficiarias,
+        "meses": meses, "faturas": total_faturas, "bytes_xlsx": len(conteudo), "etapas": resultados,
+    }
+
+
+def comparar(atual: dict, referencia: dict, tolerancia: float) -> list:
+    """Etapas em que o tempo atual passou da referência * (1 + tolerância)."""
+    regressoes = []
+    for etapa, medida in atual["etapas"].items():
+        base = referencia.get("etapas", {}).get(etapa)
+        if base and medida["segundos"] > base["segundos"] * (1 + tolerancia):
+            regressoes.append(f"{etapa}: {base['segundos']:.3f}s -> {medida['segundos']:.3f}s")
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de balanço com faturas sintéticas")
+    parser.add_argument("--grupo", choices=["A", "B"], default="B")
+    parser.add_argument("--geradoras", type=int, default=1)
+    parser.add_argument("--beneficiarias", type=int, default=20)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--pdf", action="store_true", help="gera PDFs e mede a extração (requer reportlab)")
+    parser.add_argument("--paginas-extras", type=int, default=0, help="páginas de verso por PDF (com --pdf)")
+    parser.add_argument("--modelo", default=None, help="planilha modelo (padrão: BALANÇO_FINAL.xlsx / sintético A)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", default=None, help="grava o resultado neste arquivo")
+    parser.add_argument("--comparar", default=None, help="JSON de referência de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.grupo, args.geradoras, args.beneficiarias, args.meses,
+                         args.pdf, args.modelo, args.semente, args.paginas_extras)
+
+    print(f"Grupo {resultado['grupo']}: {resultado['faturas']} faturas, "
+          f"{args.geradoras + args.beneficiarias} UCs, xlsx {resultado['bytes_xlsx'] / 1024:.0f} KB")
+    print(f"{'etapa':<18}{'s':>9}{'itens/s':>12}{'pico MB':>10}")
+    for etapa, m in resultado["etapas"].items():
+        print(f"{etapa:<18}{m['segundos']:>9.3f}{m['itens_por_segundo'] or 0:>12.1f}{m['pico_mb']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        if regressoes:
+            print("REGRESSÕES:\n  " + "\n  ".join(regressoes))
+            return 1
+        print("Sem regressões em relação à referência.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
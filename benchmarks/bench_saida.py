@@ -0,0 +1,117 @@
+"""
+Gravação da planilha final: em memória (workbook inteiro + BytesIO, como para as
+consultas pequenas) x streaming (aba por aba num arquivo temporário), com o pico de
+memória (tracemalloc) e o tempo de cada modo para consórcios com muitas UCs. Para
+comparação, a exportação tabular sem openpyxl (CSV e, com pyarrow, Parquet).
+
+Cada modo roda uma vez antes da medição, para o modelo já estar no cache de snapshots
+(como num servidor em uso). Confere também se as duas planilhas têm os mesmos valores.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_saida --grupo B --beneficiarias 150
+    python -m benchmarks.bench_saida --grupo A --beneficiarias 100 --json saida_A.json
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+import openpyxl
+
+from benchmarks.sintetico import gerar_lote, modelo_sintetico_A
+from services.exportacao import exportar, formatos_disponiveis, tabela_faturas
+from services.modelo_planilha import salvar_planilha
+from services.pipeline import gerar_planilha, gerar_planilha_streaming
+
+MODELO_B = "BALANÇO_FINAL.xlsx"
+
+
+def _em_memoria(grupo, modelo, dados, qtd_geradoras, qtd_beneficiarias):
+    wb = gerar_planilha(grupo, modelo, dados, qtd_geradoras, qtd_beneficiarias)
+    return io.BytesIO(salvar_planilha(wb))
+
+
+def _tabela(formato):
+    def _exportar(grupo, modelo, dados, qtd_geradoras, qtd_beneficiarias):
+        return io.BytesIO(exportar(tabela_faturas(dados, grupo), formato))
+    return _exportar
+
+
+MODOS = {
+    'memoria': _em_memoria,
+    'streaming': gerar_planilha_streaming,
+    **{formato: _tabela(formato) for formato in formatos_disponiveis()},
+}
+
+
+def medir(func) -> tuple:
+    """(retorno, segundos, pico de memória alocada em bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        retorno = func()
+        duracao = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return retorno, duracao, pico
+
+
+def _valores(arquivo):
+    arquivo.seek(0)
+    wb = openpyxl.load_workbook(arquivo)
+    return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb}
+
+
+def executar(grupo, qtd_geradoras, qtd_beneficiarias, meses, modelo=None, semente=42) -> dict:
+    modelo = modelo or (modelo_sintetico_A() if grupo == "A" else MODELO_B)
+    lote = gerar_lote(grupo, qtd_geradoras, qtd_beneficiarias, meses, semente=semente)
+    dados = [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote]
+
+    resultados, valores = {}, {}
+    for modo, gerar in MODOS.items():
+        gerar(grupo, modelo, dados, qtd_geradoras, qtd_beneficiarias).close()
+        saida, duracao, pico = medir(lambda: gerar(grupo, modelo, dados, qtd_geradoras, qtd_beneficiarias))
+        saida.seek(0, io.SEEK_END)
+        resultados[modo] = {'segundos': round(duracao, 4), 'pico_mb': round(pico / 2**20, 2),
+                            'bytes': saida.tell()}
+        if modo in ('memoria', 'streaming'):
+            valores[modo] = _valores(saida)
+        saida.close()
+
+    return {
+        'grupo': grupo, 'ucs': qtd_geradoras + qtd_beneficiarias, 'faturas': sum(len(d['dados']) for d in dados),
+        'modos': resultados, 'identicas': valores['memoria'] == valores['streaming'],
+        'reducao_pico': round(1 - resultados['streaming']['pico_mb'] / resultados['memoria']['pico_mb'], 4),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gravação da planilha: memória x streaming")
+    parser.add_argument("--grupo", choices=["A", "B"], default="B")
+    parser.add_argument("--geradoras", type=int, default=1)
+    parser.add_argument("--beneficiarias", type=int, default=100)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--modelo", default=None, help="planilha modelo (padrão: BALANÇO_FINAL.xlsx / sintético A)")
+    parser.add_argument("--json", default=None, help="grava o resultado neste arquivo")
+    args = parser.parse_args(argv)
+
+    r = executar(args.grupo, args.geradoras, args.beneficiarias, args.meses, args.modelo)
+    print(f"Grupo {r['grupo']}: {r['ucs']} UCs, {r['faturas']} faturas (mesmos valores: {r['identicas']})")
+    print(f"{'modo':<12}{'s':>9}{'pico MB':>10}{'KB':>10}")
+    for modo, m in r['modos'].items():
+        print(f"{modo:<12}{m['segundos']:>9.3f}{m['pico_mb']:>10.2f}{m['bytes'] / 1024:>10.0f}")
+    print(f"Redução do pico (streaming): {r['reducao_pico']:.1%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, ensure_ascii=False, indent=2)
+    return 0 if r['identicas'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
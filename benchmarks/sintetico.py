@@ -0,0 +1,243 @@
+"""
+Gerador de faturas sintéticas (texto e, opcionalmente, PDF) para os Grupos A e B.
+
+Os textos seguem o layout que os mappers esperam (cabeçalho UC MÊS/ANO, datas de
+leitura, linhas de medição, bloco do SCEE, tabela de histórico e total), com valores
+aleatórios reproduzíveis pela semente. Cada fatura vem acompanhada dos valores
+esperados, para conferir o parse.
+"""
+import datetime
+import io
+import random
+
+import openpyxl
+
+from services.campos import SIGLAS_MESES
+
+NOMES = ["MARIA DA SILVA", "JOAO PEREIRA", "ANA SOUZA", "CONDOMINIO SOLAR", "PADARIA BOA VISTA"]
+RUAS = ["RUA CEDROARANA", "AV. T-63", "RUA 24", "ALAMEDA DOS IPES", "RUA DAS FLORES"]
+
+
+def br(valor: float, milhar: bool = True) -> str:
+    """1234.5 -> "1.234,50" (ou "1234,50" sem separador de milhar)."""
+    texto = f"{valor:,.2f}" if milhar else f"{valor:.2f}"
+    return texto.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _meses_anteriores(mes: int, ano: int, quantidade: int):
+    for _ in range(quantidade):
+        mes -= 1
+        if mes == 0:
+            mes, ano = 12, ano - 1
+        yield mes, ano
+
+
+# Linha "Classificação:" do cabeçalho (usada na detecção automática do grupo)
+CLASSIFICACOES = {
+    "A": "Classificação: A A4 COMERCIAL - SERVIÇOS E OUTRAS ATIVIDADES Tipo de fornecimento: TRIFÁSICO",
+    "B": "Classificação: B B1 RESIDENCIAL - RESIDENCIAL NORMAL CONVENCIONAL Tipo de fornecimento: TRIFÁSICO",
+}
+
+
+def _cabecalho(rng, uc, mes, ano, grupo):
+    nome = rng.choice(NOMES)
+    endereco = f"{rng.choice(RUAS)}, Q. E {rng.randint(1, 40)}, L. {rng.randint(1, 30)}, S/N"
+    leitura_ant = datetime.date(ano, mes, 1) - datetime.timedelta(days=rng.randint(28, 33))
+    leitura_atual = datetime.date(ano, mes, rng.randint(1, 25))
+    proxima = leitura_atual + datetime.timedelta(days=30)
+    dias = (leitura_atual - leitura_ant).days
+    fmt = lambda d: d.strftime("%d/%m/%Y")
+    linhas = [
+        "ENDEREÇO DE ENTREGA:",
+        endereco,
+        "CEP: 74000000 GOIANIA GO BRASIL",
+        CLASSIFICACOES[grupo],
+        nome,
+        f"CNPJ/CPF: {rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(10, 99)}",
+        f"{fmt(leitura_ant)} {fmt(leitura_atual)} {dias} {fmt(proxima)}",
+        f"NOTA FISCAL Nº {rng.randint(10**8, 10**9)} - SÉRIE 0",
+        f"{SIGLAS_MESES[mes - 1]}/{ano} {fmt(proxima)} R$*********0,00",
+    ]
+    esperado = {
+        "uc": uc, "mes": SIGLAS_MESES[mes - 1], "endereco": endereco, "titular": nome,
+        "data_leitura_anterior": fmt(leitura_ant), "data_leitura_atual": fmt(leitura_atual),
+    }
+    return linhas, esperado, nome
+
+
+def gerar_texto_B(rng, uc, mes, ano, geradora=True, meses_historico=12):
+    """Fatura de Baixa Tensão (consumo único)."""
+    linhas, esperado, nome = _cabecalho(rng, uc, mes, ano, "B")
+    consumo = rng.randint(150, 900)
+    gerada = rng.randint(300, 1200) if geradora else 0
+    credito = float(rng.randint(0, consumo))
+    saldo = float(rng.randint(0, 5000))
+    valor = round(rng.uniform(50, 900), 2)
+    leitura_ant = rng.randint(10000, 90000)
+    medidor = f"{rng.randint(10**7, 10**8 - 1)}-{rng.randint(0, 9)}"
+    ciclo = f"{mes:02d}/{ano}"
+
+    linhas += [
+        f"INFORMAÇÕES DO SCEE: GERAÇÃO CICLO ({ciclo}) KWH: UC {uc} : {br(gerada)}, "
+        f"EXCEDENTE RECEBIDO KWH: UC {uc} : 0,00, CRÉDITO RECEBIDO KWH {br(credito)}, "
+        f"SALDO KWH: {br(saldo)}, SALDO A EXPIRAR EM 30 DIAS KWH: 0,00, CADASTRO RATEIO",
+        "CONSUMO SCEE kWh 418,00 0,804075 336,10 16 336,1 19% 63,86 0,613030",
+        "MÊS/ANO CONSUMO FATURADO(kWh) DIAS FATURAMENTO",
+    ]
+    historico = []
+    for m, a in _meses_anteriores(mes, ano, meses_historico):
+        kwh = rng.randint(150, 900)
+        historico.append({"mes": SIGLAS_MESES[m - 1], "ano": a % 100, "consumo": float(kwh)})
+        linhas.append(f"{SIGLAS_MESES[m - 1]}/{a % 100:02d} {kwh} {rng.randint(28, 33)} LIDA")
+    linhas += [
+        f"TOTAL {br(valor)} 5,73 120,42 22,88",
+        f"{medidor} ENERGIA ATIVA - KWH ÚNICO {leitura_ant:06d} {leitura_ant + consumo:06d} 1,000000 {consumo}",
+    ]
+    if geradora:
+        linhas.append(f"{medidor} ENERGIA GERAÇÃO - KWH ÚNICO {leitura_ant:06d} {leitura_ant + gerada:06d} 1,000000 {gerada}")
+    linhas += [
+        f"EQUATORIAL GOIAS DISTRIBUIDORA DE ENERGIA S/A {uc} {SIGLAS_MESES[mes - 1]}/{ano}",
+        f"{nome} CNPJ/CPF: 000.000.000-00",
+    ]
+    esperado.update({
+        "ano": ano, "medidor": medidor, "leitura_anterior": leitura_ant, "leitura_atual": leitura_ant + consumo,
+        "energia_ativa": float(consumo), "energia_gerada": float(gerada), "credito_recebido": credito,
+        "saldo": saldo, "valor_fatura": valor, "historico": historico,
+    })
+    # O cabeçalho "UC MÊS/ANO" precisa vir antes de qualquer outro número longo
+    linhas.insert(0, f"{uc} {SIGLAS_MESES[mes - 1]}/{ano}")
+    return "\n".join(linhas), esperado
+
+
+def gerar_texto_A(rng, uc, mes, ano, geradora=True, meses_historico=12):
+    """Fatura de Alta Tensão (postos tarifários Ponta / Fora Ponta / Reservado + demanda)."""
+    linhas, esperado, nome = _cabecalho(rng, uc, mes, ano, "A")
+    postos = (("p", "PONTA"), ("fp", "FORA PONTA"), ("hr", "RESERVADO"))
+    valores = {}
+    for sufixo, posto in postos:
+        consumo = float(rng.randint(500, 40000))
+        demanda = float(rng.randint(30, 800))
+        valores[f"c_{sufixo}"] = consumo
+        valores[f"d_{sufixo}"] = demanda
+        leitura = rng.randint(1000, 90000)
+        linhas.append(f"ENERGIA ATIVA - KWH {posto} {leitura} {leitura + int(consumo)} 1,000000 {br(consumo, milhar=False)}")
+        linhas.append(f"DEMANDA - KW {posto} {leitura} {leitura} 1,000000 {br(demanda, milhar=False)}")
+    gerada = 0.0
+    if geradora:
+        for _, posto in postos:
+            injetada = float(rng.randint(0, 20000))
+            gerada += injetada
+            leitura = rng.randint(1000, 90000)
+            linhas.append(f"ENERGIA GERAÇÃO-KWH {posto} {leitura} {leitura + int(injetada)} 1,000000 {br(injetada)}")
+    credito = float(rng.randint(0, 20000))
+    saldos = [float(rng.randint(0, 9000)) for _ in range(3)]
+    valor = round(rng.uniform(1000, 90000), 2)
+    linhas += [
+        f"INFORMAÇÕES DO SCEE: CREDITO RECEBIDO KWH {br(credito)}",
+        f"SALDO KWH P-{br(saldos[0])}, FP-{br(saldos[1])}, HR-{br(saldos[2])} ",
+        "MÊS/ANO DEMANDA P DEMANDA FP DEMANDA HR CONSUMO P CONSUMO FP UFER CONSUMO HR",
+    ]
+    historico = []
+    for m, a in _meses_anteriores(mes, ano, meses_historico):
+        h = {"mes": SIGLAS_MESES[m - 1], "ano": f"{a % 100:02d}",
+             "d_p": float(rng.randint(30, 800)), "d_fp": float(rng.randint(30, 800)),
+             "d_hr": float(rng.randint(0, 300)), "c_p": float(rng.randint(500, 40000)),
+             "c_fp": float(rng.randint(500, 40000)), "c_hr": float(rng.randint(0, 9000))}
+        historico.append(h)
+        linhas.append(" ".join([
+            f"{h['mes']}/{h['ano']}", br(h["d_p"]), br(h["d_fp"]), br(h["d_hr"]),
+            br(h["c_p"]), br(h["c_fp"]), "0,00", br(h["c_hr"]), "30",
+        ]))
+    linhas += [f"TOTAL A PAGAR R$ {br(valor)}", f"{nome} CNPJ/CPF: 000.000.000-00"]
+    linhas.insert(0, f"{uc} {SIGLAS_MESES[mes - 1]}/{ano}")
+    esperado.update(valores)
+    esperado.update({
+        "ano": str(ano)[2:], "energia_gerada": gerada, "credito_recebido": credito,
+        "saldo": sum(saldos), "valor_fatura": valor, "historico": historico,
+    })
+    return "\n".join(linhas), esperado
+
+
+GERADORES = {"A": gerar_texto_A, "B": gerar_texto_B}
+
+
+def gerar_lote(grupo, qtd_geradoras=1, qtd_beneficiarias=5, meses=12, ano=2025, semente=42) -> list:
+    """
+    Lote no formato do app, com textos no lugar dos arquivos:
+    [{'tipo', 'indice', 'textos': [...], 'esperados': [...]}], uma fatura por mês.
+    """
+    rng = random.Random(semente)
+    gerar = GERADORES[grupo]
+    lote = []
+    ucs = [('geradora', i + 1) for i in range(qtd_geradoras)] + \
+          [('beneficiaria', i + 1) for i in range(qtd_beneficiarias)]
+    for tipo, indice in ucs:
+        uc = str(rng.randint(10**7, 10**9))
+        textos, esperados = [], []
+        for mes in range(1, meses + 1):
+            texto, esperado = gerar(rng, uc, (mes - 1) % 12 + 1, ano + (mes - 1) // 12, geradora=(tipo == 'geradora'))
+            textos.append(texto)
+            esperados.append(esperado)
+        lote.append({'tipo': tipo, 'indice': indice, 'textos': textos, 'esperados': esperados})
+    return lote
+
+
+TEXTO_VERSO = (
+    "CONDIÇÕES GERAIS DE FORNECIMENTO. A DISTRIBUIDORA PODERÁ SUSPENDER O FORNECIMENTO "
+    "EM CASO DE INADIMPLEMENTO, CONFORME RESOLUÇÃO NORMATIVA ANEEL Nº 1000/2021. "
+)
+
+
+def gerar_pdf(texto: str, paginas_extras: int = 0, anexo_kb: int = 0) -> bytes:
+    """
+    PDF simples com o texto (uma linha por linha), seguido de `paginas_extras` páginas
+    de verso/anexo sem dados da fatura e, com `anexo_kb`, de uma página com uma imagem
+    de ruído desse tamanho (como um anexo digitalizado: deixa o PDF com o peso de uma
+    fatura real). Requer `reportlab` (opcional).
+    """
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+    except ImportError as e:
+        raise ImportError("Geração de PDF sintético requer o pacote 'reportlab' (pip install reportlab)") from e
+    saida = io.BytesIO()
+    pdf = canvas.Canvas(saida, pagesize=A4)
+    y = 820
+    for linha in texto.splitlines():
+        pdf.setFont("Helvetica", 6)
+        pdf.drawString(10, y, linha[:220])
+        y -= 9
+        if y < 20:
+            pdf.showPage()
+            y = 820
+    for _ in range(paginas_extras):
+        pdf.showPage()
+        pdf.setFont("Helvetica", 6)
+        for i in range(80):
+            pdf.drawString(10, 820 - i * 10, TEXTO_VERSO[(i * 7) % 60:][:150])
+    if anexo_kb:
+        from PIL import Image
+        from reportlab.lib.utils import ImageReader
+        lado = max(1, int((anexo_kb * 1024 / 3) ** 0.5))
+        ruido = random.Random(texto).randbytes(lado * lado * 3)
+        pdf.showPage()
+        pdf.drawImage(ImageReader(Image.frombytes("RGB", (lado, lado), ruido)), 10, 300, width=500, height=500)
+    pdf.save()
+    return saida.getvalue()
+
+
+def modelo_sintetico_A(ano=2025) -> bytes:
+    """
+    Modelo mínimo do Grupo A (o repositório só traz modelos do Grupo B): abas RESUMO,
+    GRUPO A e UC GERADORA / UC BENEF. 1 com os meses em datas na coluna A (linhas 5-16).
+    """
+    wb = openpyxl.Workbook()
+    wb.active.title = "RESUMO"
+    for nome in ("GRUPO A", "UC GERADORA", "UC BENEF. 1"):
+        ws = wb.create_sheet(nome)
+        ws["A3"] = "Mês de Ref."
+        for i in range(12):
+            ws.cell(5 + i, 1, datetime.datetime(ano, i + 1, 1))
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue()
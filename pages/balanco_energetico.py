@@ -1 +1,84 @@
-print("Teste Git")
\ No newline at end of file
+import io
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+# Motor do balanço em memória: geração, compensação, saldo e créditos expirados por UC e posto
+from services.balanco import VALIDADE_CREDITOS, calcular_balanco
+from utils.paginas import escolher_faturas
+
+st.set_page_config(page_title="Balanço Energético", layout="wide", page_icon="logo3.png")
+
+
+def balanco_ou_erro(faturas_por_uc, **parametros):
+    try:
+        return calcular_balanco(faturas_por_uc, **parametros)
+    except ValueError as e:  # nenhuma fatura com mês/ano reconhecido
+        st.error(str(e))
+        st.stop()
+
+
+def planilha_balanco(balanco) -> bytes:
+    # Gerada só no clique do download (st.download_button com data chamável), não a cada rerun
+    saida = io.BytesIO()
+    with pd.ExcelWriter(saida) as planilha:
+        balanco.resumo.to_excel(planilha, index=False, sheet_name="Resumo")
+        balanco.mensal.to_excel(planilha, index=False, sheet_name="Mensal")
+        balanco.postos.to_excel(planilha, index=False, sheet_name="Postos")
+    return saida.getvalue()
+
+
+st.title("Balanço Energético")
+st.caption("Balanço calculado direto das faturas, sem gerar a planilha.")
+
+with st.sidebar:
+    st.header("⚙️ Configuração")
+    validade = st.number_input(
+        "Validade dos créditos (meses)", min_value=1, value=VALIDADE_CREDITOS, step=1,
+        help="Créditos não usados nesse prazo expiram (os mais antigos são usados primeiro)."
+    )
+    st.markdown("**Fatores de ajuste (Grupo A)**")
+    fator_hr = st.number_input("Reservado (HR)", min_value=0.0, value=1.0, step=0.01,
+                               help="kWh de crédito gastos por kWh compensado no posto.")
+    fator_p = st.number_input("Ponta (P)", min_value=0.0, value=1.0, step=0.01)
+
+# --- 1. FATURAS ---
+st.subheader("1. Faturas")
+faturas_por_uc, geradoras = escolher_faturas()
+
+# --- 2. RATEIO ---
+if faturas_por_uc:
+    parametros = dict(geradoras=geradoras, fatores={"HR": fator_hr, "P": fator_p}, validade=validade)
+    st.subheader("2. Rateio")
+    st.caption("Padrão: participação de cada UC nos créditos recebidos no período. Edite para simular outro rateio.")
+    padrao = balanco_ou_erro(faturas_por_uc, **parametros).resumo[['uc', 'tipo', 'percentual_rateio']]
+    rateio = st.data_editor(padrao, disabled=['uc', 'tipo'], hide_index=True, use_container_width=True)
+    if abs(rateio['percentual_rateio'].sum() - 100) > 0.01:
+        st.warning(f"Os percentuais somam {rateio['percentual_rateio'].sum():.2f}%.")
+    percentuais = dict(zip(rateio['uc'], rateio['percentual_rateio'] / 100))
+    balanco = balanco_ou_erro(faturas_por_uc, percentuais=percentuais, **parametros)
+
+    # --- 3. BALANÇO ---
+    st.subheader("3. Balanço")
+    resumo = balanco.resumo
+    colunas = st.columns(4)
+    colunas[0].metric("Geração (kWh)", f"{resumo['geracao_kwh'].sum():,.0f}")
+    colunas[1].metric("Compensado (kWh)", f"{resumo['compensado_kwh'].sum():,.0f}")
+    colunas[2].metric("Saldo final (kWh)", f"{resumo['saldo_final_kwh'].sum():,.0f}")
+    colunas[3].metric("Expirado (kWh)", f"{resumo['expirado_kwh'].sum():,.0f}")
+    st.dataframe(resumo, use_container_width=True, hide_index=True)
+
+    st.markdown("**Saldo acumulado por UC**")
+    st.line_chart(balanco.mensal.pivot(index='competencia', columns='uc', values='saldo_kwh'))
+    with st.expander("Mês a mês"):
+        st.dataframe(balanco.mensal, use_container_width=True, hide_index=True)
+    with st.expander("Por posto tarifário"):
+        st.dataframe(balanco.postos, use_container_width=True, hide_index=True)
+
+    st.download_button(
+        label="📥 Baixar balanço",
+        data=partial(planilha_balanco, balanco),
+        file_name="BALANCO_ENERGETICO.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
@@ -0,0 +1,70 @@
+import io
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+# Motor vetorizado: percentuais atual, proporcional e ótimo para todas as UCs de uma vez
+from services.rateio import calcular_rateio, montar_series
+from utils.paginas import escolher_faturas
+
+st.set_page_config(page_title="Rateio de Créditos", layout="wide", page_icon="logo3.png")
+
+
+def planilha_rateio(tabela) -> bytes:
+    # Gerada só no clique do download (st.download_button com data chamável), não a cada rerun
+    saida = io.BytesIO()
+    tabela.to_excel(saida, index=False, sheet_name="Rateio")
+    return saida.getvalue()
+
+
+st.title("Rateio de Créditos")
+st.caption("Percentuais de rateio da geração entre as UCs, a partir do histórico de faturas.")
+
+with st.sidebar:
+    st.header("⚙️ Configuração")
+    passo = st.selectbox(
+        "Precisão dos percentuais", [0.01, 0.001, 0.0001], index=1,
+        format_func=lambda p: f"{p * 100:g}%",
+        help="Os percentuais ótimos são múltiplos deste valor e somam 100%."
+    )
+    usar_saldo = st.checkbox(
+        "Considerar o saldo atual das UCs", value=False,
+        help="Parte do saldo acumulado de cada UC (fatura mais recente) ao simular o período."
+    )
+
+# --- 1. FATURAS ---
+st.subheader("1. Faturas")
+faturas_por_uc, geradoras = escolher_faturas()
+
+# --- 2. RATEIO ---
+if faturas_por_uc:
+    st.subheader("2. Rateio")
+    try:
+        series = montar_series(faturas_por_uc, geradoras)
+    except ValueError as e:  # nenhuma fatura com mês/ano reconhecido
+        st.error(str(e))
+        st.stop()
+    if not series.geracao.any():
+        st.warning("Nenhuma geradora com energia gerada no período: não há o que ratear.")
+        st.stop()
+    tabela, resumo = calcular_rateio(series, passo=passo, usar_saldo=usar_saldo)
+
+    colunas = st.columns(4)
+    colunas[0].metric("UCs", resumo['ucs'])
+    colunas[1].metric("Meses", resumo['meses'])
+    colunas[2].metric("Geração (kWh)", f"{resumo['geracao_kwh']:,.0f}")
+    colunas[3].metric("Consumo (kWh)", f"{resumo['consumo_kwh']:,.0f}")
+    st.dataframe(pd.DataFrame([
+        {'rateio': nome, 'nao_compensado_kwh': resumo[f'nao_compensado_{chave}_kwh']}
+        for nome, chave in (("Atual", "atual"), ("Proporcional ao consumo", "proporcional"), ("Ótimo", "otimo"))
+        if f'nao_compensado_{chave}_kwh' in resumo
+    ]), use_container_width=True, hide_index=True)
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
+
+    st.download_button(
+        label="📥 Baixar rateio",
+        data=partial(planilha_rateio, tabela),
+        file_name="RATEIO_CREDITOS.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
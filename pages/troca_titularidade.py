@@ -0,0 +1,66 @@
+import time
+
+import pandas as pd
+import streamlit as st
+
+# Cadastro de UCs (endereço e titular) com índice para busca aproximada, atualizado pela base
+from utils.paginas import obter_base_faturas, obter_cadastro_ucs
+
+st.set_page_config(page_title="Troca de Titularidade", layout="wide", page_icon="logo3.png")
+
+st.title("Troca de Titularidade")
+st.caption("Encontre todas as UCs de um endereço ou titular nas faturas já processadas.")
+
+cadastro = obter_cadastro_ucs()
+novas = cadastro.sincronizar(obter_base_faturas())
+st.caption(f"{len(cadastro)} UCs no cadastro" + (f" ({novas} atualizadas agora)" if novas else ""))
+
+# --- 1. BUSCA ---
+st.subheader("1. Busca")
+coluna_modo, coluna_texto = st.columns([1, 3])
+modo = coluna_modo.radio("Buscar por", ["Endereço", "Titular", "UC"])
+texto = coluna_texto.text_input(
+    "Texto da busca", placeholder="Ex.: RUA CEDROARANA Q E3 L17",
+    help="Abreviações (Q., QD, L., LT), acentos e pequenos erros de digitação são tolerados."
+)
+minimo = st.slider("Semelhança mínima", 0.3, 1.0, 0.6, 0.05, disabled=modo == "UC")
+
+if texto:
+    inicio = time.perf_counter()
+    if modo == "Endereço":
+        resultado = cadastro.buscar_endereco(texto, minimo=minimo, limite=200)
+    elif modo == "Titular":
+        resultado = cadastro.buscar_titular(texto, minimo=minimo, limite=200)
+    else:
+        resultado = cadastro.buscar_uc(texto, limite=200)
+    st.caption(f"{len(resultado)} UCs em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    # --- 2. RESULTADO ---
+    if resultado:
+        st.subheader("2. UCs encontradas")
+        tabela = pd.DataFrame([
+            {'uc': ficha.uc, 'titular': ficha.titular, 'endereco': ficha.endereco,
+             'ultima_fatura': ficha.competencia, 'titulares': len(ficha.titulares), 'semelhanca': pontos}
+            for ficha, pontos in resultado
+        ])
+        st.dataframe(tabela, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Baixar lista (CSV)",
+            data=tabela.to_csv(index=False, sep=";").encode("utf-8-sig"),
+            file_name="UCS_TITULARIDADE.csv",
+            mime="text/csv",
+        )
+
+        uc = st.selectbox("Histórico da UC", [ficha.uc for ficha, _ in resultado])
+        ficha = cadastro.ficha(uc)
+        coluna_titulares, coluna_enderecos = st.columns(2)
+        with coluna_titulares:
+            st.markdown("**Titulares**")
+            st.dataframe(pd.DataFrame(ficha.titulares, columns=['titular', 'de', 'ate']),
+                         use_container_width=True, hide_index=True)
+        with coluna_enderecos:
+            st.markdown("**Endereços**")
+            st.dataframe(pd.DataFrame(ficha.enderecos, columns=['endereco', 'de', 'ate']),
+                         use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhuma UC encontrada. Reduza a semelhança mínima ou revise o texto.")
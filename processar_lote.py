@@ -0,0 +1,75 @@
+"""
+Geração de balanços em lote, sem Streamlit.
+
+Exemplos (na raiz do projeto):
+    python processar_lote.py --grupo B --modelo BALANÇO_FINAL.xlsx --entrada faturas/ --saida saida/
+    python processar_lote.py --manifesto clientes.json --saida saida/ --processos 4
+    python processar_lote.py --grupo A --entrada faturas/ --saida saida/ --formato parquet   # sem modelo
+
+Estrutura esperada em --entrada: <cliente>/<geradora_N | beneficiaria_N>/*.pdf
+O resumo da execução (tempos por fatura e falhas) é gravado em <saida>/resumo_lote.json.
+"""
+import argparse
+import json
+import os
+import sys
+
+from services.exportacao import formatos_disponiveis
+from services.extracao import AUTO
+from services.leitores_pdf import LEITORES
+from services.lote import descobrir_clientes, executar_lote, ler_manifesto
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Geração de balanços energéticos em lote")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--entrada", help="pasta com uma subpasta por cliente")
+    origem.add_argument("--manifesto", help="arquivo JSON com clientes, UCs e PDFs")
+    parser.add_argument("--grupo", choices=["A", "B", AUTO],
+                        help="grupo tarifário (padrão do manifesto); auto detecta pelo layout das faturas")
+    parser.add_argument("--modelo", help="planilha modelo .xlsx (padrão do manifesto)")
+    parser.add_argument("--saida", required=True, help="pasta de saída das planilhas")
+    parser.add_argument("--processos", type=int, default=None, help="clientes processados em paralelo")
+    parser.add_argument("--cache", default=None, help="pasta do cache de faturas (opcional)")
+    parser.add_argument("--leitor", choices=sorted(LEITORES), default=None,
+                        help="leitor de PDF (padrão: o configurado para o grupo)")
+    parser.add_argument("--base", default=None,
+                        help="arquivo SQLite da base de faturas onde gravar o que foi lido (opcional)")
+    parser.add_argument("--resumo", default=None, help="caminho do JSON de resumo")
+    parser.add_argument("--formato", choices=["xlsx", *formatos_disponiveis()], default="xlsx",
+                        help="planilha de balanço ou tabela de faturas por UC e mês (csv/parquet, dispensa o modelo)")
+    args = parser.parse_args(argv)
+
+    if args.entrada:
+        if not (args.grupo and (args.modelo or args.formato != "xlsx")):
+            parser.error("--entrada exige --grupo e --modelo (o modelo só é dispensado com --formato csv/parquet)")
+        clientes = descobrir_clientes(args.entrada, args.grupo, args.modelo)
+    else:
+        clientes = ler_manifesto(args.manifesto, args.grupo, args.modelo)
+
+    sem_configuracao = [c['nome'] for c in clientes if not (c['grupo'] and (c['modelo'] or args.formato != "xlsx"))]
+    if sem_configuracao:
+        parser.error(f"clientes sem grupo ou modelo definido: {', '.join(sem_configuracao)}")
+    if not clientes:
+        print("Nenhum cliente encontrado.", file=sys.stderr)
+        return 1
+
+    def _progresso(resumo):
+        situacao = f"ERRO: {resumo['erro']}" if resumo['erro'] else resumo['saida']
+        falhas = sum(1 for a in resumo['arquivos'] if a.get('erro'))
+        print(f"[{resumo.get('duracao_s', 0):7.2f}s] {resumo['cliente']}: "
+              f"{len(resumo['arquivos'])} faturas, {falhas} com erro -> {situacao}")
+
+    resumo = executar_lote(clientes, args.saida, args.processos, args.cache, ao_concluir=_progresso,
+                           leitor=args.leitor, caminho_base=args.base, formato=args.formato)
+
+    caminho_resumo = args.resumo or os.path.join(args.saida, "resumo_lote.json")
+    with open(caminho_resumo, "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    print(f"{resumo['total_clientes']} clientes em {resumo['duracao_s']:.2f}s "
+          f"({resumo['clientes_com_erro']} com erro). Resumo: {caminho_resumo}")
+    return 1 if resumo['clientes_com_erro'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Balanço energético calculado em memória, sem passar pelas fórmulas das planilhas.
+
+Segue a lógica dos modelos BALANÇO: a geração das geradoras é dividida pelo rateio
+(percentual de cada UC), o crédito recebido compensa o consumo do mês e o que sobra
+acumula no saldo, que é usado nos meses seguintes. Além do que as planilhas fazem:
+- créditos não usados expiram após `validade` meses (os mais antigos são usados primeiro);
+- no Grupo A o crédito compensa os postos em ordem (fora ponta, reservado, ponta), com
+  um fator de ajuste por posto (kWh de crédito por kWh compensado no posto).
+
+O cálculo é feito sobre matrizes UC x mês inteiras (numpy); o saldo usa a mesma forma
+fechada de services.rateio.compensacao, com a expiração resolvida por ponto fixo.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from services.base_faturas import competencia
+from services.ingestao import eh_geradora
+
+# Meses de validade dos créditos do SCEE
+VALIDADE_CREDITOS = int(os.environ.get("BALANCO_VALIDADE_CREDITOS", 60))
+
+# Ordem de compensação dos postos do Grupo A e o campo do mapper de cada um
+POSTOS_A = (("FP", "c_fp"), ("HR", "c_hr"), ("P", "c_p"))
+POSTOS_B = (("UNICO", "energia_ativa"),)
+FATORES_PADRAO = {"UNICO": 1.0, "FP": 1.0, "HR": 1.0, "P": 1.0}
+
+
+class Balanco(NamedTuple):
+    mensal: pd.DataFrame   # uma linha por UC e competência
+    postos: pd.DataFrame   # uma linha por UC, competência e posto tarifário
+    resumo: pd.DataFrame   # uma linha por UC
+
+
+def _postos(dados) -> tuple:
+    return POSTOS_B if "energia_ativa" in dados else POSTOS_A
+
+
+def simular_saldo(credito, demanda, saldo_inicial=0.0, validade=VALIDADE_CREDITOS) -> tuple:
+    """
+    Compensação mês a mês com saldo e expiração, vetorizada nas UCs (eixo 0) e meses
+    (eixo 1). Em cada mês o crédito entra no saldo, compensa a demanda e, por fim, expiram
+    os créditos de `validade` meses atrás ainda não usados (o saldo inicial conta como
+    crédito do primeiro mês). Devolve (compensado, saldo ao fim do mês, expirado).
+
+    Sem expiração o saldo é b[t] = max(0, b[t-1] + credito[t] - demanda[t]), resolvido
+    pela soma acumulada. A expiração acumulada é max(0, créditos até t - validade - uso
+    até t) (FIFO), que depende do uso; como tirar créditos só reduz o uso, iterar a
+    partir de "nada expira" converge em poucas passadas.
+    """
+    credito, demanda = np.asarray(credito, dtype=float), np.asarray(demanda, dtype=float)
+    saldo_inicial = np.broadcast_to(np.asarray(saldo_inicial, dtype=float), credito.shape[:1])
+    entradas = saldo_inicial[:, None] + np.cumsum(credito, axis=1)
+    vencidas = np.zeros_like(entradas)
+    if 0 < validade < credito.shape[1]:
+        vencidas[:, validade:] = entradas[:, :-validade]
+
+    expirado = np.zeros_like(credito)
+    for _ in range(credito.shape[1] + 1):
+        acumulado = np.cumsum(credito - expirado - demanda, axis=1)
+        piso = np.minimum(np.minimum.accumulate(acumulado, axis=1), 0.0)
+        saldo = acumulado + np.maximum(saldo_inicial[:, None], -piso)
+        anterior = np.concatenate([saldo_inicial[:, None], saldo[:, :-1]], axis=1)
+        compensado = anterior + credito - expirado - saldo
+        expirado_total = np.maximum.accumulate(np.maximum(vencidas - np.cumsum(compensado, axis=1), 0.0), axis=1)
+        novo = np.diff(expirado_total, axis=1, prepend=0.0)
+        if np.allclose(novo, expirado, atol=1e-9):
+            break
+        expirado = novo
+    return compensado, saldo, expirado
+
+
+def calcular_balanco(faturas_por_uc: dict, geradoras=None, percentuais=None, fatores=None,
+                     saldo_inicial=None, validade=VALIDADE_CREDITOS) -> Balanco:
+    """
+    `faturas_por_uc`: {uc: [dicionários dos mappers]} (ver services.rateio.agrupar_por_uc).
+    `percentuais`: {uc: fração do rateio}; sem ele, a participação de cada UC nos créditos
+    recebidos no período (o rateio que está valendo). `fatores`: fator de ajuste por posto
+    (padrão 1). `saldo_inicial`: {uc: kWh} antes do primeiro mês (padrão zero).
+    Meses sem fatura de uma UC recebem o consumo médio dela ('tem_fatura' = False).
+    """
+    fatores = {**FATORES_PADRAO, **(fatores or {})}
+    registros = []
+    for uc, faturas in faturas_por_uc.items():
+        for dados in faturas:
+            comp = competencia(dados.get("ano"), dados.get("mes"))
+            if comp is None:
+                continue
+            registro = {
+                'uc': uc, 'competencia': comp, 'grupo': "B" if _postos(dados) is POSTOS_B else "A",
+                'energia_gerada': float(dados.get("energia_gerada") or 0.0),
+                'credito_recebido': float(dados.get("credito_recebido") or 0.0),
+                'saldo_fatura': float(dados.get("saldo") or 0.0),
+            }
+            registro.update({posto: float(dados.get(campo) or 0.0) for posto, campo in _postos(dados)})
+            registros.append(registro)
+    if not registros:
+        raise ValueError("Nenhuma fatura com competência reconhecida para o balanço.")
+    tabela = pd.DataFrame(registros).drop_duplicates(["uc", "competencia"], keep="last")
+    postos = [posto for posto, _ in POSTOS_B + POSTOS_A if posto in tabela]
+    tabela[postos] = tabela[postos].fillna(0.0)
+
+    ucs = sorted(tabela["uc"].unique())
+    competencias = sorted(tabela["competencia"].unique())
+    qtd_ucs, qtd_meses = len(ucs), len(competencias)
+    grade = tabela.set_index(["uc", "competencia"]).reindex(pd.MultiIndex.from_product([ucs, competencias]))
+    tem_fatura = grade["energia_gerada"].notna().to_numpy().reshape(qtd_ucs, qtd_meses)
+
+    def matriz(coluna, preencher_media=False):
+        valores = grade[coluna].to_numpy(dtype=float).reshape(qtd_ucs, qtd_meses)
+        if preencher_media:
+            medias = np.nanmean(np.where(tem_fatura, valores, np.nan), axis=1)
+            return np.where(tem_fatura, valores, medias[:, None])
+        return np.nan_to_num(valores)
+
+    grupos = tabela.groupby("uc")["grupo"].last().reindex(ucs).to_numpy()
+    if geradoras is None:
+        geradora = np.array([eh_geradora(faturas_por_uc[uc]) for uc in ucs])
+    else:
+        geradora = np.array([uc in geradoras for uc in ucs])
+    gerada = matriz("energia_gerada", preencher_media=True) * geradora[:, None]
+    credito_fatura = matriz("credito_recebido")
+    consumo = {posto: matriz(posto, preencher_media=True) for posto in postos}
+
+    if percentuais is None:
+        pesos = credito_fatura.sum(axis=1)
+        if pesos.sum() <= 0:
+            pesos = sum(consumo.values()).sum(axis=1)
+        fracoes = pesos / pesos.sum() if pesos.sum() > 0 else np.full(qtd_ucs, 1 / qtd_ucs)
+    else:
+        fracoes = np.array([float(percentuais.get(uc, 0.0)) for uc in ucs])
+    saldo0 = np.array([float((saldo_inicial or {}).get(uc, 0.0)) for uc in ucs])
+
+    geracao = gerada.sum(axis=0)
+    alocado = fracoes[:, None] * geracao[None, :]
+    # Demanda em kWh de crédito (consumo de cada posto vezes o fator de ajuste)
+    demanda = {posto: consumo[posto] * fatores[posto] for posto in postos}
+    compensado, saldo, expirado = simular_saldo(alocado, sum(demanda.values()), saldo0, validade)
+
+    # Crédito do mês repartido entre os postos, na ordem de compensação
+    linhas_postos, antes = [], np.zeros_like(compensado)
+    for posto in postos:
+        usado = np.clip(compensado - antes, 0.0, demanda[posto])
+        antes = antes + demanda[posto]
+        compensado_posto = usado / fatores[posto] if fatores[posto] else np.zeros_like(usado)
+        do_grupo = (grupos == ("B" if posto == "UNICO" else "A"))
+        linhas_postos.append(pd.DataFrame({
+            'uc': np.repeat(ucs, qtd_meses), 'competencia': np.tile(competencias, qtd_ucs), 'posto': posto,
+            'consumo_kwh': consumo[posto].ravel(), 'compensado_kwh': compensado_posto.ravel(),
+            'faturado_kwh': (consumo[posto] - compensado_posto).ravel(),
+        })[np.repeat(do_grupo, qtd_meses)])
+
+    consumo_total = sum(consumo.values())
+    mensal = pd.DataFrame({
+        'uc': np.repeat(ucs, qtd_meses),
+        'competencia': np.tile(competencias, qtd_ucs),
+        'tipo': np.repeat(np.where(geradora, 'geradora', 'beneficiaria'), qtd_meses),
+        'grupo': np.repeat(grupos, qtd_meses),
+        'tem_fatura': tem_fatura.ravel(),
+        'geracao_kwh': gerada.ravel(),
+        'consumo_kwh': consumo_total.ravel(),
+        'credito_alocado_kwh': alocado.ravel(),
+        'compensado_kwh': compensado.ravel(),
+        'saldo_kwh': saldo.ravel(),
+        'expirado_kwh': expirado.ravel(),
+        # Conferência com o que veio na fatura
+        'credito_fatura_kwh': credito_fatura.ravel(),
+        'saldo_fatura_kwh': matriz("saldo_fatura").ravel(),
+    })
+    resumo = pd.DataFrame({
+        'uc': ucs,
+        'tipo': np.where(geradora, 'geradora', 'beneficiaria'),
+        'grupo': grupos,
+        'percentual_rateio': np.round(fracoes * 100, 4),
+        'geracao_kwh': gerada.sum(axis=1),
+        'consumo_kwh': consumo_total.sum(axis=1),
+        'credito_alocado_kwh': alocado.sum(axis=1),
+        'compensado_kwh': compensado.sum(axis=1),
+        'expirado_kwh': expirado.sum(axis=1),
+        'saldo_final_kwh': saldo[:, -1],
+    })
+    return Balanco(mensal=mensal, postos=pd.concat(linhas_postos, ignore_index=True), resumo=resumo)
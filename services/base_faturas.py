@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+from services.indice_meses import NUMERO_MES, ano_completo
+from services.registros import expandir
+
+CAMINHO_PADRAO = os.environ.get(
+    "BALANCO_BASE_FATURAS", os.path.join(tempfile.gettempdir(), "essential_base_faturas.sqlite3")
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS faturas (
+    uc TEXT NOT NULL,
+    competencia INTEGER NOT NULL,           -- ano * 100 + mês (202501 = JAN/2025)
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    grupo TEXT NOT NULL,
+    cliente TEXT,
+    energia_gerada REAL,
+    valor_fatura REAL,
+    dados TEXT NOT NULL,                    -- dicionário do mapper (JSON)
+    gravada_em REAL NOT NULL,
+    PRIMARY KEY (uc, competencia)
+);
+CREATE INDEX IF NOT EXISTS idx_faturas_competencia ON faturas (competencia);
+CREATE INDEX IF NOT EXISTS idx_faturas_cliente ON faturas (cliente, competencia);
+CREATE INDEX IF NOT EXISTS idx_faturas_gravada_em ON faturas (gravada_em);
+"""
+
+
+def competencia(ano, mes):
+    """(2025 | 25 | "25", "JAN") -> 202501; None se a fatura não tem mês/ano válidos."""
+    ano = ano_completo(ano)
+    numero = NUMERO_MES.get(mes) if isinstance(mes, str) else mes
+    return ano * 100 + numero if ano and numero else None
+
+
+class BaseFaturas:
+    """
+    Base local (SQLite) com as faturas já extraídas, uma linha por UC e competência.
+
+    Cada processamento grava o que leu; uma reemissão do mesmo mês substitui a anterior.
+    A chave primária (uc, competencia) atende às consultas por UC e período, e os índices
+    por competência e por cliente às consultas de um mês ou de um cliente inteiro. As
+    conexões são abertas por operação, então a base pode ser usada por várias threads e
+    processos ao mesmo tempo (modo WAL).
+    """
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    # --- Escrita ---
+    def gravar(self, faturas, grupo, cliente=None) -> int:
+        """
+        Grava (ou substitui) as faturas de um grupo numa única transação (dicionários ou
+        registros compactos). Faturas sem UC ou competência são ignoradas. Devolve quantas
+        foram gravadas.
+        """
+        agora = time.time()
+        linhas = []
+        for dados in faturas:
+            dados = expandir(dados)
+            comp = competencia(dados.get("ano"), dados.get("mes"))
+            if not dados.get("uc") or comp is None:
+                continue
+            linhas.append((
+                dados["uc"], comp, comp // 100, comp % 100, grupo, cliente,
+                dados.get("energia_gerada"), dados.get("valor_fatura"),
+                json.dumps(dados, ensure_ascii=False), agora,
+            ))
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.executemany(
+                "INSERT OR REPLACE INTO faturas (uc, competencia, ano, mes, grupo, cliente, "
+                "energia_gerada, valor_fatura, dados, gravada_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        return len(linhas)
+
+    # --- Consulta ---
+    def consultar(self, ucs=None, de=None, ate=None, grupo=None, cliente=None) -> list:
+        """
+        Faturas (dicionários dos mappers) ordenadas por UC e competência. `de`/`ate` são
+        competências (202401) inclusivas; `ucs` limita às UCs de um cliente.
+        """
+        filtros, parametros = [], []
+        if ucs is not None:
+            ucs = list(ucs)
+            if not ucs:
+                return []
+            filtros.append(f"uc IN ({', '.join('?' * len(ucs))})")
+            parametros += ucs
+        for condicao, valor in (("competencia >= ?", de), ("competencia <= ?", ate),
+                                ("grupo = ?", grupo), ("cliente = ?", cliente)):
+            if valor is not None:
+                filtros.append(condicao)
+                parametros.append(valor)
+        sql = "SELECT dados FROM faturas"
+        if filtros:
+            sql += " WHERE " + " AND ".join(filtros)
+        with closing(self._conectar()) as conexao:
+            linhas = conexao.execute(sql + " ORDER BY uc, competencia", parametros).fetchall()
+        return [json.loads(dados) for (dados,) in linhas]
+
+    def gravadas_desde(self, instante) -> tuple:
+        """
+        (faturas gravadas em `instante` ou depois, maior gravada_em lido), para quem mantém
+        uma cópia derivada (services.cadastro_ucs) atualizada sem reler a base inteira. O
+        próprio `instante` entra de novo: gravações no mesmo instante não se perdem.
+        """
+        with closing(self._conectar()) as conexao:
+            linhas = conexao.execute(
+                "SELECT dados, gravada_em FROM faturas WHERE gravada_em >= ? ORDER BY gravada_em",
+                (instante,)).fetchall()
+        return [json.loads(dados) for dados, _ in linhas], max((g for _, g in linhas), default=instante)
+
+    def ucs(self, cliente=None) -> list:
+        """UCs guardadas (opcionalmente de um cliente), em ordem."""
+        sql, parametros = "SELECT DISTINCT uc FROM faturas", ()
+        if cliente is not None:
+            sql, parametros = sql + " WHERE cliente = ?", (cliente,)
+        with closing(self._conectar()) as conexao:
+            return [uc for (uc,) in conexao.execute(sql + " ORDER BY uc", parametros)]
+
+    def competencias(self, uc) -> list:
+        """Competências guardadas de uma UC, em ordem."""
+        with closing(self._conectar()) as conexao:
+            return [c for (c,) in conexao.execute(
+                "SELECT competencia FROM faturas WHERE uc = ? ORDER BY competencia", (uc,))]
+
+
+def _deslocar(comp, meses):
+    indice = (comp // 100) * 12 + (comp % 100 - 1) + meses
+    return (indice // 12) * 100 + indice % 12 + 1
+
+
+def completar_com_base(base, dados_estruturados, grupo, meses=12) -> tuple:
+    """
+    Acrescenta a cada UC as faturas guardadas na base para os meses sem PDF novo, nos
+    `meses` meses que terminam na competência mais recente enviada para a UC (a janela
+    de uma planilha). UCs sem nenhuma fatura no envio não têm como ser identificadas e
+    ficam como estão. Devolve (dados_estruturados, quantidade de faturas acrescentadas).
+    """
+    completados, total = [], 0
+    for item in dados_estruturados:
+        enviadas = {competencia(d.get("ano"), d.get("mes")) for d in item['dados']} - {None}
+        uc = next((d.get("uc") for d in item['dados'] if d.get("uc")), None)
+        if not uc or not enviadas:
+            completados.append(item)
+            continue
+        ultima = max(enviadas)
+        guardadas = [
+            d for d in base.consultar(ucs=[uc], de=_deslocar(ultima, 1 - meses), ate=ultima, grupo=grupo)
+            if competencia(d.get("ano"), d.get("mes")) not in enviadas
+        ]
+        total += len(guardadas)
+        completados.append({**item, 'dados': guardadas + list(item['dados'])})
+    return completados, total
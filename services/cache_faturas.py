@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+DIRETORIO_PADRAO = os.environ.get(
+    "BALANCO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "essential_cache_faturas")
+)
+LIMITE_PADRAO = 256 * 1024 * 1024  # 256 MB
+# Ao passar do limite, a poda desce até esta fração dele: a varredura da pasta não se
+# repete a cada gravação seguinte
+FOLGA_PODA = 0.9
+
+
+def hash_pdf(conteudo: bytes) -> str:
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class CacheFaturas:
+    """
+    Cache em disco das faturas já lidas, endereçado pelo conteúdo do PDF.
+
+    - `<sha256>.txt`: texto bruto extraído pelo pdfplumber (independe do mapper);
+    - `<sha256>-<versao_mapper>.json`: dicionário devolvido pelo `extrair_fatura`.
+
+    Assim, uma mudança de versão do mapper reaproveita o texto e só refaz as regex.
+    O tamanho total é limitado por `limite_bytes`, descartando primeiro os arquivos
+    usados há mais tempo (LRU pela data de modificação, atualizada a cada acerto).
+    O tamanho é somado a cada gravação; a pasta só é varrida na primeira gravação e
+    quando a soma passa do limite (o que também acerta a soma com o que outros
+    processos gravaram na mesma pasta).
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, limite_bytes=LIMITE_PADRAO):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self._total = None  # bytes na pasta; None até a primeira varredura
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    # --- Leitura ---
+    def _ler(self, nome):
+        caminho = os.path.join(self.diretorio, nome)
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                conteudo = f.read()
+            os.utime(caminho)  # marca como usado recentemente (LRU)
+            return conteudo
+        except OSError:
+            return None
+
+    def obter_texto(self, chave_pdf):
+        return self._ler(f"{chave_pdf}.txt")
+
+    def obter_dados(self, chave_pdf, versao_mapper):
+        bruto = self._ler(f"{chave_pdf}-{versao_mapper}.json")
+        with self._lock:
+            if bruto is None:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+        return json.loads(bruto)
+
+    # --- Escrita ---
+    def _gravar(self, nome, conteudo):
+        # Escrita atômica: outra sessão pode estar lendo o mesmo arquivo
+        bruto = conteudo.encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(bruto)
+        destino = os.path.join(self.diretorio, nome)
+        try:
+            anterior = os.stat(destino).st_size
+        except OSError:
+            anterior = 0
+        os.replace(tmp, destino)
+        with self._lock:
+            if self._total is not None:
+                self._total += len(bruto) - anterior
+
+    def guardar(self, chave_pdf, versao_mapper, texto, dados):
+        if texto is not None:
+            self._gravar(f"{chave_pdf}.txt", texto)
+        self._gravar(f"{chave_pdf}-{versao_mapper}.json", json.dumps(dados, ensure_ascii=False))
+        with self._lock:
+            cheio = self._total is None or self._total > self.limite_bytes
+        if cheio:
+            self.podar()
+
+    def podar(self):
+        """
+        Varre a pasta e, se ela passou de `limite_bytes`, remove os arquivos menos usados
+        até FOLGA_PODA do limite.
+        """
+        with self._lock:
+            arquivos = []
+            for entrada in os.scandir(self.diretorio):
+                if entrada.is_file() and not entrada.name.endswith(".tmp"):
+                    info = entrada.stat()
+                    arquivos.append((info.st_mtime, info.st_size, entrada.path))
+            total = sum(tamanho for _, tamanho, _ in arquivos)
+            if total > self.limite_bytes:
+                for _, tamanho, caminho in sorted(arquivos):
+                    if total <= self.limite_bytes * FOLGA_PODA:
+                        break
+                    try:
+                        os.remove(caminho)
+                        total -= tamanho
+                    except OSError:
+                        pass
+            self._total = total
+
+    def estatisticas(self) -> dict:
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+        }
@@ -0,0 +1,243 @@
+"""
+Cadastro das UCs (número, endereço e titular) com busca aproximada por endereço e titular.
+
+Montado a partir das faturas já extraídas (services.base_faturas) e atualizado de forma
+incremental: `sincronizar` lê só as faturas gravadas depois da última sincronização.
+
+Endereços e nomes viram tokens normalizados (maiúsculas, sem acento, abreviações
+expandidas e letras separadas de números), de modo que "Q. E 3, L. 17", "QD E3 LT 17"
+e "QUADRA E-3 LOTE 17" dão os mesmos tokens. A busca usa um índice invertido
+(token -> UCs) e, para erros de digitação, um índice de variantes com uma letra a menos
+(token "CEDROARANA" também é achado por "CEDRORANA" ou "CEDROARNA"). Pares de tokens
+vizinhos também são indexados, para a ordem contar ("Q. 10, L. 20" x "Q. 20, L. 10").
+O resultado é ordenado pela fração do peso (IDF) dos termos da busca encontrada em cada UC.
+"""
+import math
+import re
+import threading
+import unicodedata
+from typing import NamedTuple
+
+from services.base_faturas import competencia
+from services.registros import expandir
+
+# Abreviações comuns nos endereços das faturas -> forma canônica
+ABREVIACOES = {
+    "Q": "QUADRA", "QD": "QUADRA", "QDA": "QUADRA",
+    "L": "LOTE", "LT": "LOTE", "LTS": "LOTE",
+    "R": "RUA", "AV": "AVENIDA", "AL": "ALAMEDA", "ROD": "RODOVIA", "PC": "PRACA",
+    "ST": "SETOR", "SET": "SETOR", "JD": "JARDIM", "RES": "RESIDENCIAL", "RESID": "RESIDENCIAL",
+    "COND": "CONDOMINIO", "ED": "EDIFICIO", "EDIF": "EDIFICIO", "BL": "BLOCO",
+    "AP": "APARTAMENTO", "APT": "APARTAMENTO", "APTO": "APARTAMENTO", "APART": "APARTAMENTO",
+    "N": "NUMERO", "NO": "NUMERO", "NUM": "NUMERO", "CS": "CASA", "CH": "CHACARA",
+}
+# Tokens sem valor para distinguir endereços ou nomes
+IGNORADOS = frozenset({"DE", "DA", "DO", "DAS", "DOS", "SN", "S", "BRASIL"})
+# Tamanho mínimo do token para a busca tolerar um erro de digitação
+MINIMO_APROXIMADO = 5
+
+_SEPARADOR = re.compile(r"[^A-Z0-9]+")
+_LETRAS_NUMEROS = re.compile(r"[A-Z]+|[0-9]+")
+
+
+def tokens(texto) -> tuple:
+    """
+    "RUA CEDROARANA, Q. E 3, L. 17, S/N" -> ("RUA", "CEDROARANA", "QUADRA", "E", "3", "LOTE", "17").
+    Números perdem os zeros à esquerda ("017" = "17").
+    """
+    texto = unicodedata.normalize("NFKD", str(texto or "").upper())
+    texto = texto.encode("ascii", "ignore").decode("ascii").replace("S/N", " ")
+    resultado = []
+    for palavra in _SEPARADOR.split(texto):
+        for parte in _LETRAS_NUMEROS.findall(palavra):
+            parte = str(int(parte)) if parte.isdigit() else ABREVIACOES.get(parte, parte)
+            if parte not in IGNORADOS:
+                resultado.append(parte)
+    return tuple(resultado)
+
+
+def termos(texto) -> list:
+    """Tokens e pares de tokens vizinhos ("LOTE 17"): distinguem "Q. 10, L. 20" de "Q. 20, L. 10"."""
+    lista = tokens(texto)
+    return list(lista) + [f"{a} {b}" for a, b in zip(lista, lista[1:])]
+
+
+def _aproximavel(token) -> bool:
+    return len(token) >= MINIMO_APROXIMADO and " " not in token
+
+
+def _variantes(token) -> set:
+    """O token com uma letra a menos, em cada posição."""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class FichaUC(NamedTuple):
+    uc: str
+    endereco: str
+    titular: str
+    competencia: int            # fatura mais recente vista
+    titulares: tuple            # ((titular, primeira competência, última competência), ...) em ordem
+    enderecos: tuple            # idem, para o endereço
+
+
+class _Indice:
+    """Índice invertido token -> UCs, com variantes de uma deleção para busca aproximada."""
+
+    def __init__(self):
+        self.postagens = {}
+        self.variantes = {}
+        self.por_uc = {}
+
+    def remover(self, uc):
+        for token in self.por_uc.pop(uc, ()):
+            ucs = self.postagens[token]
+            ucs.discard(uc)
+            if not ucs:
+                del self.postagens[token]
+                for variante in _variantes(token) if _aproximavel(token) else ():
+                    self.variantes[variante].discard(token)
+
+    def adicionar(self, uc, lista_tokens):
+        self.remover(uc)
+        self.por_uc[uc] = set(lista_tokens)
+        for token in self.por_uc[uc]:
+            if token not in self.postagens:
+                self.postagens[token] = set()
+                for variante in _variantes(token) if _aproximavel(token) else ():
+                    self.variantes.setdefault(variante, set()).add(token)
+            self.postagens[token].add(uc)
+
+    def equivalentes(self, token) -> set:
+        """Tokens do índice iguais a `token` ou a uma deleção/inserção/troca de distância."""
+        if token in self.postagens or not _aproximavel(token):
+            return {token} & self.postagens.keys()
+        candidatos = set(self.variantes.get(token, ()))        # faltou uma letra na busca
+        for variante in _variantes(token):
+            if variante in self.postagens:                       # sobrou uma letra na busca
+                candidatos.add(variante)
+            candidatos |= self.variantes.get(variante, set())   # letra trocada
+        return candidatos
+
+    def buscar(self, consulta, minimo=0.0) -> dict:
+        """
+        {uc: fração do peso IDF dos tokens da consulta encontrados na UC}, só das UCs com
+        fração >= `minimo`. Os tokens são lidos do mais raro ao mais comum; quando os que
+        faltam já não levam uma UC nova ao mínimo, os comuns ("RUA", "QUADRA") só somam
+        pontos às candidatas, sem percorrer as milhares de UCs que os têm.
+        """
+        total_ucs = max(len(self.por_uc), 1)
+        postagens = []
+        for token in set(consulta):
+            achados = self.equivalentes(token)
+            ucs = set().union(*(self.postagens[t] for t in achados)) if achados else set()
+            postagens.append((math.log(1 + total_ucs / (1 + len(ucs))), ucs))
+        if not postagens:
+            return {}
+        postagens.sort(key=lambda par: len(par[1]))
+        peso_total = sum(peso for peso, _ in postagens)
+        restante = peso_total
+
+        pontos = {}
+        for peso, ucs in postagens:
+            if restante / peso_total >= minimo:
+                for uc in ucs:
+                    pontos[uc] = pontos.get(uc, 0.0) + peso
+            else:
+                for uc in pontos:
+                    if uc in ucs:
+                        pontos[uc] += peso
+            restante -= peso
+        return {uc: valor / peso_total for uc, valor in pontos.items() if valor / peso_total >= minimo}
+
+
+def _historico(periodos, valor, comp):
+    if valor:
+        primeira, ultima = periodos.get(valor, (comp, comp))
+        periodos[valor] = (min(primeira, comp), max(ultima, comp))
+
+
+class CadastroUCs:
+    """
+    Uma ficha por UC com o endereço e o titular da fatura mais recente e o histórico de
+    titulares e endereços (para a troca de titularidade). `atualizar` recebe faturas novas
+    em qualquer ordem; `buscar_*` devolve [(ficha, pontuação)] da melhor para a pior.
+    Um cadastro pode ser compartilhado entre sessões do app: `trava` serializa atualização
+    e busca.
+    """
+
+    def __init__(self):
+        self._fichas = {}
+        self._periodos = {}                      # uc -> ({titular: (de, até)}, {endereço: (de, até)})
+        self._enderecos = _Indice()
+        self._titulares = _Indice()
+        self.sincronizado_ate = 0.0              # gravada_em da última fatura lida da base
+        self.trava = threading.RLock()
+
+    def __len__(self):
+        return len(self._fichas)
+
+    def ficha(self, uc):
+        return self._fichas.get(uc)
+
+    # --- Atualização ---
+    def atualizar(self, faturas) -> int:
+        """Incorpora faturas (dicionários ou registros compactos). Devolve quantas UCs mudaram."""
+        with self.trava:
+            return self._atualizar(faturas)
+
+    def _atualizar(self, faturas) -> int:
+        alteradas = set()
+        for dados in faturas:
+            dados = expandir(dados)
+            uc, comp = dados.get("uc"), competencia(dados.get("ano"), dados.get("mes"))
+            if not uc or comp is None:
+                continue
+            titulares, enderecos = self._periodos.setdefault(uc, ({}, {}))
+            _historico(titulares, dados.get("titular"), comp)
+            _historico(enderecos, dados.get("endereco"), comp)
+            atual = self._fichas.get(uc)
+            if atual is None or comp >= atual.competencia:
+                endereco = dados.get("endereco") or (atual.endereco if atual else "")
+                titular = dados.get("titular") or (atual.titular if atual else "")
+            else:
+                endereco, titular = atual.endereco, atual.titular
+            ficha = FichaUC(
+                uc=uc, endereco=endereco, titular=titular,
+                competencia=max(comp, atual.competencia if atual else comp),
+                titulares=tuple((t, *p) for t, p in sorted(titulares.items(), key=lambda i: i[1])),
+                enderecos=tuple((e, *p) for e, p in sorted(enderecos.items(), key=lambda i: i[1])),
+            )
+            if ficha != atual:
+                self._fichas[uc] = ficha
+                alteradas.add(uc)
+
+        for uc in alteradas:
+            titulares, enderecos = self._periodos[uc]
+            # Endereços e titulares antigos continuam achando a UC
+            self._enderecos.adicionar(uc, [t for e in enderecos for t in termos(e)])
+            self._titulares.adicionar(uc, [t for nome in titulares for t in termos(nome)])
+        return len(alteradas)
+
+    def sincronizar(self, base) -> int:
+        """Lê da base (BaseFaturas) só as faturas gravadas desde a última sincronização."""
+        with self.trava:
+            novas, self.sincronizado_ate = base.gravadas_desde(self.sincronizado_ate)
+            return self._atualizar(novas)
+
+    # --- Busca ---
+    def _buscar(self, indice, texto, minimo, limite) -> list:
+        with self.trava:
+            pontos = indice.buscar(termos(texto), minimo)
+            ordenados = sorted(pontos.items(), key=lambda par: (-par[1], par[0]))[:limite]
+            return [(self._fichas[uc], round(valor, 4)) for uc, valor in ordenados]
+
+    def buscar_endereco(self, texto, minimo=0.6, limite=50) -> list:
+        return self._buscar(self._enderecos, texto, minimo, limite)
+
+    def buscar_titular(self, texto, minimo=0.6, limite=50) -> list:
+        return self._buscar(self._titulares, texto, minimo, limite)
+
+    def buscar_uc(self, prefixo, limite=50) -> list:
+        prefixo = str(prefixo).strip()
+        with self.trava:
+            return [(self._fichas[uc], 1.0) for uc in sorted(self._fichas) if uc.startswith(prefixo)][:limite]
@@ -0,0 +1,146 @@
+import re
+from functools import lru_cache
+from typing import Callable, NamedTuple
+
+SIGLAS_MESES = ("JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ")
+
+
+class Campo(NamedTuple):
+    """
+    Especificação declarativa de um campo da fatura.
+
+    - `padrao`: regex já compilada (compilar uma vez, no import do mapper);
+    - `saidas`: [(nome, extrator, default)], onde `extrator(match)` devolve o valor.
+      Uma mesma regex pode preencher vários campos (ex.: UC, mês e ano);
+    - `bloco`: nome de um sub-bloco de `BLOCOS` onde procurar (None = texto todo);
+    - `ancoras`: literais que toda ocorrência do padrão contém. Quando informados, a
+      regex só roda numa janela de `antes`/`depois` caracteres em volta de cada âncora
+      (localizadas com str.find), em vez de ser testada em todas as posições do texto.
+      Útil para padrões que começam com classe de caracteres, como (\\d{7,}).
+    - `ultimo`: usa a última ocorrência em vez da primeira (ex.: o titular, que só vem
+      limpo no canhoto do fim da fatura).
+
+    Quando mais de um Campo preenche o mesmo nome, vale o primeiro valor não vazio
+    na ordem da lista (usado para fallbacks, ex.: geração na linha -> bloco SCEE).
+    """
+    padrao: re.Pattern
+    saidas: tuple
+    bloco: str = None
+    ancoras: tuple = None
+    antes: int = 40
+    depois: int = 120
+    ultimo: bool = False
+
+
+class Bloco(NamedTuple):
+    """Janela do texto ancorada num marcador fixo (ex.: "INFORMAÇÕES DO SCEE")."""
+    ancora: str
+    tamanho: int
+
+
+def grupo(n: int, conversor: Callable = str) -> Callable:
+    """Extrator que aplica `conversor` ao grupo `n` do match."""
+    return lambda m: conversor(m.group(n))
+
+
+def recortar_blocos(texto: str, blocos: dict) -> dict:
+    recortes = {}
+    for nome, bloco in blocos.items():
+        idx = texto.find(bloco.ancora)
+        recortes[nome] = texto[idx: idx + bloco.tamanho] if idx != -1 else None
+    return recortes
+
+
+@lru_cache(maxsize=None)
+def _agrupar_por_final(ancoras: tuple) -> tuple:
+    """
+    Agrupa as âncoras que terminam no mesmo sinal de pontuação (ex.: "/"):
+    ((caractere, {âncoras}, {tamanhos}), ...). As demais ficam sozinhas no grupo.
+    """
+    grupos = {}
+    for ancora in ancoras:
+        chave = ancora[-1] if not ancora[-1].isalnum() else ancora
+        grupos.setdefault(chave, set()).add(ancora)
+    return tuple((final, frozenset(g), frozenset(len(a) for a in g)) for final, g in grupos.items())
+
+
+def posicoes_ancoras(texto: str, ancoras: tuple) -> list:
+    """
+    Todas as posições (ordenadas) em que qualquer uma das âncoras aparece.
+    Âncoras terminadas no mesmo sinal (ex.: "JAN/" ... "DEZ/") são localizadas numa
+    única varredura por esse caractere, em vez de um str.find completo por âncora.
+    """
+    posicoes = []
+    for final, grupo_ancoras, tamanhos in _agrupar_por_final(ancoras):
+        if len(grupo_ancoras) == 1:
+            (ancora,) = grupo_ancoras
+            idx = texto.find(ancora)
+            while idx != -1:
+                posicoes.append(idx)
+                idx = texto.find(ancora, idx + 1)
+            continue
+        idx = texto.find(final)
+        while idx != -1:
+            for tamanho in tamanhos:
+                inicio = idx - tamanho + 1
+                if inicio >= 0 and texto[inicio: idx + 1] in grupo_ancoras:
+                    posicoes.append(inicio)
+            idx = texto.find(final, idx + 1)
+    posicoes.sort()
+    return posicoes
+
+
+def buscar(campo: Campo, texto: str):
+    """Equivalente a `campo.padrao.search(texto)`, usando as âncoras quando houver."""
+    if campo.ancoras is None:
+        if campo.ultimo:
+            return next(reversed(list(campo.padrao.finditer(texto))), None)
+        return campo.padrao.search(texto)
+    posicoes = posicoes_ancoras(texto, campo.ancoras)
+    for idx in (reversed(posicoes) if campo.ultimo else posicoes):
+        m = campo.padrao.search(texto, max(0, idx - campo.antes), idx + campo.depois)
+        if m:
+            return m
+    return None
+
+
+def encontrar_todos(padrao: re.Pattern, texto: str, ancoras) -> list:
+    """
+    Equivalente a `padrao.findall(texto)` para padrões que sempre começam numa das
+    âncoras: tenta o match só nas posições das âncoras, sem sobreposição.
+    """
+    resultados = []
+    fim_anterior = 0
+    for idx in posicoes_ancoras(texto, ancoras):
+        if idx < fim_anterior:
+            continue
+        m = padrao.match(texto, idx)
+        if m:
+            resultados.append(m.groups())
+            fim_anterior = m.end()
+    return resultados
+
+
+def extrair_campos(texto: str, campos: list, blocos: dict = None, encontrados: set = None) -> dict:
+    """
+    Aplica a lista de `Campo` sobre o texto já normalizado.
+    Cada bloco é recortado uma única vez; campos cujo bloco não existe ficam no default.
+    Se `encontrados` (set) for informado, recebe os nomes cujo padrão casou no texto,
+    para distinguir "não está no texto" de "está, e vale zero".
+    """
+    recortes = recortar_blocos(texto, blocos or {})
+    dados = {}
+    for campo in campos:
+        alvo = texto if campo.bloco is None else recortes[campo.bloco]
+        pendentes = [s for s in campo.saidas if not dados.get(s[0])]
+        if not pendentes:
+            continue
+        m = buscar(campo, alvo) if alvo is not None else None
+        if m and encontrados is not None:
+            encontrados.update(nome for nome, _, _ in pendentes)
+        for nome, extrator, default in pendentes:
+            if m:
+                dados[nome] = extrator(m)
+            elif nome not in dados:
+                dados[nome] = default
+    return dados
@@ -1,142 +1,98 @@
-import openpyxl
-from openpyxl.cell.cell import MergedCell
-import datetime 
+import time
 
-def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias):
-    wb = openpyxl.load_workbook(caminho_entrada)
-    
-    # Preparar Geradoras
-    if "UC GERADORA" in wb.sheetnames:
-        ws_modelo_ger = wb["UC GERADORA"]
-        for i in range(qtd_geradoras):
-            nome_aba = f"UC GERADORA {i+1}" if i > 0 else "UC GERADORA"
-            if i == 0: ws_modelo_ger.title = nome_aba
-            else: 
-                nova = wb.copy_worksheet(ws_modelo_ger)
-                nova.title = nome_aba
-
-    # Preparar Beneficiárias
-    nome_modelo_benef = next((s for s in wb.sheetnames if "UC BENEF" in s.upper()), None)
-    if nome_modelo_benef and qtd_beneficiarias > 0:
-        ws_modelo_ben = wb[nome_modelo_benef]
-        for i in range(qtd_beneficiarias):
-            nome_aba = f"UC BENEF. {i+1}"
-            if i == 0: ws_modelo_ben.title = nome_aba
-            else: 
-                nova = wb.copy_worksheet(ws_modelo_ben)
-                nova.title = nome_aba
+from services.indice_meses import indexar_meses
+from services.linha_do_tempo import distribuir_por_linha, montar_linha_do_tempo
+from services.registros import expandir
+# Preparação do modelo (cache do template + clonagem das abas) é comum aos dois grupos
+from services.modelo_planilha import preparar_planilha
+# Os writers só planejam as escritas; células mescladas e repetidas são resolvidas ao aplicar
+from services.plano_escrita import PlanoEscrita, aplicar
+
+# Definição das Colunas BASE
+COLUNAS = {
+    'leitura_ant': 'B', 'leitura_atual': 'C',
+    'geracao': 'I', 'credito': 'J',
+    'consumo': 'K', 'valor': 'N',
+    'saldo': 'P', # Padrão para Geradora
+    'medidor': 'R', 'leitura_med_ant': 'S', 'leitura_med_atual': 'T'
+}
 
-    return wb
 
-def safe_write(ws, col, row, value):
-    coord = f"{col}{row}"
-    cell = ws[coord]
-    if isinstance(cell, MergedCell):
-        for rng in ws.merged_cells.ranges:
-            if coord in rng:
-                ws[rng.start_cell.coordinate].value = value
-                return
+def planejar_uc(wb, item, plano):
+    """
+    Planeja as escritas das faturas de uma UC ({'tipo', 'indice', 'dados'}) na aba dela;
+    devolve o nome da aba. `dados` pode trazer dicionários dos mappers ou registros
+    compactos (services.registros).
+    """
+    tipo = item['tipo']
+    indice = item['indice']
+    faturas = [expandir(dados) for dados in item['dados']]
+
+    # Nome da aba
+    if tipo == 'geradora':
+        nome_aba = "UC GERADORA" if indice == 1 and "UC GERADORA" in wb.sheetnames else f"UC GERADORA {indice}"
+        col_saldo_atual = 'P' # Geradora usa P
+        cols_uso = COLUNAS
     else:
-        cell.value = value
-
-def salvar_dados_multiplos(wb, dados_estruturados):
-    mapa_meses = {
-        "JAN": "Jan", "FEV": "Fev", "MAR": "Mar", "ABR": "Abr",
-        "MAI": "Mai", "JUN": "Jun", "JUL": "Jul", "AGO": "Ago",
-        "SET": "Set", "OUT": "Out", "NOV": "Nov", "DEZ": "Dez"
-    }
-
-    # Definição das Colunas BASE
-    cols = {
-        'leitura_ant': 'B', 'leitura_atual': 'C',
-        'geracao': 'I', 'credito': 'J',
-        'consumo': 'K', 'valor': 'N',
-        'saldo': 'P', # Padrão para Geradora
-        'medidor': 'R', 'leitura_med_ant': 'S', 'leitura_med_atual': 'T'
-    }
+        nome_aba = f"UC BENEF. {indice}"
+        col_saldo_atual = 'Q' # Beneficiária usa Q (SOLICITADO)
+        cols_uso = {
+        **COLUNAS,
+        'consumo': 'F',
+        'credito': 'H',
+        'valor': 'J',
+        'medidor': 'S',
+        'leitura_med_ant': 'T', 
+        'leitura_med_atual': 'U'
+        }
+    if nome_aba in wb.sheetnames:
+        ws = wb[nome_aba]
 
-    for item in dados_estruturados:
-        tipo = item['tipo']
-        indice = item['indice']
-        faturas = item['dados']
-        
-        # Nome da aba
-        if tipo == 'geradora':
-            nome_aba = "UC GERADORA" if indice == 1 and "UC GERADORA" in wb.sheetnames else f"UC GERADORA {indice}"
-            col_saldo_atual = 'P' # Geradora usa P
-            cols_uso = cols 
-        else:
-            nome_aba = f"UC BENEF. {indice}"
-            col_saldo_atual = 'Q' # Beneficiária usa Q (SOLICITADO)
-            cols_uso = {
-            **cols,
-            'consumo': 'F',
-            'credito': 'H',
-            'valor': 'J',
-            'medidor': 'S',
-            'leitura_med_ant': 'T', 
-            'leitura_med_atual': 'U'
-            }
-        if nome_aba in wb.sheetnames:
-            ws = wb[nome_aba]
-
-            for dados in faturas:
-                # --- 1. DADOS DO MÊS ATUAL (DA FATURA) ---
-                mes_pdf = dados.get("mes", "")
-                if mes_pdf and mes_pdf in mapa_meses:
-                    mes_excel = mapa_meses[mes_pdf]
-
-                    # Achar linha
-                    linha_destino = None
-                    for row in range(5, 40):
-                        celula = ws[f"A{row}"].value
-                        if celula and str(celula).strip() == mes_excel:
-                            linha_destino = row
-                            break
-                        
-                    if linha_destino:
-                        # Preenche tudo
-                        ws[f"{cols['leitura_ant']}{linha_destino}"] = dados["data_leitura_anterior"]
-                        ws[f"{cols['leitura_atual']}{linha_destino}"] = dados["data_leitura_atual"]
-                        ws[f"{cols['geracao']}{linha_destino}"] = dados["energia_gerada"]
-                        ws[f"{cols_uso['credito']}{linha_destino}"] = dados["credito_recebido"]
-                        ws[f"{cols_uso['consumo']}{linha_destino}"] = dados["energia_ativa"]
-                        ws[f"{cols_uso['valor']}{linha_destino}"] = dados["valor_fatura"]
-                        ws[f"{col_saldo_atual}{linha_destino}"] = dados["saldo"] # P ou Q
-                        ws[f"{cols_uso['medidor']}{linha_destino}"] = dados["medidor"]
-                        ws[f"{cols_uso['leitura_med_ant']}{linha_destino}"] = dados["leitura_anterior"]
-                        ws[f"{cols_uso['leitura_med_atual']}{linha_destino}"] = dados["leitura_atual"]
-
-                # --- 2. PREENCHIMENTO RETROATIVO (HISTÓRICO) ---
-                # Útil se enviou apenas 1 fatura e quer preencher os consumos anteriores
-                if "historico" in dados and dados["historico"]:
-                    for hist in dados["historico"]:
-                        mes_hist = hist['mes']
-                        linha_hist = None
-                        for row in range(5, 45):
-                            cell_val = ws[f"A{row}"].value
-                            if not cell_val: continue
-                            mes_comparacao = ""
-                            # Se a célula for Data (comum no Excel), extraímos o mês dela
-                            if isinstance(cell_val, (datetime.datetime, datetime.date)):
-                                # Mapeia o número do mês (1-12) para a sigla (JAN-DEZ)
-                                siglas = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
-                                mes_comparacao = siglas[cell_val.month - 1]
-                            else:
-                                # Se for texto ("Jan", "Janeiro"), normalizamos para comparar
-                                texto_cell = str(cell_val).strip().upper()
-                                for sigla, nome_mapa in mapa_meses.items():
-                                    if sigla in texto_cell or nome_mapa.upper() in texto_cell:
-                                        mes_comparacao = sigla
-                                        break
-                            if mes_comparacao == mes_hist:
-                                linha_hist = row
-                                break
-                        # Preenche o consumo se achar a linha e não for o mês da fatura atual
-                        if linha_hist and mes_hist != dados.get("mes"):
-                            col_cons = cols_uso['consumo']
-                            ws[f"{col_cons}{linha_hist}"] = hist['consumo']
-                                                
+        # Coluna de meses lida uma única vez por aba:
+        # - mês da fatura: texto exatamente como no modelo ("Jan", "Fev"...), linhas 5-39
+        # - histórico: aceita datas ou texto contendo a sigla, linhas 5-44
+        linhas_fatura = indexar_meses(ws, 5, 39, aceitar_data=False, texto_exato=True)
+        linhas_historico = indexar_meses(ws, 5, 44)
+
+        # Uma entrada por mês (faturas + históricos já mesclados): cada célula é gravada uma vez
+        serie = montar_linha_do_tempo(faturas)
+
+        # --- 1. DADOS DO MÊS ATUAL (DA FATURA) ---
+        meses_fatura = distribuir_por_linha([e for e in serie if e['fatura']], linhas_fatura)
+        for linha_destino, entrada in meses_fatura.items():
+            dados = entrada['fatura']
+            # Preenche tudo
+            plano.adicionar(ws, linha_destino, COLUNAS['leitura_ant'], dados["data_leitura_anterior"])
+            plano.adicionar(ws, linha_destino, COLUNAS['leitura_atual'], dados["data_leitura_atual"])
+            plano.adicionar(ws, linha_destino, COLUNAS['geracao'], dados["energia_gerada"])
+            plano.adicionar(ws, linha_destino, cols_uso['credito'], dados["credito_recebido"])
+            plano.adicionar(ws, linha_destino, cols_uso['consumo'], dados["energia_ativa"])
+            plano.adicionar(ws, linha_destino, cols_uso['valor'], dados["valor_fatura"])
+            plano.adicionar(ws, linha_destino, col_saldo_atual, dados["saldo"]) # P ou Q
+            plano.adicionar(ws, linha_destino, cols_uso['medidor'], dados["medidor"])
+            plano.adicionar(ws, linha_destino, cols_uso['leitura_med_ant'], dados["leitura_anterior"])
+            plano.adicionar(ws, linha_destino, cols_uso['leitura_med_atual'], dados["leitura_atual"])
+
+        # --- 2. PREENCHIMENTO RETROATIVO (HISTÓRICO) ---
+        # Útil se enviou apenas 1 fatura e quer preencher os consumos anteriores.
+        # Só nas linhas sem fatura: o dado da própria fatura do mês tem preferência.
+        meses_historico = distribuir_por_linha([e for e in serie if e['historico']], linhas_historico)
+        for linha_hist, entrada in meses_historico.items():
+            if linha_hist not in meses_fatura:
+                plano.adicionar(ws, linha_hist, cols_uso['consumo'], entrada['historico']['consumo'])
+
+    return nome_aba
+
+
+def escrever_uc(wb, item):
+    """Grava as faturas de uma UC na aba dela (planeja e aplica); devolve o nome da aba."""
+    plano = PlanoEscrita()
+    nome_aba = planejar_uc(wb, item, plano)
+    aplicar(wb, plano)
+    return nome_aba
+
+
+def planejar_resumo(wb, dados_estruturados, plano):
     # --- 3. RESUMO (UC e Endereço) ---
     ws_resumo = None
     for sheet in wb.sheetnames:
@@ -150,16 +106,38 @@ def salvar_dados_multiplos(wb, dados_estruturados):
         for item in dados_estruturados:
             if item['tipo'] == 'geradora' and item['dados']:
                 dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                plano.adicionar(ws_resumo, linha_atual, "F", dados_ref.get("uc", ""))
+                plano.adicionar(ws_resumo, linha_atual, "G", dados_ref.get("endereco", ""))
                 linha_atual += 1
         
         # Beneficiárias
         for item in dados_estruturados:
             if item['tipo'] == 'beneficiaria' and item['dados']:
                 dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                plano.adicionar(ws_resumo, linha_atual, "F", dados_ref.get("uc", ""))
+                plano.adicionar(ws_resumo, linha_atual, "G", dados_ref.get("endereco", ""))
                 linha_atual += 1
-                
-    return wb
\ No newline at end of file
+
+
+def escrever_resumo(wb, dados_estruturados):
+    plano = PlanoEscrita()
+    planejar_resumo(wb, dados_estruturados, plano)
+    aplicar(wb, plano)
+
+
+def salvar_dados_multiplos(wb, dados_estruturados, rastreio=None):
+    """Um plano para todas as UCs e o RESUMO, aplicado de uma vez ('aplicacao_plano' no rastreio)."""
+    plano = PlanoEscrita()
+    for item in dados_estruturados:
+        inicio = time.perf_counter()
+        nome_aba = planejar_uc(wb, item, plano)
+        if rastreio is not None:
+            rastreio.registrar('escrita_aba', time.perf_counter() - inicio,
+                               aba=nome_aba, faturas=len(item['dados']), encontrada=nome_aba in wb.sheetnames)
+
+    planejar_resumo(wb, dados_estruturados, plano)
+    inicio = time.perf_counter()
+    celulas = aplicar(wb, plano)
+    if rastreio is not None:
+        rastreio.registrar('aplicacao_plano', time.perf_counter() - inicio, escritas=len(plano), celulas=celulas)
+    return wb
@@ -1,99 +1,83 @@
-import openpyxl
-from openpyxl.cell.cell import MergedCell
-import datetime
-
-def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias):
-    """Prepara o workbook duplicando as abas de modelo."""
-    wb = openpyxl.load_workbook(caminho_entrada)
-    
-    # Preparar Geradoras
-    if "UC GERADORA" in wb.sheetnames:
-        ws_modelo_ger = wb["UC GERADORA"]
-        for i in range(qtd_geradoras):
-            nome_aba = f"UC GERADORA {i+1}" if i > 0 else "UC GERADORA"
-            if i == 0: ws_modelo_ger.title = nome_aba
-            else:
-                nova = wb.copy_worksheet(ws_modelo_ger)
-                nova.title = nome_aba
-
-    # Preparar Beneficiárias
-    nome_modelo_benef = next((s for s in wb.sheetnames if "UC BENEF" in s.upper()), None)
-    if nome_modelo_benef and qtd_beneficiarias > 0:
-        ws_modelo_ben = wb[nome_modelo_benef]
-        for i in range(qtd_beneficiarias):
-            nome_aba = f"UC BENEF. {i+1}"
-            if i == 0: ws_modelo_ben.title = nome_aba
-            else:
-                nova = wb.copy_worksheet(ws_modelo_ben)
-                nova.title = nome_aba
-    return wb
+import time
 
-def safe_write(ws, col, row, value):
-    """Escreve em células, tratando corretamente células mescladas."""
-    coord = f"{col}{row}"
-    cell = ws[coord]
-    if isinstance(cell, MergedCell):
-        for rng in ws.merged_cells.ranges:
-            if coord in rng:
-                ws[rng.start_cell.coordinate].value = value
-                return
-    else:
-        cell.value = value
-
-def salvar_dados_A(wb, dados_estruturados):
-    """Mapeia os dados para as abas individuais, dimensionamento e resumo."""
-    
-    meses_map = {"JAN": 1, "FEV": 2, "MAR": 3, "ABR": 4, "MAI": 5, "JUN": 6, 
-                 "JUL": 7, "AGO": 8, "SET": 9, "OUT": 10, "NOV": 11, "DEZ": 12}
+from services.indice_meses import indexar_meses
+from services.linha_do_tempo import distribuir_por_linha, montar_linha_do_tempo
+from services.registros import expandir
+# Preparação do modelo (cache do template + clonagem das abas) é comum aos dois grupos
+from services.modelo_planilha import preparar_planilha
+# Os writers só planejam as escritas; células mescladas e repetidas são resolvidas ao aplicar
+from services.plano_escrita import PlanoEscrita, aplicar
 
+def aba_geral(wb):
+    """(aba GRUPO A, índice mês -> linha) ou (None, {}) se o modelo não tiver a aba."""
     nome_aba_geral = next((s for s in wb.sheetnames if "GRUPO A" in s.upper()), "GRUPO A")
     ws_geral = wb[nome_aba_geral] if nome_aba_geral in wb.sheetnames else None
+    # Meses (datas na coluna A) indexados uma única vez por aba
+    linhas_geral = indexar_meses(ws_geral, 5, 24, aceitar_texto=False) if ws_geral else {}
+    return ws_geral, linhas_geral
 
-    for item in dados_estruturados:
-        tipo, indice, faturas = item['tipo'], item['indice'], item['dados']
-        nome_aba_uc = "UC GERADORA" if tipo == 'geradora' and indice == 1 else (f"UC GERADORA {indice}" if tipo == 'geradora' else f"UC BENEF. {indice}")
-        ws_uc = wb[nome_aba_uc] if nome_aba_uc in wb.sheetnames else None
-
-        for dados in faturas:
-            mes_num = meses_map.get(dados.get("mes"))
-            if not mes_num: continue
-
-            # --- 1. ABA DIMENSIONAMENTO GERAL ---
-            if ws_geral:
-                for row in range(5, 25):
-                    celula = ws_geral[f"A{row}"].value
-                    if isinstance(celula, datetime.datetime) and celula.month == mes_num:
-                        # Dados consumo 
-                        ws_geral[f"B{row}"] = dados.get("c_p", 0.0)
-                        ws_geral[f"C{row}"] = dados.get("c_fp", 0.0)
-                        ws_geral[f"D{row}"] = dados.get("c_hr", 0.0)
-                        # Dados demanda 
-                        ws_geral[f"M{row}"] = dados.get("d_p", 0.0)
-                        ws_geral[f"N{row}"] = dados.get("d_fp", 0.0)
-                        ws_geral[f"O{row}"] = dados.get("d_hr", 0.0)
-                        break
-
-            # --- 2. ABAS INDIVIDUAIS (Parte Amarela) ---
-            if ws_uc:
-                for row in range(5, 45):
-                    celula = ws_uc[f"A{row}"].value
-                    if isinstance(celula, datetime.datetime) and celula.month == mes_num:
-                        ws_uc[f"B{row}"] = dados.get("data_leitura_anterior")
-                        ws_uc[f"C{row}"] = dados.get("data_leitura_atual")
-                        c_total = dados.get("c_p", 0) + dados.get("c_fp", 0) + dados.get("c_hr", 0)
-
-                        if tipo == 'geradora':
-                            ws_uc[f"I{row}"] = dados.get("energia_gerada", 0.0)
-                            ws_uc[f"J{row}"] = dados.get("credito_recebido", 0.0)
-                            ws_uc[f"N{row}"] = dados.get("valor_fatura", 0.0)
-                            ws_uc[f"P{row}"] = dados.get("saldo", 0.0)
-                        else:
-                            ws_uc[f"F{row}"] = c_total
-                            ws_uc[f"H{row}"] = dados.get("credito_recebido", 0.0)
-                            ws_uc[f"J{row}"] = dados.get("valor_fatura", 0.0)
-                            ws_uc[f"Q{row}"] = dados.get("saldo", 0.0)
-                        break
 
+def planejar_uc(wb, item, plano, geral=None):
+    """
+    Planeja as escritas das faturas de uma UC na aba dela e no dimensionamento geral;
+    devolve o nome da aba. `geral` é o retorno de aba_geral(wb), para não reindexar a aba a cada UC.
+    `dados` pode trazer dicionários dos mappers ou registros compactos (services.registros).
+    """
+    ws_geral, linhas_geral = geral or aba_geral(wb)
+    tipo, indice = item['tipo'], item['indice']
+    faturas = [expandir(dados) for dados in item['dados']]
+    nome_aba_uc = "UC GERADORA" if tipo == 'geradora' and indice == 1 else (f"UC GERADORA {indice}" if tipo == 'geradora' else f"UC BENEF. {indice}")
+    ws_uc = wb[nome_aba_uc] if nome_aba_uc in wb.sheetnames else None
+    linhas_uc = indexar_meses(ws_uc, 5, 44, aceitar_texto=False) if ws_uc else {}
+
+    # Um registro por mês (reemissões resolvidas pela leitura mais recente), em ordem
+    # cronológica: o resultado não depende da ordem em que os PDFs foram enviados
+    serie = [e for e in montar_linha_do_tempo(faturas) if e['fatura']]
+
+    # --- 1. ABA DIMENSIONAMENTO GERAL ---
+    if ws_geral:
+        for row, entrada in distribuir_por_linha(serie, linhas_geral).items():
+            dados = entrada['fatura']
+            # Dados consumo 
+            plano.adicionar(ws_geral, row, "B", dados.get("c_p", 0.0))
+            plano.adicionar(ws_geral, row, "C", dados.get("c_fp", 0.0))
+            plano.adicionar(ws_geral, row, "D", dados.get("c_hr", 0.0))
+            # Dados demanda 
+            plano.adicionar(ws_geral, row, "M", dados.get("d_p", 0.0))
+            plano.adicionar(ws_geral, row, "N", dados.get("d_fp", 0.0))
+            plano.adicionar(ws_geral, row, "O", dados.get("d_hr", 0.0))
+
+    # --- 2. ABAS INDIVIDUAIS (Parte Amarela) ---
+    if ws_uc:
+        for row, entrada in distribuir_por_linha(serie, linhas_uc).items():
+            dados = entrada['fatura']
+            plano.adicionar(ws_uc, row, "B", dados.get("data_leitura_anterior"))
+            plano.adicionar(ws_uc, row, "C", dados.get("data_leitura_atual"))
+            c_total = dados.get("c_p", 0) + dados.get("c_fp", 0) + dados.get("c_hr", 0)
+
+            if tipo == 'geradora':
+                plano.adicionar(ws_uc, row, "I", dados.get("energia_gerada", 0.0))
+                plano.adicionar(ws_uc, row, "J", dados.get("credito_recebido", 0.0))
+                plano.adicionar(ws_uc, row, "N", dados.get("valor_fatura", 0.0))
+                plano.adicionar(ws_uc, row, "P", dados.get("saldo", 0.0))
+            else:
+                plano.adicionar(ws_uc, row, "F", c_total)
+                plano.adicionar(ws_uc, row, "H", dados.get("credito_recebido", 0.0))
+                plano.adicionar(ws_uc, row, "J", dados.get("valor_fatura", 0.0))
+                plano.adicionar(ws_uc, row, "Q", dados.get("saldo", 0.0))
+
+    return nome_aba_uc
+
+
+def escrever_uc(wb, item, geral=None):
+    """Grava as faturas de uma UC (planeja e aplica); devolve o nome da aba."""
+    plano = PlanoEscrita()
+    nome_aba_uc = planejar_uc(wb, item, plano, geral)
+    aplicar(wb, plano)
+    return nome_aba_uc
+
+
+def planejar_resumo(wb, dados_estruturados, plano):
     # --- 3. RESUMO (UC e Endereço) ---
     ws_resumo = next((wb[s] for s in wb.sheetnames if "RESUMO" in s.upper()), None)
     if ws_resumo:
@@ -102,16 +86,42 @@ def salvar_dados_A(wb, dados_estruturados):
         for item in dados_estruturados:
             if item['tipo'] == 'geradora' and item['dados']:
                 dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                plano.adicionar(ws_resumo, linha_atual, "F", dados_ref.get("uc", ""))
+                plano.adicionar(ws_resumo, linha_atual, "G", dados_ref.get("endereco", ""))
                 linha_atual += 1
         
         # Beneficiárias
         for item in dados_estruturados:
             if item['tipo'] == 'beneficiaria' and item['dados']:
                 dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                plano.adicionar(ws_resumo, linha_atual, "F", dados_ref.get("uc", ""))
+                plano.adicionar(ws_resumo, linha_atual, "G", dados_ref.get("endereco", ""))
                 linha_atual += 1
-                
-    return wb
\ No newline at end of file
+
+
+def escrever_resumo(wb, dados_estruturados):
+    plano = PlanoEscrita()
+    planejar_resumo(wb, dados_estruturados, plano)
+    aplicar(wb, plano)
+
+
+def salvar_dados_A(wb, dados_estruturados, rastreio=None):
+    """
+    Mapeia os dados para as abas individuais, dimensionamento e resumo: um plano para
+    tudo, aplicado de uma vez ('aplicacao_plano' no rastreio). Na GRUPO A vale a última UC.
+    """
+    geral = aba_geral(wb)
+    plano = PlanoEscrita()
+    for item in dados_estruturados:
+        inicio = time.perf_counter()
+        nome_aba_uc = planejar_uc(wb, item, plano, geral)
+        if rastreio is not None:
+            rastreio.registrar('escrita_aba', time.perf_counter() - inicio,
+                               aba=nome_aba_uc, faturas=len(item['dados']), encontrada=nome_aba_uc in wb.sheetnames)
+
+    planejar_resumo(wb, dados_estruturados, plano)
+    inicio = time.perf_counter()
+    celulas = aplicar(wb, plano)
+    if rastreio is not None:
+        rastreio.registrar('aplicacao_plano', time.perf_counter() - inicio, escritas=len(plano), celulas=celulas)
+    return wb
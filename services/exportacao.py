@@ -0,0 +1,90 @@
+"""
+Exportação tabular das faturas extraídas (CSV ou Parquet), sem passar pelo openpyxl.
+
+Para BI e conciliação de faturamento, que só precisam dos números: uma linha por UC e
+mês, com as faturas e o histórico de consumo consolidados pela mesma linha do tempo dos
+writers (services.linha_do_tempo). Meses sem fatura, só com histórico, vêm com
+origem 'historico' e apenas as colunas de consumo/demanda preenchidas.
+
+Colunas de consumo: Grupo A por posto (c_p, c_fp, c_hr, d_p, d_fp, d_hr); Grupo B
+energia_ativa. CSV com ";" e UTF-8 com BOM (abre direto no Excel), ponto decimal.
+Parquet exige pyarrow ou fastparquet (opcional: pip install pyarrow).
+
+O pandas só é importado ao montar a tabela: o app lê MIME e formatos_disponiveis a
+cada página aberta, sem exportar nada.
+"""
+import importlib.util
+import io
+from typing import TYPE_CHECKING
+
+from services.base_faturas import competencia
+from services.linha_do_tempo import montar_linha_do_tempo
+from services.registros import expandir
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Colunas de consumo por grupo -> campo correspondente no histórico da fatura
+COLUNAS_POSTO = {
+    "A": {"c_p": "c_p", "c_fp": "c_fp", "c_hr": "c_hr", "d_p": "d_p", "d_fp": "d_fp", "d_hr": "d_hr"},
+    "B": {"energia_ativa": "consumo"},
+}
+# Demais campos, só nos meses com fatura
+CAMPOS_FATURA = {
+    "A": ("energia_gerada", "credito_recebido", "saldo", "valor_fatura",
+          "data_leitura_anterior", "data_leitura_atual", "endereco", "titular"),
+    "B": ("energia_gerada", "credito_recebido", "saldo", "valor_fatura", "medidor", "leitura_anterior",
+          "leitura_atual", "data_leitura_anterior", "data_leitura_atual", "endereco", "titular"),
+}
+IDENTIFICACAO = ("tipo", "indice", "uc", "competencia", "ano", "mes", "origem")
+
+MIME = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def formatos_disponiveis() -> list:
+    """CSV sempre; Parquet se houver um engine do pandas instalado."""
+    engines = ("pyarrow", "fastparquet")
+    return ["csv"] + (["parquet"] if any(importlib.util.find_spec(e) for e in engines) else [])
+
+
+def tabela_faturas(dados_estruturados, grupo) -> "pd.DataFrame":
+    """Uma linha por UC e mês (ordem das UCs e cronológica), a partir dos dados dos writers."""
+    import pandas as pd
+    if grupo not in COLUNAS_POSTO:
+        raise ValueError(f"Grupo tarifário desconhecido: {grupo}")
+    postos, campos = COLUNAS_POSTO[grupo], CAMPOS_FATURA[grupo]
+    vazio = (None,) * len(campos)
+    linhas = []
+    for item in dados_estruturados:
+        faturas = [expandir(dados) for dados in item['dados']]
+        uc = next((dados.get("uc") for dados in faturas if dados.get("uc")), "")
+        for entrada in montar_linha_do_tempo(faturas):
+            fatura, historico = entrada['fatura'], entrada['historico']
+            if fatura:
+                consumo = tuple(fatura.get(coluna) for coluna in postos)
+                extras = tuple(fatura.get(campo) for campo in campos)
+            else:
+                consumo = tuple(historico.get(campo) for campo in postos.values())
+                extras = vazio
+            linhas.append((
+                item['tipo'], item['indice'], uc, competencia(entrada['ano'], entrada['mes']),
+                entrada['ano'], entrada['mes'], "fatura" if fatura else "historico",
+                *consumo, *extras,
+            ))
+    tabela = pd.DataFrame.from_records(linhas, columns=[*IDENTIFICACAO, *postos, *campos])
+    tabela[list(postos)] = tabela[list(postos)].astype("float64")
+    inteiros = {coluna: "Int64" for coluna in ("competencia", "ano", "leitura_anterior", "leitura_atual")
+                if coluna in tabela}
+    return tabela.astype({"indice": "int64", **inteiros})
+
+
+def exportar(tabela, formato, destino=None):
+    """Grava a tabela em `destino` (caminho ou arquivo); sem destino, devolve os bytes."""
+    if formato not in MIME:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    saida = io.BytesIO() if destino is None else destino
+    if formato == "csv":
+        tabela.to_csv(saida, index=False, sep=";", encoding="utf-8-sig")
+    else:
+        tabela.to_parquet(saida, index=False)
+    return saida.getvalue() if destino is None else destino
@@ -0,0 +1,359 @@
+import importlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from services import fatura_mapper, fatura_mapperA, leitores_pdf
+from services.cache_faturas import hash_pdf
+from utils.arquivos import ler_bytes, mapear
+
+# Layout de fatura -> mapper. Os workers recebem só o nome do layout (picklable) e
+# resolvem a função aqui, do lado do processo filho. Os layouts "A" e "B" (Equatorial
+# Goiás) têm o nome do grupo tarifário; outros entram com registrar_layout().
+MAPPERS = {}
+VERSOES = {}
+# Mesmo mapper, devolvendo também os campos obrigatórios ainda não encontrados
+PARCIAIS = {}
+# Layout -> grupo tarifário (define o writer da planilha, services.pipeline)
+GRUPO_DO_LAYOUT = {}
+# Layout -> trechos do texto que o identificam na detecção automática
+MARCADORES = {}
+# Layout -> módulo do mapper, para os processos de extração registrarem o layout de novo
+MODULOS = {}
+
+# Grupo "auto": o layout de cada fatura é detectado pelo texto (lotes mistos A/B)
+AUTO = "auto"
+# "Classificação: B B1 RESIDENCIAL ..." / "Classificação: A A4 COMERCIAL ..."
+PADRAO_CLASSIFICACAO = re.compile(r"CLASSIFICA[ÇC][ÃA]O:\s*([AB])\b")
+
+
+def registrar_layout(nome, grupo, mapper):
+    """
+    Inclui um layout de fatura (ex.: outra distribuidora). `mapper` é um módulo com a
+    interface de services/fatura_mapper.py: extrair_fatura, extrair_parcial,
+    VERSAO_MAPPER e MARCADORES. Layouts registrados depois são testados antes na
+    detecção automática, então um layout específico vence o genérico do mesmo grupo.
+    Os processos de extração não herdam o registro (spawn): cada um importa o módulo do
+    mapper pelo nome e registra o layout de novo (ver criar_pool).
+    """
+    MAPPERS[nome] = mapper.extrair_fatura
+    VERSOES[nome] = mapper.VERSAO_MAPPER
+    PARCIAIS[nome] = mapper.extrair_parcial
+    GRUPO_DO_LAYOUT[nome] = grupo
+    MARCADORES[nome] = tuple(mapper.MARCADORES)
+    MODULOS[nome] = getattr(mapper, "__name__", None)
+
+
+registrar_layout("A", "A", fatura_mapperA)
+registrar_layout("B", "B", fatura_mapper)
+
+# Leitor de PDF padrão de cada grupo (services.leitores_pdf). Trocar o leitor muda a
+# ordem dos caracteres que chega às regex: só vale com o benchmark
+# (benchmarks/bench_leitores.py) mostrando dicionários idênticos para o grupo.
+LEITOR_POR_GRUPO = {
+    grupo: os.environ.get(f"BALANCO_LEITOR_PDF_{grupo}", leitores_pdf.PADRAO) for grupo in ("A", "B")
+}
+
+
+def classificar(texto: str):
+    """
+    Layout da fatura pelo texto, ou None se nada o identifica (ainda). A linha
+    "Classificação:" restringe a busca ao grupo tarifário; dentro dele vale o primeiro
+    layout (do mais recente ao mais antigo) com algum marcador no texto. Com a linha e
+    sem marcador, fica o primeiro layout registrado para o grupo.
+    """
+    texto_norm = " ".join(texto.upper().split())
+    m = PADRAO_CLASSIFICACAO.search(texto_norm)
+    candidatos = [nome for nome in reversed(MAPPERS) if not m or GRUPO_DO_LAYOUT[nome] == m.group(1)]
+    for nome in candidatos:
+        if any(marcador in texto_norm for marcador in MARCADORES[nome]):
+            return nome
+    return candidatos[-1] if m and candidatos else None
+
+
+def versao_cache(grupo: str) -> str:
+    """Versão usada no cache. No modo automático depende de todos os layouts (e da detecção)."""
+    if grupo != AUTO:
+        return VERSOES[grupo]
+    return "auto:" + ",".join(f"{nome}={versao}" for nome, versao in VERSOES.items())
+
+
+def grupo_predominante(dados_estruturados) -> str:
+    """Grupo tarifário da maioria das faturas reconhecidas no modo automático."""
+    contagem = Counter(
+        GRUPO_DO_LAYOUT[dados['layout']]
+        for item in dados_estruturados for dados in item['dados'] if dados.get('layout')
+    )
+    if not contagem:
+        raise ValueError("Nenhuma fatura com layout reconhecido (Grupo A ou B).")
+    return contagem.most_common(1)[0][0]
+
+
+def separar_grupo(dados_estruturados, grupo) -> tuple:
+    """
+    Mantém só as faturas do `grupo` (modo automático). Devolve (dados_estruturados
+    filtrados, [(posição da UC, posição do arquivo, grupo detectado ou None)] das demais).
+    """
+    filtrados, fora = [], []
+    for pos_item, item in enumerate(dados_estruturados):
+        faturas = []
+        for pos_arq, dados in enumerate(item['dados']):
+            grupo_fatura = GRUPO_DO_LAYOUT.get(dados.get('layout'))
+            if grupo_fatura == grupo:
+                faturas.append(dados)
+            else:
+                fora.append((pos_item, pos_arq, grupo_fatura))
+        filtrados.append({**item, 'dados': faturas})
+    return filtrados, fora
+
+
+def workers_padrao() -> int:
+    """Quantidade padrão de processos: todos os núcleos menos um (mínimo 1)."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+# Os pools são criados a partir de threads (sessões do Streamlit, FilaTarefas): um fork
+# de processo com várias threads pode herdar um lock travado e o filho fica parado.
+# Com spawn o filho começa de um interpretador novo.
+CONTEXTO_PROCESSOS = multiprocessing.get_context("spawn")
+
+
+def _registrar_layouts(layouts):
+    # Inicializador dos processos do pool: layouts registrados fora deste módulo
+    for nome, grupo, modulo in layouts:
+        if nome not in MAPPERS:
+            registrar_layout(nome, grupo, importlib.import_module(modulo))
+
+
+def criar_pool(max_workers) -> ProcessPoolExecutor:
+    """Pool de processos (spawn) com os layouts registrados até aqui."""
+    layouts = [(nome, GRUPO_DO_LAYOUT[nome], modulo) for nome, modulo in MODULOS.items() if modulo]
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=CONTEXTO_PROCESSOS,
+                               initializer=_registrar_layouts, initargs=(layouts,))
+
+
+# PDFs abertos ao mesmo tempo no servidor, somando todas as extrações em andamento
+# (tarefas simultâneas e seus processos): cada PDF aberto tem a árvore de objetos do
+# pdfplumber em memória, então o pico não depende do tamanho dos lotes.
+PDFS_ABERTOS = max(1, int(os.environ.get("BALANCO_PDFS_ABERTOS", workers_padrao())))
+_vagas_pdf = threading.BoundedSemaphore(PDFS_ABERTOS)
+
+
+def paginas_pdf(conteudo, leitor: str = None):
+    """Texto de cada página, extraído só quando a página é pedida."""
+    return leitores_pdf.paginas(conteudo, leitor)
+
+
+def extrair_texto_pdf(conteudo: bytes, leitor: str = None) -> str:
+    return "".join(paginas_pdf(conteudo, leitor))
+
+
+def chave_cache(conteudo, leitor: str = None) -> str:
+    """Chave do PDF no cache; o texto depende do leitor, então leitores alternativos têm chave própria."""
+    chave = hash_pdf(conteudo)
+    return chave if (leitor or leitores_pdf.PADRAO) == leitores_pdf.PADRAO else f"{chave}-{leitor}"
+
+
+def ler_ate_completar(conteudo, grupo: str, leitor: str = None) -> tuple:
+    """
+    Lê o PDF página a página e para assim que o mapper encontra todos os campos
+    obrigatórios (cabeçalho, leituras, total, bloco do SCEE e tabela de histórico
+    costumam estar nas primeiras páginas; o resto é verso e anexos). Se algum faltar, segue até o fim do PDF, o que
+    equivale à extração completa.
+    Com grupo AUTO, o layout é detectado pelo texto já lido (normalmente a primeira
+    página) e o mapper dele segue a partir dali; os dados trazem 'layout' (None se
+    nenhum layout foi reconhecido no PDF inteiro).
+    Devolve (texto lido, dados, {'extracao_s', 'parse_s', 'paginas', 'completo'}).
+    """
+    layout = None if grupo == AUTO else grupo
+    partes = []
+    extracao_s = parse_s = 0.0
+    dados, faltando = None, True
+    paginas = iter(paginas_pdf(conteudo, leitor or LEITOR_POR_GRUPO.get(grupo, leitores_pdf.PADRAO)))
+    try:
+        while faltando:
+            inicio = time.perf_counter()
+            pagina = next(paginas, None)
+            meio = time.perf_counter()
+            extracao_s += meio - inicio
+            if pagina is None:
+                break
+            partes.append(pagina)
+            texto = "".join(partes)
+            if layout is None:
+                layout = classificar(texto)
+            if layout is not None:
+                dados, faltando = PARCIAIS[layout](texto)
+            parse_s += time.perf_counter() - meio
+    finally:
+        # Geradores dos leitores liberam o PDF no close(); outros iteráveis não têm close
+        fechar = getattr(paginas, "close", None)
+        if fechar:
+            fechar()
+
+    texto = "".join(partes)
+    if dados is None:  # PDF sem páginas ou sem layout reconhecido
+        dados = MAPPERS[layout](texto) if layout else {}
+    if grupo == AUTO:
+        dados['layout'] = layout
+    return texto, dados, {'extracao_s': extracao_s, 'parse_s': parse_s,
+                          'paginas': len(partes), 'completo': bool(faltando)}
+
+
+def processar_pdf(conteudo, grupo: str, leitor: str = None) -> tuple:
+    """
+    Unidade de trabalho do pool: PDF -> (texto, dicionário da fatura, tempos).
+    `conteudo` são os bytes ou o caminho do PDF em disco, mapeado em memória aqui (no
+    processo filho só passa o caminho); os leitores em leitores_pdf.POR_CAMINHO abrem o
+    próprio arquivo. `tempos` traz 'extracao_s' (pdfplumber),
+    'parse_s' (mapper) e as páginas lidas, medidos no processo filho.
+    """
+    if isinstance(conteudo, str) and \
+            (leitor or LEITOR_POR_GRUPO.get(grupo, leitores_pdf.PADRAO)) not in leitores_pdf.POR_CAMINHO:
+        with mapear(conteudo) as mapa:
+            return ler_ate_completar(mapa, grupo, leitor)
+    return ler_ate_completar(conteudo, grupo, leitor)
+
+
+def reprocessar_texto(texto: str, grupo: str) -> tuple:
+    """Mapper do grupo (ou do layout detectado, no modo AUTO) sobre um texto já extraído: (dados, faltando)."""
+    layout = classificar(texto) if grupo == AUTO else grupo
+    if layout is None:
+        return {'layout': None}, {"layout"}
+    dados, faltando = PARCIAIS[layout](texto)
+    if grupo == AUTO:
+        dados['layout'] = layout
+    return dados, faltando
+
+
+def _nome_arquivo(arquivo) -> str:
+    return getattr(arquivo, "name", None) or (arquivo if isinstance(arquivo, str) else "")
+
+
+def _identificar(arquivo, leitor, com_chave) -> tuple:
+    """
+    (conteúdo para processar_pdf, tamanho, chave do cache ou None). Arquivos em disco
+    (caminho ou ArquivoEmDisco) seguem como caminho e o hash é calculado sobre o mmap:
+    o lote não fica inteiro em memória à espera dos processos.
+    """
+    caminho = arquivo if isinstance(arquivo, str) else getattr(arquivo, "caminho", None)
+    if caminho is None:
+        conteudo = ler_bytes(arquivo)
+        return conteudo, len(conteudo), chave_cache(conteudo, leitor) if com_chave else None
+    with mapear(caminho) as mapa:
+        return caminho, len(mapa), chave_cache(mapa, leitor) if com_chave else None
+
+
+def extrair_lote(dados_processamento, grupo, max_workers=None, ao_concluir=None, cache=None, rastreio=None,
+                 leitor=None) -> list:
+    """
+    Extrai todas as faturas de `dados_processamento` em paralelo.
+
+    `dados_processamento` segue o formato do app: [{'tipo', 'indice', 'arquivos'}].
+    `ao_concluir(concluidos, total, item)` é chamado a cada PDF finalizado, na ordem
+    em que terminam, para alimentar a barra de progresso.
+    Retorna [{'tipo', 'indice', 'dados'}] na mesma ordem de entrada (UCs e arquivos),
+    que é o formato esperado pelos writers.
+    Com `cache` (CacheFaturas), PDFs já vistos não passam pelo pdfplumber nem pelo mapper.
+    Com `rastreio` (services.rastreio.Rastreio), cada PDF gera um evento 'fatura' com a
+    origem do resultado (cache, texto em cache ou pdf) e os tempos de extração e parse.
+    `leitor` escolhe o leitor de PDF (padrão: LEITOR_POR_GRUPO do grupo).
+    Com grupo AUTO, cada fatura é lida com o mapper do layout detectado (ver
+    ler_ate_completar) e traz 'layout'; lotes com faturas A e B são aceitos.
+    Arquivos em disco (caminhos, services.ingestao.ArquivoEmDisco) vão para os processos
+    como caminho e são mapeados em memória lá; no máximo PDFS_ABERTOS PDFs ficam abertos
+    ao mesmo tempo, somando as extrações simultâneas.
+    """
+    if grupo not in MAPPERS and grupo != AUTO:
+        raise ValueError(f"Grupo tarifário desconhecido: {grupo}")
+    versao = versao_cache(grupo)
+    leitor = leitor or LEITOR_POR_GRUPO.get(grupo, leitores_pdf.PADRAO)
+
+    resultados = [[None] * len(item['arquivos']) for item in dados_processamento]
+    total = sum(len(item['arquivos']) for item in dados_processamento)
+    concluidos = 0
+
+    def _anotar(pos_item, pos_arq, origem, extracao_s=0.0, parse_s=0.0, **extras):
+        if rastreio is None:
+            return
+        item = dados_processamento[pos_item]
+        rastreio.registrar(
+            'fatura', extracao_s + parse_s,
+            tipo=item['tipo'], indice=item['indice'], arquivo=_nome_arquivo(item['arquivos'][pos_arq]),
+            bytes=tamanhos[(pos_item, pos_arq)], origem=origem,
+            extracao_s=round(extracao_s, 4), parse_s=round(parse_s, 4), **extras,
+        )
+
+    def _concluir(pos_item, pos_arq, dados):
+        nonlocal concluidos
+        resultados[pos_item][pos_arq] = dados
+        concluidos += 1
+        if ao_concluir:
+            ao_concluir(concluidos, total, dados_processamento[pos_item])
+
+    tarefas = []
+    tamanhos = {}
+    for pos_item, item in enumerate(dados_processamento):
+        for pos_arq, arquivo in enumerate(item['arquivos']):
+            conteudo, tamanhos[(pos_item, pos_arq)], chave = _identificar(arquivo, leitor, cache is not None)
+            if cache:
+                origem = 'cache'
+                dados = cache.obter_dados(chave, versao)
+                parse_s = 0.0
+                if dados is None:
+                    # Mapper novo, PDF conhecido: só refaz as regex sobre o texto guardado.
+                    # O texto pode ser parcial (leitura interrompida); se o mapper novo
+                    # não achar tudo nele, o PDF é lido de novo.
+                    texto = cache.obter_texto(chave)
+                    if texto is not None:
+                        inicio = time.perf_counter()
+                        dados, faltando = reprocessar_texto(texto, grupo)
+                        parse_s = time.perf_counter() - inicio
+                        if faltando:
+                            dados = None
+                        else:
+                            origem = 'cache_texto'
+                            cache.guardar(chave, versao, None, dados)
+                if dados is not None:
+                    _anotar(pos_item, pos_arq, origem, parse_s=parse_s)
+                    _concluir(pos_item, pos_arq, dados)
+                    continue
+            tarefas.append((pos_item, pos_arq, chave, conteudo))
+
+    def _registrar(pos_item, pos_arq, chave, texto, dados, tempos):
+        if cache:
+            cache.guardar(chave, versao, texto, dados)
+        _anotar(pos_item, pos_arq, 'pdf', **tempos)
+        _concluir(pos_item, pos_arq, dados)
+
+    max_workers = min(max_workers or workers_padrao(), len(tarefas), PDFS_ABERTOS) if tarefas else 1
+
+    if max_workers <= 1:
+        # Sem ganho em subir um pool para um único processo
+        for pos_item, pos_arq, chave, conteudo in tarefas:
+            with _vagas_pdf:
+                resultado = processar_pdf(conteudo, grupo, leitor)
+            _registrar(pos_item, pos_arq, chave, *resultado)
+    else:
+        with criar_pool(max_workers) as pool:
+            fila, futuros = deque(tarefas), {}
+            while fila or futuros:
+                # Submete enquanto houver vaga; sem nenhum PDF deste lote em andamento,
+                # espera a vaga de outra extração
+                while fila and _vagas_pdf.acquire(blocking=not futuros):
+                    pos_item, pos_arq, chave, conteudo = fila.popleft()
+                    futuro = pool.submit(processar_pdf, conteudo, grupo, leitor)
+                    futuro.add_done_callback(lambda _: _vagas_pdf.release())
+                    futuros[futuro] = (pos_item, pos_arq, chave)
+                prontos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    _registrar(*futuros.pop(futuro), *futuro.result())
+
+    return [
+        {'tipo': item['tipo'], 'indice': item['indice'], 'dados': resultados[pos_item]}
+        for pos_item, item in enumerate(dados_processamento)
+    ]
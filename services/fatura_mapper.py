@@ -1,5 +1,10 @@
 import re
 
+from services.campos import SIGLAS_MESES, Bloco, Campo, encontrar_todos, extrair_campos, grupo
+
+# Incrementar sempre que a extração mudar: invalida o cache de faturas já lidas
+VERSAO_MAPPER = "B-3"
+
 def normalizar_numero_br(valor: str) -> float:
     if not valor:
         return 0.0
@@ -12,19 +17,104 @@ def normalizar_numero_br(valor: str) -> float:
 def normalizar_texto(texto: str) -> str:
     return " ".join(texto.upper().split())
 
+MESES = "(" + "|".join(SIGLAS_MESES) + ")"
+# Âncoras do cabeçalho "UC MÊS/ANO" (ex.: 16676257 DEZ/2025)
+ANCORAS_MES_ANO = tuple(f"{sigla}/" for sigla in SIGLAS_MESES)
+# O histórico sempre começa em "MES/" ou "MES-"
+ANCORAS_HISTORICO = ANCORAS_MES_ANO + tuple(f"{sigla}-" for sigla in SIGLAS_MESES)
+
+# Cabeçalho da tabela de histórico: as linhas só são procuradas depois dele (antes, o
+# "DEZ/2025 14/01/2026" do cabeçalho da fatura também casaria com o padrão)
+CABECALHO_HISTORICO = "MÊS/ANO CONSUMO FATURADO"
+
+# Regex para capturar: MES/ANO (2 digitos) espaço NUMERO (kWh)
+# Ex: DEZ/24 518
+PADRAO_HISTORICO = re.compile(MESES + r"[\/\-](\d{2,4})\s+([\d\.,]+)")
+
+# Nome do titular (só letras e pontuação de nomes/razões sociais) antes de "CNPJ/CPF:"
+PADRAO_TITULAR = re.compile(r"(?<!\S)((?:[A-ZÀ-ÖØ-Ý&'./\-]+ )+)CNPJ/CPF:")
+
+# Campos que precisam ter aparecido no texto para a leitura do PDF página a página
+# poder parar (services.extracao). Geração fica de fora: beneficiárias não a têm.
+OBRIGATORIOS = frozenset({"uc", "data_leitura_anterior", "medidor", "energia_ativa", "valor_fatura", "historico"})
+# Faturas com compensação citam o SCEE nos itens faturados ("CONSUMO SCEE", "INJEÇÃO
+# SCEE"); nelas, crédito e saldo do bloco do SCEE também são obrigatórios. Sem SCEE
+# no texto, exigi-los forçaria ler o PDF inteiro.
+OBRIGATORIOS_SCEE = frozenset({"credito_recebido", "saldo"})
+
+# Trechos que só aparecem no layout do Grupo B (medição em posto único), usados pela
+# detecção automática do layout (services.extracao.classificar)
+MARCADORES = ("KWH ÚNICO",)
+
+# Janela após o marcador do SCEE (onde ficam geração do ciclo, crédito e saldo)
+BLOCOS = {"scee": Bloco("INFORMAÇÕES DO SCEE", 1000)}
+
+# Especificação dos campos, compilada uma vez no import. A ordem define a ordem das
+# chaves no dicionário e a prioridade dos fallbacks (primeiro valor não vazio vence).
+CAMPOS = [
+    # --- 1. MÊS E ANO ATUAL ---
+    Campo(re.compile(r"(\d{7,})\s+" + MESES + r"/(\d{4})"), (
+        ("uc", grupo(1), ""),
+        ("mes", grupo(2), ""),
+        ("ano", grupo(3, int), 0),
+    ), ancoras=ANCORAS_MES_ANO, depois=len("DEZ/2025")),
+    # --- 2. ENDEREÇO ---
+    Campo(re.compile(r"ENDEREÇO DE ENTREGA:(.*?)(?:CEP:|$)"), (
+        ("endereco", lambda m: m.group(1).strip(), ""),
+    )),
+    # Titular: nome antes do "CNPJ/CPF:" do canhoto (a última ocorrência; a do
+    # cabeçalho vem grudada no texto anterior)
+    Campo(PADRAO_TITULAR, (
+        ("titular", lambda m: m.group(1).strip(), ""),
+    ), ancoras=("CNPJ/CPF:",), antes=80, depois=len("CNPJ/CPF:"), ultimo=True),
+    # --- 3. DATAS ---
+    Campo(re.compile(r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+\d+\s+\d{2}/\d{2}/\d{4}"), (
+        ("data_leitura_anterior", grupo(1), ""),
+        ("data_leitura_atual", grupo(2), ""),
+    )),
+    # --- 4. MEDIDOR ---
+    Campo(re.compile(r"(\d{7,}-\d)\s+ENERGIA ATIVA - KWH ÚNICO\s+(\d+)\s+(\d+)"), (
+        ("medidor", grupo(1), ""),
+        ("leitura_anterior", grupo(2, int), 0),
+        ("leitura_atual", grupo(3, int), 0),
+    ), ancoras=("ENERGIA ATIVA - KWH ÚNICO",)),
+    # --- 5. ENERGIA ATIVA (Consumo Atual) ---
+    Campo(re.compile(r"ENERGIA ATIVA - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)"), (
+        ("energia_ativa", grupo(1, normalizar_numero_br), 0.0),
+    )),
+    # --- 6. GERAÇÃO, CRÉDITO E SALDO ---
+    # Tenta geração na linha; se vier zerada, cai para o bloco SCEE
+    Campo(re.compile(r"ENERGIA GERAÇÃO - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)"), (
+        ("energia_gerada", grupo(1, normalizar_numero_br), 0.0),
+    )),
+    Campo(re.compile(r"GERAÇÃO CICLO.*?UC\s+\d+\s*:\s*([\d,]+)"), (
+        ("energia_gerada", grupo(1, normalizar_numero_br), 0.0),
+    ), bloco="scee"),
+    Campo(re.compile(r"CRÉDITO RECEBIDO.*?([\d\.]+,\d{2})"), (
+        ("credito_recebido", grupo(1, normalizar_numero_br), 0.0),
+    ), bloco="scee"),
+    # Saldo (com regex robusta para pontos e vírgulas)
+    Campo(re.compile(r"SALDO KWH\s*[:=]?\s*([\d\.]+,\d{2})"), (
+        ("saldo", grupo(1, normalizar_numero_br), 0.0),
+    ), bloco="scee"),
+    # --- 7. VALOR ---
+    Campo(re.compile(r"TOTAL\s+([\d\.]+,\d{2})"), (
+        ("valor_fatura", grupo(1, normalizar_numero_br), 0.0),
+    )),
+]
+
 def extrair_historico_consumo(texto: str) -> list:
     """
     Busca o bloco de histórico (Ex: NOV/24 230) para preencher meses passados.
     Retorna lista: [{'mes': 'NOV', 'ano': 24, 'kwh': 230.0}, ...]
+    Vazia enquanto o cabeçalho da tabela não aparece no texto.
     """
     historico = []
-    # Regex para capturar: MES/ANO (2 digitos) espaço NUMERO (kWh)
-    # Ex: DEZ/24 518
-    padrao = r"(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)[\/\-](\d{2,4})\s+([\d\.,]+)"
-    
-    matches = re.findall(padrao, texto)
-    
-    for mes, ano, kwh in matches:
+    inicio = texto.find(CABECALHO_HISTORICO)
+    if inicio < 0:
+        return historico
+    texto = texto[inicio + len(CABECALHO_HISTORICO):]
+    for mes, ano, kwh in encontrar_todos(PADRAO_HISTORICO, texto, ANCORAS_HISTORICO):
         consumo = normalizar_numero_br(kwh)
         if consumo > 0:
             historico.append({
@@ -34,82 +124,20 @@ def extrair_historico_consumo(texto: str) -> list:
         })
     return historico
 
-def extrair_fatura(texto: str) -> dict:
-    dados = {}
+def extrair_parcial(texto: str) -> tuple:
+    """(dados, obrigatórios que ainda não apareceram no texto)."""
     texto = normalizar_texto(texto)
+    encontrados = set()
+    dados = extrair_campos(texto, CAMPOS, BLOCOS, encontrados)
 
-    # --- 1. MÊS E ANO ATUAL ---
-    m = re.search(r"(\d{7,})\s+(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)/(\d{4})", texto)
-    dados["uc"] = m.group(1) if m else ""
-    dados["mes"] = m.group(2) if m else ""
-    dados["ano"] = int(m.group(3)) if m else 0
-
-    # --- 2. ENDEREÇO ---
-    if "ENDEREÇO DE ENTREGA:" in texto:
-        trecho = texto.split("ENDEREÇO DE ENTREGA:", 1)[1]
-        dados["endereco"] = trecho.split("CEP:", 1)[0].strip()
-    else:
-        dados["endereco"] = ""
-
-    # --- 3. DATAS ---
-    m = re.search(r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+\d+\s+\d{2}/\d{2}/\d{4}", texto)
-    dados["data_leitura_anterior"] = m.group(1) if m else ""
-    dados["data_leitura_atual"] = m.group(2) if m else ""
-
-    # --- 4. MEDIDOR ---
-    m = re.search(r"(\d{7,}-\d)\s+ENERGIA ATIVA - KWH ÚNICO\s+(\d+)\s+(\d+)", texto)
-    if m:
-        dados["medidor"] = m.group(1)
-        dados["leitura_anterior"] = int(m.group(2))
-        dados["leitura_atual"] = int(m.group(3))
-    else:
-        dados["medidor"] = "" 
-        dados["leitura_anterior"] = 0
-        dados["leitura_atual"] = 0
-
-    # --- 5. ENERGIA ATIVA (Consumo Atual) ---
-    dados["energia_ativa"] = 0.0
-    m_ativa = re.search(r"ENERGIA ATIVA - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)", texto)
-    if m_ativa:
-        dados["energia_ativa"] = normalizar_numero_br(m_ativa.group(1))
-
-    # --- 6. GERAÇÃO, CRÉDITO E SALDO ---
-    dados["energia_gerada"] = 0.0
-    dados["credito_recebido"] = 0.0
-    dados["saldo"] = 0.0
-
-    # Tenta geração na linha
-    m_geracao_linha = re.search(r"ENERGIA GERAÇÃO - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)", texto)
-    if m_geracao_linha:
-        dados["energia_gerada"] = normalizar_numero_br(m_geracao_linha.group(1))
-    
-    # Bloco SCEE
-    idx_scee = texto.find("INFORMAÇÕES DO SCEE")
-    if idx_scee != -1:
-        bloco_busca = texto[idx_scee : idx_scee + 1000]
-        
-        # Fallback Geração
-        if dados["energia_gerada"] == 0:
-            m_ger_scee = re.search(r"GERAÇÃO CICLO.*?UC\s+\d+\s*:\s*([\d,]+)", bloco_busca)
-            if m_ger_scee:
-                dados["energia_gerada"] = normalizar_numero_br(m_ger_scee.group(1))
-        
-        # Crédito
-        m_credito = re.search(r"CRÉDITO RECEBIDO.*?([\d\.]+,\d{2})", bloco_busca)
-        if m_credito:
-            dados["credito_recebido"] = normalizar_numero_br(m_credito.group(1))
-
-        # Saldo (com regex robusta para pontos e vírgulas)
-        m_saldo = re.search(r"SALDO KWH\s*[:=]?\s*([\d\.]+,\d{2})", bloco_busca)
-        if m_saldo:
-            dados["saldo"] = normalizar_numero_br(m_saldo.group(1))
-
-    # --- 7. VALOR ---
-    m = re.search(r"TOTAL\s+([\d\.]+,\d{2})", texto)
-    dados["valor_fatura"] = normalizar_numero_br(m.group(1)) if m else 0.0
-
-    # --- 8. HISTÓRICO DE CONSUMO (NOVO) ---
+    # --- 8. HISTÓRICO DE CONSUMO ---
     # Extrai lista de consumos passados para caso seja enviado apenas 1 PDF
     dados["historico"] = extrair_historico_consumo(texto)
+    if dados["historico"]:
+        encontrados.add("historico")
 
-    return dados
\ No newline at end of file
+    obrigatorios = OBRIGATORIOS | OBRIGATORIOS_SCEE if "SCEE" in texto else OBRIGATORIOS
+    return dados, obrigatorios - encontrados
+
+def extrair_fatura(texto: str) -> dict:
+    return extrair_parcial(texto)[0]
\ No newline at end of file
@@ -1,5 +1,10 @@
 import re
 
+from services.campos import SIGLAS_MESES, Campo, extrair_campos, grupo
+
+# Incrementar sempre que a extração mudar: invalida o cache de faturas já lidas
+VERSAO_MAPPER = "A-3"
+
 def normalizar_numero_br(valor: str) -> float:
     if not valor: return 0.0
     valor = valor.replace(".", "").replace(",", ".")
@@ -9,11 +14,82 @@ def normalizar_numero_br(valor: str) -> float:
 def normalizar_texto(texto: str) -> str:
     return " ".join(texto.upper().split())
 
+MESES = "(" + "|".join(SIGLAS_MESES) + ")"
+# Âncoras do cabeçalho "UC MÊS/ANO" (ex.: 16676257 DEZ/2025)
+ANCORAS_MES_ANO = tuple(f"{sigla}/" for sigla in SIGLAS_MESES)
+PADRAO_HISTORICO = re.compile(MESES + r"\s*[\/\-]\s*(\d{2})((?:\s+[\d\.,]+){7,9})")
+# Titular antes de "CNPJ/CPF:" (igual ao Grupo B)
+PADRAO_TITULAR = re.compile(r"(?<!\S)((?:[A-ZÀ-ÖØ-Ý&'./\-]+ )+)CNPJ/CPF:")
+
+def _leitura(descricao: str, numero: str = r"[\d,]+") -> re.Pattern:
+    """Linha de medição: DESCRIÇÃO  LEITURA_ANT  LEITURA_ATUAL  CONSTANTE  VALOR."""
+    return re.compile(descricao + r"\s+\d+\s+\d+\s+" + numero + r"\s+(" + numero + ")")
+
+# Campos que precisam ter aparecido no texto para a leitura do PDF página a página
+# poder parar (services.extracao). Horário reservado e geração são opcionais.
+OBRIGATORIOS = frozenset({"uc", "data_leitura_anterior", "c_p", "c_fp", "valor_fatura", "historico"})
+# Com SCEE citado no texto, crédito e saldo também (ver services/fatura_mapper.py)
+OBRIGATORIOS_SCEE = frozenset({"credito_recebido", "saldo"})
+
+# Trechos que só aparecem no layout do Grupo A (postos tarifários e demanda medida),
+# usados pela detecção automática do layout (services.extracao.classificar)
+MARCADORES = ("KWH PONTA", "KWH FORA PONTA", "DEMANDA - KW")
+
+# Postos tarifários (Ponta, Fora Ponta, Reservado) das linhas de medição
+POSTOS = (("p", "PONTA"), ("fp", "FORA PONTA"), ("hr", "RESERVADO"))
+
+# Especificação dos campos, compilada uma vez no import (ordem = ordem das chaves)
+CAMPOS = [
+    # --- 1. MÊS, ANO E UC ---
+    Campo(re.compile(r"(\d{7,})\s+" + MESES + r"/(\d{4})"), (
+        ("uc", grupo(1), ""),
+        ("mes", grupo(2), ""),
+        ("ano", lambda m: m.group(3)[2:], "00"),
+    ), ancoras=ANCORAS_MES_ANO, depois=len("DEZ/2025")),
+    # --- 2. ENDEREÇO (Igual ao Grupo B) ---
+    Campo(re.compile(r"ENDEREÇO DE ENTREGA:(.*?)(?:CEP:|$)"), (
+        ("endereco", lambda m: m.group(1).strip(), ""),
+    )),
+    Campo(PADRAO_TITULAR, (
+        ("titular", lambda m: m.group(1).strip(), ""),
+    ), ancoras=("CNPJ/CPF:",), antes=80, depois=len("CNPJ/CPF:"), ultimo=True),
+    # --- 3. DATAS DE LEITURA ---
+    Campo(re.compile(r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})"), (
+        ("data_leitura_anterior", grupo(1), ""),
+        ("data_leitura_atual", grupo(2), ""),
+    )),
+]
+# --- 4. CONSUMO E DEMANDA ATUAIS ---
+CAMPOS += [
+    Campo(_leitura(f"ENERGIA ATIVA - KWH {posto}"), ((f"c_{sufixo}", grupo(1, normalizar_numero_br), 0.0),))
+    for sufixo, posto in POSTOS
+]
+CAMPOS += [
+    Campo(_leitura(f"DEMANDA - KW {posto}"), ((f"d_{sufixo}", grupo(1, normalizar_numero_br), 0.0),))
+    for sufixo, posto in POSTOS
+]
+# --- 5. ENERGIA INJETADA (Geração) - somada em P + FP + HR no extrair_fatura ---
+CAMPOS += [
+    Campo(_leitura(f"ENERGIA GERAÇÃO-KWH {posto}", r"[\d,.]+"), ((f"g_{sufixo}", grupo(1, normalizar_numero_br), 0.0),))
+    for sufixo, posto in POSTOS
+]
+CAMPOS += [
+    # --- 6. CRÉDITO E SALDO SCEE --- (saldo = P + FP + HR)
+    Campo(re.compile(r"CREDITO RECEBIDO KWH\s+([\d\.]+,\d{2})"), (
+        ("credito_recebido", grupo(1, normalizar_numero_br), 0.0),
+    )),
+    Campo(re.compile(r"SALDO KWH\s+P-([\d,.]+),\s+FP-([\d,.]+),\s+HR-([\d,.]+)"), (
+        ("saldo", lambda m: sum(normalizar_numero_br(m.group(i)) for i in range(1, 4)), 0.0),
+    )),
+    # --- 7. VALOR TOTAL ---
+    Campo(re.compile(r"TOTAL A PAGAR\s+R\$\s*([\d\.]+,\d{2})"), (
+        ("valor_fatura", grupo(1, normalizar_numero_br), 0.0),
+    )),
+]
+
 def extrair_historico_consumo(texto: str) -> list:
     historico = []
-    padrao = r"(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)\s*[\/\-]\s*(\d{2})((?:\s+[\d\.,]+){7,9})"
-    matches = re.findall(padrao, texto)
-    for mes, ano, valores_str in matches:
+    for mes, ano, valores_str in PADRAO_HISTORICO.findall(texto):
         v = valores_str.strip().split()
         if len(v) >= 7:
             historico.append({
@@ -24,66 +100,17 @@ def extrair_historico_consumo(texto: str) -> list:
             })
     return historico
 
-def extrair_fatura(texto: str) -> dict:
-    dados = {}
+def extrair_parcial(texto: str) -> tuple:
+    """(dados, obrigatórios que ainda não apareceram no texto)."""
     texto_norm = normalizar_texto(texto)
-    
-    # --- 1. MÊS, ANO E UC ---
-    m_uc_mes = re.search(r"(\d{7,})\s+(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)/(\d{4})", texto_norm)
-    dados["uc"] = m_uc_mes.group(1) if m_uc_mes else ""
-    dados["mes"] = m_uc_mes.group(2) if m_uc_mes else ""
-    dados["ano"] = m_uc_mes.group(3)[2:] if m_uc_mes else "00"
-
-    # --- 2. ENDEREÇO (Igual ao Grupo B) ---
-    if "ENDEREÇO DE ENTREGA:" in texto_norm:
-        trecho = texto_norm.split("ENDEREÇO DE ENTREGA:", 1)[1]
-        dados["endereco"] = trecho.split("CEP:", 1)[0].strip()
-    else:
-        dados["endereco"] = ""
-
-    # --- 3. DATAS DE LEITURA ---
-    m_datas = re.search(r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})", texto_norm)
-    dados["data_leitura_anterior"] = m_datas.group(1) if m_datas else ""
-    dados["data_leitura_atual"] = m_datas.group(2) if m_datas else ""
-
-    # --- 4. CONSUMO E DEMANDA ATUAIS ---
-    pats = {
-        "c_p": r"ENERGIA ATIVA - KWH PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
-        "c_fp": r"ENERGIA ATIVA - KWH FORA PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
-        "c_hr": r"ENERGIA ATIVA - KWH RESERVADO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
-        "d_p": r"DEMANDA - KW PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
-        "d_fp": r"DEMANDA - KW FORA PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
-        "d_hr": r"DEMANDA - KW RESERVADO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)"
-    }
-    for chave, pat in pats.items():
-        m = re.search(pat, texto_norm)
-        dados[chave] = normalizar_numero_br(m.group(1)) if m else 0.0
-
-    # 5. Energia Injetada (Geração) - SOMA P + FP + HR 
-    # Na fatura exemplo: FP=5989,23 
-    pats_inj = [
-        r"ENERGIA GERAÇÃO-KWH PONTA\s+\d+\s+\d+\s+[\d,.]+\s+([\d,.]+)",
-        r"ENERGIA GERAÇÃO-KWH FORA PONTA\s+\d+\s+\d+\s+[\d,.]+\s+([\d,.]+)",
-        r"ENERGIA GERAÇÃO-KWH RESERVADO\s+\d+\s+\d+\s+[\d,.]+\s+([\d,.]+)"
-    ]
-    dados["energia_gerada"] = sum(normalizar_numero_br(re.search(p, texto_norm).group(1)) 
-                                 if re.search(p, texto_norm) else 0.0 for p in pats_inj)
-
-    # 6. Crédito e Saldo SCEE [cite: 11, 12, 13]
-    # Crédito Recebido Total: 6.239,35 [cite: 12]
-    m_credito = re.search(r"CREDITO RECEBIDO KWH\s+([\d\.]+,\d{2})", texto_norm)
-    dados["credito_recebido"] = normalizar_numero_br(m_credito.group(1)) if m_credito else 0.0
-
-    # Saldo total (Soma P + FP + HR) [cite: 13]
-    m_saldo = re.search(r"SALDO KWH\s+P-([\d,.]+),\s+FP-([\d,.]+),\s+HR-([\d,.]+)", texto_norm)
-    if m_saldo:
-        dados["saldo"] = sum(normalizar_numero_br(m_saldo.group(i)) for i in range(1, 4))
-    else:
-        dados["saldo"] = 0.0
-
-    # 7. Valor Total [cite: 6, 46, 67]
-    m_val = re.search(r"TOTAL A PAGAR\s+R\$\s*([\d\.]+,\d{2})", texto_norm)
-    dados["valor_fatura"] = normalizar_numero_br(m_val.group(1)) if m_val else 0.0
-
+    encontrados = set()
+    dados = extrair_campos(texto_norm, CAMPOS, encontrados=encontrados)
+    dados["energia_gerada"] = sum(dados.pop(f"g_{sufixo}") for sufixo, _ in POSTOS)
     dados["historico"] = extrair_historico_consumo(texto_norm)
-    return dados
\ No newline at end of file
+    if dados["historico"]:
+        encontrados.add("historico")
+    obrigatorios = OBRIGATORIOS | OBRIGATORIOS_SCEE if "SCEE" in texto_norm else OBRIGATORIOS
+    return dados, obrigatorios - encontrados
+
+def extrair_fatura(texto: str) -> dict:
+    return extrair_parcial(texto)[0]
\ No newline at end of file
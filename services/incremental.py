@@ -0,0 +1,129 @@
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+
+from services.extracao import extrair_lote
+from services.registros import compactar, expandir
+from utils.arquivos import ler_bytes
+
+
+def impressao_fatura(dados) -> str:
+    """Identificador estável do conteúdo extraído de uma fatura."""
+    return hashlib.sha1(json.dumps(dados, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _mantem_faturas(antigas, novas) -> bool:
+    # Toda fatura já gravada continua presente (uploads só foram acrescentados)
+    return not (Counter(antigas) - Counter(novas))
+
+
+class CacheSessao:
+    """
+    Camada em memória, por sessão, na frente do CacheFaturas em disco (mesma interface).
+    Um PDF já lido nesta sessão não passa nem pela leitura do JSON em disco. As faturas
+    ficam guardadas como registros compactos (services.registros) e voltam como dicionário.
+    """
+
+    def __init__(self, disco=None, limite=5000):
+        self.disco = disco
+        self.limite = limite
+        self._dados = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter_texto(self, chave):
+        return self.disco.obter_texto(chave) if self.disco else None
+
+    def obter_dados(self, chave, versao):
+        dados = self._dados.get((chave, versao))
+        if dados is not None:
+            self._dados.move_to_end((chave, versao))
+            self.acertos += 1
+            return expandir(dados)
+        self.falhas += 1
+        dados = self.disco.obter_dados(chave, versao) if self.disco else None
+        if dados is not None:
+            self._memorizar(chave, versao, dados)
+        return dados
+
+    def guardar(self, chave, versao, texto, dados):
+        self._memorizar(chave, versao, dados)
+        if self.disco:
+            self.disco.guardar(chave, versao, texto, dados)
+
+    def _memorizar(self, chave, versao, dados):
+        self._dados[(chave, versao)] = compactar(dados)
+        while len(self._dados) > self.limite:
+            self._dados.popitem(last=False)
+
+
+class SessaoIncremental:
+    """
+    Estado guardado entre os reruns do Streamlit (em st.session_state):
+
+    - faturas já extraídas, por hash do PDF: só uploads novos ou trocados são lidos;
+    - a última planilha gerada (snapshot + .xlsx) com a impressão das faturas de cada UC.
+      Se nada mudou, o .xlsx anterior é devolvido; se as UCs alteradas só ganharam
+      faturas, apenas elas (e o RESUMO) são regravadas sobre o snapshot. Qualquer outra
+      mudança (modelo, grupo, quantidades, fatura removida) gera a planilha do zero.
+
+    Com muitas UCs (services.pipeline.usar_streaming) a planilha é gravada em streaming
+    num arquivo temporário e nada dela fica guardado: cada execução gera do zero.
+    """
+
+    def __init__(self, cache_disco=None):
+        self.cache = CacheSessao(cache_disco)
+        self.trava = threading.Lock()
+        self._ultima = None
+
+    def extrair(self, dados_processamento, grupo, **opcoes) -> list:
+        return extrair_lote(dados_processamento, grupo, cache=self.cache, **opcoes)
+
+    def gerar(self, grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias, rastreio=None) -> tuple:
+        """
+        Devolve (conteúdo .xlsx, {'modo', 'ucs_regravadas', 'total_ucs'}). No modo
+        'streaming' o conteúdo é um arquivo temporário aberto (na posição 0), não bytes.
+        """
+        # Writers e openpyxl só aqui: a sessão também serve à exportação CSV/Parquet
+        from services.modelo_planilha import restaurar_workbook
+        from services.pipeline import gerar_planilha, gerar_planilha_streaming, reescrever_ucs, usar_streaming
+
+        chave = (grupo, hashlib.sha256(ler_bytes(modelo)).hexdigest(), qtd_geradoras, qtd_beneficiarias)
+        impressoes = {
+            (item['tipo'], item['indice']): [impressao_fatura(d) for d in item['dados']]
+            for item in dados_estruturados
+        }
+        info = {'modo': 'completa', 'ucs_regravadas': len(dados_estruturados), 'total_ucs': len(dados_estruturados)}
+        if usar_streaming(qtd_geradoras, qtd_beneficiarias):
+            self._ultima = None
+            saida = gerar_planilha_streaming(grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                                             rastreio=rastreio)
+            return saida, {**info, 'modo': 'streaming'}
+
+        ultima = self._ultima
+        if ultima and ultima['chave'] == chave:
+            if ultima['impressoes'] == impressoes:
+                return ultima['xlsx'], {**info, 'modo': 'reaproveitada', 'ucs_regravadas': 0}
+            alteradas = [
+                pos for pos, item in enumerate(dados_estruturados)
+                if impressoes[(item['tipo'], item['indice'])] != ultima['impressoes'].get((item['tipo'], item['indice']))
+            ]
+            so_acrescimos = set(ultima['impressoes']) <= set(impressoes) and all(
+                _mantem_faturas(ultima['impressoes'][uc], impressoes[uc]) for uc in ultima['impressoes']
+            )
+            if so_acrescimos:
+                wb = restaurar_workbook(ultima['snapshot'])
+                regravadas = reescrever_ucs(grupo, wb, dados_estruturados, alteradas, rastreio=rastreio)
+                info.update(modo='incremental', ucs_regravadas=len(regravadas))
+                return self._guardar(chave, impressoes, wb, rastreio), info
+
+        wb = gerar_planilha(grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias, rastreio=rastreio)
+        return self._guardar(chave, impressoes, wb, rastreio), info
+
+    def _guardar(self, chave, impressoes, wb, rastreio) -> bytes:
+        from services.modelo_planilha import salvar_planilha, serializar_workbook
+        snapshot = serializar_workbook(wb)
+        conteudo = salvar_planilha(wb, rastreio=rastreio)
+        self._ultima = {'chave': chave, 'impressoes': impressoes, 'snapshot': snapshot, 'xlsx': conteudo}
+        return conteudo
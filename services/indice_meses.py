@@ -0,0 +1,76 @@
+import datetime
+
+from services.campos import SIGLAS_MESES
+
+# "JAN" -> 1 ... "DEZ" -> 12
+NUMERO_MES = {sigla: i + 1 for i, sigla in enumerate(SIGLAS_MESES)}
+# Como os meses aparecem escritos na coluna A das planilhas modelo ("Jan", "Fev", ...)
+NOME_EXCEL = {sigla: sigla.capitalize() for sigla in SIGLAS_MESES}
+
+
+def ano_completo(ano):
+    """Normaliza o ano das faturas (2025, 25, "25") para 4 dígitos. Zero/vazio -> None."""
+    try:
+        ano = int(ano)
+    except (TypeError, ValueError):
+        return None
+    if ano <= 0:
+        return None
+    return ano + 2000 if ano < 100 else ano
+
+
+def mes_da_celula(valor, aceitar_data=True, aceitar_texto=True, texto_exato=False):
+    """
+    Reconhece o mês de uma célula da coluna de meses. Retorna (ano, mês) ou None.
+    - Datas (comum no Excel): ano e mês da própria data;
+    - Texto ("Jan", "Janeiro", "JAN/25"): mês pela sigla contida no texto, sem ano.
+      Com `texto_exato`, só aceita exatamente o nome do modelo ("Jan", "Fev", ...).
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return (valor.year, valor.month) if aceitar_data else None
+    if not aceitar_texto:
+        return None
+    texto = str(valor).strip()
+    if texto_exato:
+        for sigla, nome in NOME_EXCEL.items():
+            if texto == nome:
+                return (None, NUMERO_MES[sigla])
+        return None
+    texto = texto.upper()
+    for sigla in SIGLAS_MESES:
+        if sigla in texto:
+            return (None, NUMERO_MES[sigla])
+    return None
+
+
+def indexar_meses(ws, primeira, ultima, coluna=1, **modo) -> dict:
+    """
+    Lê uma única vez a coluna de meses (linhas `primeira`..`ultima`) e monta o índice
+    {(ano, mês): linha}. Cada mês também entra como (None, mês) apontando para a
+    primeira linha em que aparece, para faturas sem ano ou modelos com meses em texto.
+    `modo` é repassado a `mes_da_celula`.
+    """
+    indice = {}
+    linhas = ws.iter_rows(min_row=primeira, max_row=ultima, min_col=coluna, max_col=coluna, values_only=True)
+    for linha, (valor,) in enumerate(linhas, start=primeira):
+        reconhecido = mes_da_celula(valor, **modo)
+        if reconhecido is None:
+            continue
+        ano, mes = reconhecido
+        if ano is not None:
+            indice.setdefault((ano, mes), linha)
+        indice.setdefault((None, mes), linha)
+    return indice
+
+
+def linha_do_mes(indice: dict, mes, ano=None):
+    """Linha para o mês ("JAN" ou 1..12) e ano da fatura; sem o ano exato, a primeira do mês."""
+    mes = NUMERO_MES.get(mes) if isinstance(mes, str) else mes
+    if mes is None:
+        return None
+    ano = ano_completo(ano)
+    if ano is not None and (ano, mes) in indice:
+        return indice[(ano, mes)]
+    return indice.get((None, mes))
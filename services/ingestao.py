@@ -0,0 +1,188 @@
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+import zipfile
+
+from services.indice_meses import NUMERO_MES, ano_completo
+from utils.arquivos import ler_bytes
+
+# Proteção contra ZIPs que descompactam para tamanhos absurdos
+LIMITE_DESCOMPACTADO = 1024 * 1024 * 1024  # 1 GB
+
+# Uploads gravados em disco durante o processamento (uma subpasta por envio)
+DIRETORIO_ENVIOS = os.environ.get(
+    "BALANCO_ENVIOS_DIR", os.path.join(tempfile.gettempdir(), "essential_envios")
+)
+
+
+class ArquivoEmDisco:
+    """
+    Upload gravado numa PastaEnvio. Tem `name` como o UploadedFile; o conteúdo fica no
+    disco e a extração o mapeia em memória (mmap) no processo que lê o PDF.
+    """
+
+    def __init__(self, caminho, name, pasta=None):
+        self.caminho = caminho
+        self.name = name
+        self.pasta = pasta  # a pasta só é apagada quando nenhum arquivo dela está em uso
+
+    @property
+    def tamanho(self) -> int:
+        return os.path.getsize(self.caminho)
+
+    def getvalue(self) -> bytes:
+        with open(self.caminho, "rb") as f:
+            return f.read()
+
+
+class PastaEnvio:
+    """
+    Pasta temporária de um envio: cada upload é copiado para o disco uma vez, em blocos,
+    e o processamento segue só com os caminhos. A pasta é apagada quando o último
+    ArquivoEmDisco dela deixa de ser referenciado (fim da tarefa) ou em `apagar`.
+    """
+
+    def __init__(self, diretorio=None):
+        diretorio = diretorio or DIRETORIO_ENVIOS
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = tempfile.mkdtemp(dir=diretorio)
+        self._sequencia = itertools.count()
+        self._apagar = weakref.finalize(self, shutil.rmtree, self.caminho, True)
+
+    def gravar(self, origem, nome=None) -> ArquivoEmDisco:
+        """Copia `origem` (bytes, upload/file-like ou caminho) para a pasta."""
+        nome = _nome(origem) if nome is None else nome
+        extensao = os.path.splitext(nome)[1].lower() or ".pdf"
+        destino = os.path.join(self.caminho, f"{next(self._sequencia):06d}{extensao}")
+        with open(destino, "wb") as saida:
+            if isinstance(origem, (bytes, bytearray)):
+                saida.write(origem)
+            elif isinstance(origem, str):
+                with open(origem, "rb") as entrada:
+                    shutil.copyfileobj(entrada, saida)
+            else:
+                if hasattr(origem, "seek"):
+                    origem.seek(0)
+                shutil.copyfileobj(origem, saida)
+        return ArquivoEmDisco(destino, nome, self)
+
+    def apagar(self):
+        self._apagar()
+
+
+def _nome(arquivo) -> str:
+    return getattr(arquivo, "name", "") or (arquivo if isinstance(arquivo, str) else "")
+
+
+def _caminho(arquivo):
+    """Caminho do arquivo, se ele já está em disco (ArquivoEmDisco ou caminho)."""
+    return arquivo if isinstance(arquivo, str) else getattr(arquivo, "caminho", None)
+
+
+def _arquivo_nomeado(conteudo: bytes, nome: str):
+    arquivo = io.BytesIO(conteudo)
+    arquivo.name = nome
+    return arquivo
+
+
+def _membros_pdf(arquivo_zip, nome_zip="", pasta=None):
+    """
+    PDFs de um ZIP, lidos um a um direto do arquivo compactado. Com `pasta`
+    (PastaEnvio), cada PDF é descompactado para o disco em blocos; sem ela, vai para a memória.
+    """
+    with zipfile.ZipFile(arquivo_zip) as zf:
+        membros = [
+            info for info in zf.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".pdf")
+            and not os.path.basename(info.filename).startswith(("._", "~"))
+            and not info.filename.startswith("__MACOSX/")
+        ]
+        if sum(info.file_size for info in membros) > LIMITE_DESCOMPACTADO:
+            raise ValueError(f"{nome_zip or 'ZIP'}: conteúdo descompactado passa de "
+                             f"{LIMITE_DESCOMPACTADO // (1024 * 1024)} MB")
+        for info in membros:
+            nome = f"{nome_zip}/{info.filename}" if nome_zip else info.filename
+            with zf.open(info) as membro:
+                yield pasta.gravar(membro, nome) if pasta else _arquivo_nomeado(membro.read(), nome)
+
+
+def ler_envio(arquivos, pasta=None) -> list:
+    """
+    Junta os PDFs de um envio em massa: PDFs soltos e PDFs dentro de ZIPs.
+    Devolve file-likes (com `.name`), na ordem de envio. Arquivos já em disco
+    (ArquivoEmDisco) seguem como estão e os PDFs dos ZIPs deles são descompactados na
+    mesma PastaEnvio; com `pasta`, os demais também vão para ela. Sem pasta, tudo fica
+    em memória.
+    """
+    pdfs = []
+    for arquivo in arquivos:
+        nome = _nome(arquivo)
+        destino = pasta or getattr(arquivo, "pasta", None)
+        # Caminho ou o próprio file-like: nem o ZIP nem o upload são copiados para bytes
+        fonte = _caminho(arquivo) or (arquivo if hasattr(arquivo, "seek") else io.BytesIO(ler_bytes(arquivo)))
+        if nome.lower().endswith(".zip") or zipfile.is_zipfile(fonte):
+            pdfs.extend(_membros_pdf(fonte, nome, destino))
+        elif isinstance(arquivo, ArquivoEmDisco):
+            pdfs.append(arquivo)
+        elif destino:
+            pdfs.append(destino.gravar(fonte, nome))
+        else:
+            if hasattr(fonte, "seek"):
+                fonte.seek(0)
+            pdfs.append(_arquivo_nomeado(ler_bytes(fonte), nome))
+    return pdfs
+
+
+def _ordem_cronologica(par):
+    _, dados = par
+    return (ano_completo(dados.get("ano")) or 0, NUMERO_MES.get(dados.get("mes"), 0))
+
+
+def eh_geradora(faturas) -> bool:
+    """UC geradora: alguma fatura com energia gerada/injetada (linha de geração ou SCEE)."""
+    return any((dados.get("energia_gerada") or 0) > 0 for dados in faturas)
+
+
+def rotear_por_uc(arquivos, faturas) -> tuple:
+    """
+    Agrupa as faturas extraídas pelo número da UC e classifica cada UC.
+
+    `arquivos` e `faturas` são listas paralelas (PDF enviado -> dicionário do mapper).
+    Geradoras e beneficiárias são numeradas pela ordem do número da UC, e as faturas de
+    cada UC ficam em ordem cronológica.
+    Devolve (dados_estruturados no formato dos writers, resumo das UCs, arquivos ignorados).
+    """
+    por_uc = {}
+    ignorados = []
+    for arquivo, dados in zip(arquivos, faturas):
+        nome = getattr(arquivo, "name", "")
+        if not dados or not dados.get("uc"):
+            ignorados.append(nome)
+            continue
+        por_uc.setdefault(dados["uc"], []).append((nome, dados))
+
+    geradoras = sorted(uc for uc, itens in por_uc.items() if eh_geradora(d for _, d in itens))
+    beneficiarias = sorted(uc for uc in por_uc if uc not in geradoras)
+
+    dados_estruturados, resumo = [], []
+    for tipo, ucs in (('geradora', geradoras), ('beneficiaria', beneficiarias)):
+        for indice, uc in enumerate(ucs, start=1):
+            itens = sorted(por_uc[uc], key=_ordem_cronologica)
+            dados_estruturados.append({'tipo': tipo, 'indice': indice, 'dados': [d for _, d in itens]})
+            resumo.append({
+                'uc': uc, 'tipo': tipo, 'indice': indice, 'faturas': len(itens),
+                'endereco': itens[0][1].get("endereco", ""),
+                'meses': ", ".join(f"{d.get('mes')}/{d.get('ano')}" for _, d in itens),
+                'arquivos': [nome for nome, _ in itens],
+            })
+    return dados_estruturados, resumo, ignorados
+
+
+def contar_ucs(dados_estruturados) -> tuple:
+    """(qtd_geradoras, qtd_beneficiarias) a partir dos índices presentes nos dados."""
+    geradoras = [item['indice'] for item in dados_estruturados if item['tipo'] == 'geradora']
+    beneficiarias = [item['indice'] for item in dados_estruturados if item['tipo'] == 'beneficiaria']
+    return max(geradoras, default=1), max(beneficiarias, default=0)
@@ -0,0 +1,94 @@
+"""
+Leitores de texto de PDF intercambiáveis. Cada leitor recebe os bytes do PDF e devolve
+um iterador com o texto de cada página, extraído sob demanda.
+
+- pdfplumber: ordenação por layout (referência; é nela que as regex dos mappers se baseiam);
+- pdfminer: análise de layout do próprio pdfminer (dependência do pdfplumber), sem a
+  reordenação de caracteres do pdfplumber;
+- pdfium: motor C do pypdfium2 (também instalado com o pdfplumber), bem mais rápido;
+- pymupdf: opcional (pip install pymupdf).
+
+Outro leitor pode ser incluído registrando uma função em LEITORES.
+
+O conteúdo é bytes ou o mmap de um PDF em disco (utils.arquivos.mapear): o PDF é lido
+direto do arquivo mapeado, sem cópia para a memória do processo. Os leitores em
+POR_CAMINHO recebem, em vez do mmap, o caminho do PDF e abrem o arquivo eles mesmos.
+"""
+import io
+
+from utils.arquivos import LeituraMapeada
+
+PADRAO = "pdfplumber"
+
+# O pymupdf só lê de um stream em bytes: com o mmap seria uma segunda cópia do PDF inteiro
+POR_CAMINHO = {"pymupdf"}
+
+
+def _fluxo(conteudo):
+    """File-like do PDF: BytesIO para bytes, leitura sobre o mmap sem copiar."""
+    return io.BytesIO(conteudo) if isinstance(conteudo, (bytes, bytearray)) else LeituraMapeada(conteudo)
+
+
+def paginas_pdfplumber(conteudo):
+    import pdfplumber
+    pdf = pdfplumber.open(_fluxo(conteudo))
+    try:
+        for pagina in pdf.pages:
+            yield pagina.extract_text() or ""
+            pagina.close()  # libera os objetos da página já lida
+    finally:
+        # Sem pdf.close(): ele recriaria todas as páginas (inclusive as não lidas) só
+        # para fechá-las. Descarta as páginas e os caches do documento e fecha o fluxo.
+        pdf.flush_cache()
+        pdf.stream.close()
+
+
+def paginas_pdfminer(conteudo):
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LAParams, LTTextContainer
+    for pagina in extract_pages(_fluxo(conteudo), laparams=LAParams()):
+        yield "".join(e.get_text() for e in pagina if isinstance(e, LTTextContainer))
+
+
+def paginas_pdfium(conteudo):
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(conteudo if isinstance(conteudo, bytes) else _fluxo(conteudo))
+    try:
+        for pagina in pdf:
+            texto_pagina = pagina.get_textpage()
+            yield texto_pagina.get_text_range().replace("\r\n", "\n")
+            texto_pagina.close()
+            pagina.close()
+    finally:
+        pdf.close()
+
+
+def paginas_pymupdf(conteudo):
+    import fitz
+    if isinstance(conteudo, str):
+        pdf = fitz.open(conteudo, filetype="pdf")
+    else:
+        pdf = fitz.open(stream=conteudo if isinstance(conteudo, bytes) else bytes(conteudo), filetype="pdf")
+    with pdf:
+        for pagina in pdf:
+            yield pagina.get_text()
+
+
+LEITORES = {
+    "pdfplumber": (paginas_pdfplumber, "pdfplumber"),
+    "pdfminer": (paginas_pdfminer, "pdfminer"),
+    "pdfium": (paginas_pdfium, "pypdfium2"),
+    "pymupdf": (paginas_pymupdf, "fitz"),
+}
+
+
+def disponiveis() -> list:
+    """Leitores cujo pacote está instalado neste ambiente."""
+    import importlib.util
+    return [nome for nome, (_, modulo) in LEITORES.items() if importlib.util.find_spec(modulo) is not None]
+
+
+def paginas(conteudo, leitor: str = None):
+    if (leitor or PADRAO) not in LEITORES:
+        raise ValueError(f"Leitor de PDF desconhecido: {leitor}")
+    return LEITORES[leitor or PADRAO][0](conteudo)
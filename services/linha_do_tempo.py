@@ -0,0 +1,59 @@
+from services.indice_meses import NUMERO_MES, ano_completo, linha_do_mes
+
+
+def _data_leitura(dados) -> tuple:
+    # "21/01/2025" -> (2025, 1, 21); desempata faturas do mesmo mês (reemissão)
+    partes = str(dados.get("data_leitura_atual") or "").split("/")
+    return tuple(int(p) for p in reversed(partes)) if len(partes) == 3 and all(p.isdigit() for p in partes) else ()
+
+
+def _periodo(ano, mes) -> tuple:
+    return (ano_completo(ano) or 0, NUMERO_MES.get(mes, 0))
+
+
+def montar_linha_do_tempo(faturas) -> list:
+    """
+    Consolida as faturas de uma UC numa série mensal única, antes da escrita.
+
+    Cada mês (ano, mês) aparece uma vez, em ordem cronológica:
+    {'ano': 2025 | None, 'mes': "JAN", 'fatura': dados | None, 'historico': entrada | None}
+    - 'fatura': a fatura daquele mês de referência; havendo mais de uma (reemissão),
+      a de leitura mais recente e, empatando, a última enviada;
+    - 'historico': a linha do histórico de consumo daquele mês vinda da fatura mais
+      recente que o lista (o histórico das faturas novas já traz os meses refaturados).
+    O resultado não depende da ordem de upload.
+    """
+    ordenadas = sorted(
+        ((pos, dados) for pos, dados in enumerate(faturas) if dados.get("mes") in NUMERO_MES),
+        key=lambda par: (_periodo(par[1].get("ano"), par[1]["mes"]), _data_leitura(par[1]), par[0]),
+    )
+    meses = {}
+
+    def _mes(ano, mes):
+        chave = (ano_completo(ano), NUMERO_MES[mes])
+        if chave not in meses:
+            meses[chave] = {'ano': chave[0], 'mes': mes, 'fatura': None, 'historico': None}
+        return meses[chave]
+
+    # Da fatura mais antiga para a mais nova: a mais nova sobrescreve
+    for _, dados in ordenadas:
+        _mes(dados.get("ano"), dados["mes"])['fatura'] = dados
+        for hist in dados.get("historico") or []:
+            if hist.get("mes") in NUMERO_MES:
+                _mes(hist.get("ano"), hist["mes"])['historico'] = hist
+
+    return [meses[chave] for chave in sorted(meses, key=lambda c: (c[0] or 0, c[1]))]
+
+
+def distribuir_por_linha(entradas, indice) -> dict:
+    """
+    {linha da planilha: entrada} para as entradas (de montar_linha_do_tempo) cujo mês
+    existe no `indice` (services.indice_meses). Em modelos sem ano na coluna de meses,
+    meses de anos diferentes caem na mesma linha: fica o mais recente.
+    """
+    linhas = {}
+    for entrada in entradas:
+        linha = linha_do_mes(indice, entrada['mes'], entrada['ano'])
+        if linha:
+            linhas[linha] = entrada
+    return linhas
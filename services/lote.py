@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import as_completed
+
+from services.base_faturas import BaseFaturas
+from services.cache_faturas import CacheFaturas
+from services.exportacao import exportar, tabela_faturas
+from services.extracao import (AUTO, chave_cache, criar_pool, grupo_predominante, processar_pdf, separar_grupo,
+                               versao_cache, workers_padrao)
+from services.ingestao import contar_ucs
+from services.modelo_planilha import salvar_planilha
+from services.pipeline import gerar_planilha, gerar_planilha_streaming, usar_streaming
+from services.registros import compactar
+from utils.arquivos import mapear
+
+# Pastas de UC dentro de cada cliente: "geradora_1", "Beneficiária 2", "benef-3"...
+PADRAO_PASTA_UC = re.compile(r"(GERADORA|BENEFICI[AÁ]RIA|BENEF)\D*(\d+)", re.IGNORECASE)
+
+
+def _ordenar_ucs(ucs) -> list:
+    # Mesma ordem do app: geradoras e depois beneficiárias, cada uma pelo índice
+    return sorted(ucs, key=lambda uc: (uc['tipo'] != 'geradora', uc['indice']))
+
+
+def descobrir_clientes(diretorio, grupo, modelo) -> list:
+    """
+    Monta os clientes a partir de uma árvore de pastas:
+        <diretorio>/<cliente>/<geradora_N | beneficiaria_N>/*.pdf
+    """
+    clientes = []
+    for nome in sorted(os.listdir(diretorio)):
+        pasta_cliente = os.path.join(diretorio, nome)
+        if not os.path.isdir(pasta_cliente):
+            continue
+        ucs = []
+        for sub in sorted(os.listdir(pasta_cliente)):
+            pasta_uc = os.path.join(pasta_cliente, sub)
+            m = PADRAO_PASTA_UC.search(sub)
+            if not m or not os.path.isdir(pasta_uc):
+                continue
+            arquivos = sorted(
+                os.path.join(pasta_uc, f) for f in os.listdir(pasta_uc) if f.lower().endswith(".pdf")
+            )
+            if arquivos:
+                tipo = 'geradora' if m.group(1).upper() == "GERADORA" else 'beneficiaria'
+                ucs.append({'tipo': tipo, 'indice': int(m.group(2)), 'arquivos': arquivos})
+        if ucs:
+            clientes.append({'nome': nome, 'grupo': grupo, 'modelo': modelo, 'ucs': _ordenar_ucs(ucs)})
+    return clientes
+
+
+def ler_manifesto(caminho, grupo=None, modelo=None) -> list:
+    """
+    Lê um manifesto JSON no formato:
+        {"grupo": "B", "modelo": "BALANÇO_B.xlsx",
+         "clientes": [{"nome": "...", "ucs": [{"tipo": "geradora", "indice": 1, "arquivos": [...]}]}]}
+    "grupo", "modelo" e "leitor" (leitor de PDF) podem ser definidos por cliente. Caminhos relativos são
+    resolvidos a partir da pasta do manifesto.
+    """
+    with open(caminho, "r", encoding="utf-8") as f:
+        manifesto = json.load(f)
+    base = os.path.dirname(os.path.abspath(caminho))
+    resolver = lambda p: p if os.path.isabs(p) else os.path.join(base, p)
+
+    clientes = []
+    for cliente in manifesto.get("clientes", []):
+        modelo_cliente = cliente.get("modelo") or manifesto.get("modelo") or modelo
+        clientes.append({
+            'nome': cliente["nome"],
+            'grupo': cliente.get("grupo") or manifesto.get("grupo") or grupo,
+            'leitor': cliente.get("leitor") or manifesto.get("leitor"),
+            'modelo': resolver(modelo_cliente) if modelo_cliente else None,
+            'ucs': _ordenar_ucs([
+                {'tipo': uc["tipo"], 'indice': int(uc["indice"]), 'arquivos': [resolver(a) for a in uc["arquivos"]]}
+                for uc in cliente.get("ucs", [])
+            ]),
+        })
+    return clientes
+
+
+def _nome_arquivo_saida(cliente, grupo, formato="xlsx") -> str:
+    nome = re.sub(r"[^\w\-]+", "_", cliente['nome']).strip("_") or "cliente"
+    if formato != "xlsx":
+        return f"FATURAS_GRUPO_{grupo}_{nome}.{formato}"
+    return f"BALANCO_COMPENSAÇÃO_GRUPO_{grupo}_{nome}.xlsx"
+
+
+def processar_cliente(cliente, diretorio_saida, diretorio_cache=None, leitor=None, caminho_base=None,
+                      formato="xlsx") -> dict:
+    """
+    Extrai as faturas de um cliente, grava a planilha e devolve o resumo da execução
+    (arquivos lidos, quantidade de UCs da planilha, caminho da saída e tempos).
+    Uma fatura com erro é registrada e ignorada; o restante do cliente segue normalmente.
+    `leitor` (services.leitores_pdf) vale para o lote todo; o cliente pode definir o seu.
+    Com grupo "auto", o layout de cada fatura é detectado e a planilha fica com o grupo
+    da maioria; faturas do outro grupo são registradas com erro.
+    Com `caminho_base`, as faturas lidas são gravadas na BaseFaturas com o nome do cliente.
+    Com `formato` "csv" ou "parquet", grava a tabela de faturas (services.exportacao) no
+    lugar da planilha, sem usar o modelo.
+    """
+    inicio = time.perf_counter()
+    grupo = cliente['grupo']
+    leitor = cliente.get('leitor') or leitor
+    cache = CacheFaturas(diretorio_cache) if diretorio_cache else None
+    resumo = {'cliente': cliente['nome'], 'grupo': grupo, 'saida': None, 'erro': None, 'arquivos': []}
+
+    dados_estruturados = []
+    lidos = []  # registros das faturas extraídas, paralelos a dados_estruturados
+    for uc in cliente['ucs']:
+        faturas = []
+        lidos.append([])
+        for caminho in uc['arquivos']:
+            registro = {'arquivo': caminho, 'tipo': uc['tipo'], 'indice': uc['indice']}
+            try:
+                t0 = time.perf_counter()
+                with mapear(caminho) as mapa:
+                    chave = chave_cache(mapa, leitor) if cache else None
+                dados = cache.obter_dados(chave, versao_cache(grupo)) if cache else None
+                registro['cache'] = dados is not None
+                tempos = {'extracao_s': time.perf_counter() - t0, 'parse_s': 0.0}
+                if dados is None:
+                    texto, dados, tempos = processar_pdf(caminho, grupo, leitor)
+                    if cache:
+                        cache.guardar(chave, versao_cache(grupo), texto, dados)
+                registro.update({k: round(v, 4) if isinstance(v, float) else v for k, v in tempos.items()})
+                registro.update({'uc': dados.get("uc", ""), 'mes': dados.get("mes", ""), 'ano': dados.get("ano")})
+                # Registro compacto: o cliente inteiro fica em memória até a escrita
+                faturas.append(compactar(dados))
+                lidos[-1].append(registro)
+            except Exception as e:
+                registro['erro'] = f"{type(e).__name__}: {e}"
+            resumo['arquivos'].append(registro)
+        dados_estruturados.append({'tipo': uc['tipo'], 'indice': uc['indice'], 'dados': faturas})
+
+    try:
+        if grupo == AUTO:
+            grupo = resumo['grupo'] = grupo_predominante(dados_estruturados)
+            dados_estruturados, fora = separar_grupo(dados_estruturados, grupo)
+            for pos_item, pos_arq, grupo_fatura in fora:
+                lidos[pos_item][pos_arq]['erro'] = (
+                    f"Fatura do Grupo {grupo_fatura}; a planilha é do Grupo {grupo}" if grupo_fatura
+                    else "Layout da fatura não reconhecido"
+                )
+        if caminho_base:
+            BaseFaturas(caminho_base).gravar(
+                [dados for item in dados_estruturados for dados in item['dados']], grupo, cliente=cliente['nome'])
+        qtd_geradoras, qtd_beneficiarias = contar_ucs(dados_estruturados)
+        resumo['ucs'] = {'geradoras': qtd_geradoras, 'beneficiarias': qtd_beneficiarias}
+        tempos = {}
+        saida = os.path.join(diretorio_saida, _nome_arquivo_saida(cliente, grupo, formato))
+        if formato != "xlsx":
+            t0 = time.perf_counter()
+            exportar(tabela_faturas(dados_estruturados, grupo), formato, destino=saida)
+            tempos['exportacao'] = time.perf_counter() - t0
+        elif usar_streaming(qtd_geradoras, qtd_beneficiarias):
+            # Muitas UCs: grava direto no arquivo de saída, aba por aba
+            gerar_planilha_streaming(grupo, cliente['modelo'], dados_estruturados, qtd_geradoras,
+                                     qtd_beneficiarias, destino=saida, tempos=tempos)
+        else:
+            wb = gerar_planilha(grupo, cliente['modelo'], dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                                tempos=tempos)
+            conteudo_xlsx = salvar_planilha(wb, tempos=tempos)
+            with open(saida, "wb") as f:
+                f.write(conteudo_xlsx)
+        resumo['saida'] = saida
+        resumo['planilha'] = {k: round(v, 4) for k, v in tempos.items()}
+    except Exception as e:
+        resumo['erro'] = f"{type(e).__name__}: {e}"
+
+    resumo['duracao_s'] = round(time.perf_counter() - inicio, 4)
+    return resumo
+
+
+def executar_lote(clientes, diretorio_saida, processos=None, diretorio_cache=None, ao_concluir=None,
+                  leitor=None, caminho_base=None, formato="xlsx") -> dict:
+    """Processa os clientes em paralelo (um processo por cliente) e consolida o resumo."""
+    os.makedirs(diretorio_saida, exist_ok=True)
+    inicio = time.perf_counter()
+    resultados = []
+    processos = min(processos or workers_padrao(), len(clientes)) if clientes else 1
+
+    with criar_pool(processos) as pool:
+        futuros = {
+            pool.submit(processar_cliente, cliente, diretorio_saida, diretorio_cache, leitor, caminho_base,
+                        formato): cliente
+            for cliente in clientes
+        }
+        for futuro in as_completed(futuros):
+            cliente = futuros[futuro]
+            try:
+                resumo = futuro.result()
+            except Exception as e:  # falha do próprio processo (ex.: memória)
+                resumo = {'cliente': cliente['nome'], 'grupo': cliente['grupo'], 'saida': None,
+                          'erro': f"{type(e).__name__}: {e}", 'arquivos': []}
+            resultados.append(resumo)
+            if ao_concluir:
+                ao_concluir(resumo)
+
+    ordem = {cliente['nome']: i for i, cliente in enumerate(clientes)}
+    resultados.sort(key=lambda r: ordem.get(r['cliente'], 0))
+    arquivos = [a for r in resultados for a in r['arquivos']]
+    return {
+        'clientes': resultados,
+        'total_clientes': len(resultados),
+        'clientes_com_erro': sum(1 for r in resultados if r['erro']),
+        'total_faturas': len(arquivos),
+        'faturas_com_erro': sum(1 for a in arquivos if a.get('erro')),
+        'duracao_s': round(time.perf_counter() - inicio, 4),
+    }
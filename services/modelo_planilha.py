@@ -0,0 +1,281 @@
+import copyreg
+import datetime
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import openpyxl
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.worksheet.copier import WorksheetCopy
+from openpyxl.worksheet.dimensions import DimensionHolder
+from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.writer.excel import ExcelWriter
+
+from utils.arquivos import ler_bytes
+
+# Snapshots (pickle) de workbooks intocados:
+# - hash do .xlsx                          -> modelo como veio do upload
+# - (hash, qtd_geradoras, qtd_beneficiarias) -> modelo já com as abas de UC clonadas
+# Cada execução desserializa o snapshot (muito mais barato que reler o XML do .xlsx
+# ou refazer as cópias de abas) e trabalha sobre um workbook independente.
+MAX_SNAPSHOTS = 8
+# Gravação em streaming: o .xlsx fica em memória até este tamanho e depois vai para disco
+MEMORIA_SAIDA = int(os.environ.get("BALANCO_SAIDA_MEMORIA_MB", 16)) * 2**20
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+
+
+def _obter_snapshot(chave):
+    with _lock:
+        snapshot = _snapshots.get(chave)
+        if snapshot is not None:
+            _snapshots.move_to_end(chave)
+        return snapshot
+
+
+def _reduzir_dimensoes(holder):
+    # O __reduce__ do defaultdict recria o DimensionHolder sem a aba e perde o
+    # default_factory; um workbook que já veio de snapshot não voltaria do pickle.
+    estado = {k: v for k, v in holder.__dict__.items() if k != "default_factory"}
+    return (DimensionHolder, (holder.worksheet, holder.reference, holder.default_factory),
+            estado, None, iter(holder.items()))
+
+
+_DISPATCH = copyreg.dispatch_table.copy()
+_DISPATCH[DimensionHolder] = _reduzir_dimensoes
+
+
+def serializar_workbook(wb) -> bytes:
+    """Snapshot (pickle) de um workbook; volta com restaurar_workbook()."""
+    saida = io.BytesIO()
+    pickler = pickle.Pickler(saida, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = _DISPATCH
+    pickler.dump(wb)
+    return saida.getvalue()
+
+
+def restaurar_workbook(snapshot: bytes):
+    return pickle.loads(snapshot)
+
+
+def _guardar_snapshot(chave, wb):
+    snapshot = serializar_workbook(wb)
+    with _lock:
+        _snapshots[chave] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+
+
+def carregar_modelo(arquivo):
+    """
+    Devolve (hash do modelo, Workbook novo). O XML do .xlsx só é lido na primeira vez
+    que aquele conteúdo aparece; depois o workbook sai do snapshot em memória.
+    """
+    conteudo = ler_bytes(arquivo)
+    chave = hashlib.sha256(conteudo).hexdigest()
+    snapshot = _obter_snapshot(chave)
+    if snapshot is not None:
+        return chave, restaurar_workbook(snapshot)
+    wb = openpyxl.load_workbook(io.BytesIO(conteudo))
+    _guardar_snapshot(chave, wb)
+    return chave, wb
+
+
+def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias, tempos=None):
+    """
+    Prepara o workbook duplicando as abas de modelo.
+
+    Modelo e resultado da clonagem ficam em cache por conteúdo + quantidades de UC,
+    então rodar de novo o mesmo cliente não relê o .xlsx nem copia abas.
+    Se `tempos` (dict) for informado, recebe 'carga' e 'clonagem' em segundos.
+    """
+    inicio = time.perf_counter()
+    conteudo = ler_bytes(caminho_entrada)
+    chave = (hashlib.sha256(conteudo).hexdigest(), qtd_geradoras, qtd_beneficiarias)
+    snapshot = _obter_snapshot(chave)
+    if snapshot is not None:
+        wb = restaurar_workbook(snapshot)
+        if tempos is not None:
+            tempos["carga"] = time.perf_counter() - inicio
+            tempos["clonagem"] = 0.0
+        return wb
+
+    _, wb = carregar_modelo(conteudo)
+    meio = time.perf_counter()
+
+    # Preparar Geradoras
+    if "UC GERADORA" in wb.sheetnames:
+        ws_modelo_ger = wb["UC GERADORA"]
+        for i in range(1, qtd_geradoras):
+            nova = wb.copy_worksheet(ws_modelo_ger)
+            nova.title = f"UC GERADORA {i+1}"
+
+    # Preparar Beneficiárias
+    nome_modelo_benef = next((s for s in wb.sheetnames if "UC BENEF" in s.upper()), None)
+    if nome_modelo_benef and qtd_beneficiarias > 0:
+        ws_modelo_ben = wb[nome_modelo_benef]
+        ws_modelo_ben.title = "UC BENEF. 1"
+        for i in range(1, qtd_beneficiarias):
+            nova = wb.copy_worksheet(ws_modelo_ben)
+            nova.title = f"UC BENEF. {i+1}"
+
+    _guardar_snapshot(chave, wb)
+    if tempos is not None:
+        tempos["carga"] = meio - inicio
+        tempos["clonagem"] = time.perf_counter() - meio
+    return wb
+
+
+def salvar_planilha(wb, tempos=None, rastreio=None) -> bytes:
+    """
+    Serializa o workbook em memória; `tempos['gravacao']` e `tempos['bytes']` se informado,
+    e um evento 'gravacao' (com bytes) no `rastreio`.
+    """
+    inicio = time.perf_counter()
+    output = io.BytesIO()
+    wb.save(output)
+    conteudo = output.getvalue()
+    duracao = time.perf_counter() - inicio
+    if tempos is not None:
+        tempos["gravacao"] = duracao
+        tempos["bytes"] = len(conteudo)
+    if rastreio is not None:
+        rastreio.registrar('gravacao', duracao, bytes=len(conteudo), abas=len(wb.sheetnames), modo='memoria')
+    return conteudo
+
+
+# --- Gravação em streaming (consórcios com muitas UCs) ---
+# Escrita sobre o openpyxl 3.1 (testada com 3.1.5): usa internos que não são API pública
+# (ExcelWriter._write_worksheets/write_worksheet, Workbook._sheets, Worksheet._cells).
+# Se uma versão nova não os tiver, salvar_planilha_streaming grava do jeito comum: todas
+# as abas preenchidas em memória e um wb.save (mesmo .xlsx, sem o ganho de memória).
+def _suporta_streaming() -> bool:
+    wb = openpyxl.Workbook()
+    return (callable(getattr(ExcelWriter, "_write_worksheets", None))
+            and callable(getattr(ExcelWriter, "write_worksheet", None))
+            and isinstance(getattr(wb, "_sheets", None), list)
+            and isinstance(getattr(wb.active, "_cells", None), dict))
+
+
+STREAMING_SUPORTADO = _suporta_streaming()
+
+
+def _abas_do_modelo(wb) -> tuple:
+    """(aba modelo da geradora, aba modelo da beneficiária); None quando o modelo não tem."""
+    geradora = wb["UC GERADORA"] if "UC GERADORA" in wb.sheetnames else None
+    nome_benef = next((s for s in wb.sheetnames if "UC BENEF" in s.upper()), None)
+    return geradora, (wb[nome_benef] if nome_benef else None)
+
+
+def _molde(wb, ws):
+    """Cópia intocada de `ws` fora da lista de abas (não é gravada no .xlsx)."""
+    molde = Worksheet(wb, title=f"{ws.title} (molde)")
+    WorksheetCopy(ws, molde).copy_worksheet()
+    return molde
+
+
+def preparar_planilha_streaming(caminho_entrada, qtd_geradoras, qtd_beneficiarias, tempos=None) -> tuple:
+    """
+    Como preparar_planilha, mas sem copiar as abas de UC: as cópias ficam vazias e só são
+    preenchidas a partir do modelo na hora de gravar (ver salvar_planilha_streaming).
+    Devolve (workbook, {aba vazia: molde}). A memória não cresce com a quantidade de UCs.
+    """
+    inicio = time.perf_counter()
+    _, wb = carregar_modelo(caminho_entrada)
+    meio = time.perf_counter()
+
+    moldes = {}
+    ws_ger, ws_ben = _abas_do_modelo(wb)
+    if ws_ger is not None and qtd_geradoras > 1:
+        molde = _molde(wb, ws_ger)
+        for i in range(1, qtd_geradoras):
+            moldes[wb.create_sheet(f"UC GERADORA {i+1}")] = molde
+    if ws_ben is not None and qtd_beneficiarias > 0:
+        ws_ben.title = "UC BENEF. 1"
+        molde = _molde(wb, ws_ben) if qtd_beneficiarias > 1 else None
+        for i in range(1, qtd_beneficiarias):
+            moldes[wb.create_sheet(f"UC BENEF. {i+1}")] = molde
+
+    if tempos is not None:
+        tempos["carga"] = meio - inicio
+        tempos["clonagem"] = time.perf_counter() - meio
+    return wb, moldes
+
+
+def _liberar(ws):
+    # A aba já está no .xlsx: só o título e a configuração de impressão ainda são lidos
+    ws._cells.clear()
+    ws.row_dimensions.clear()
+    ws.merged_cells = MultiCellRange()
+
+
+class _GravadorStreaming(ExcelWriter):
+    """
+    ExcelWriter do openpyxl que grava as abas na ordem `ordem`, chamando `preencher(ws)`
+    logo antes de cada uma e descartando as células logo depois. O número do sheetN.xml
+    segue a ordem de gravação; o workbook.xml continua listando as abas na ordem original.
+    """
+
+    def __init__(self, workbook, archive, ordem, preencher):
+        super().__init__(workbook, archive)
+        self.ordem = ordem
+        self.preencher = preencher
+
+    def _write_worksheets(self):
+        abas = self.workbook._sheets
+        na_ordem = {id(ws) for ws in self.ordem}
+        self.workbook._sheets = list(self.ordem) + [ws for ws in abas if id(ws) not in na_ordem]
+        try:
+            super()._write_worksheets()
+        finally:
+            self.workbook._sheets = abas
+
+    def write_worksheet(self, ws):
+        self.preencher(ws)
+        super().write_worksheet(ws)
+        _liberar(ws)
+
+
+def salvar_planilha_streaming(wb, ordem, preencher, destino=None, tempos=None, rastreio=None):
+    """
+    Grava o .xlsx aba por aba: `preencher(ws)` escreve a aba, ela é serializada e suas
+    células saem da memória antes da próxima. `ordem` são as abas a gravar primeiro (as
+    demais vêm depois, na ordem do workbook).
+
+    `destino` pode ser um caminho ou um arquivo aberto; sem destino, grava num
+    SpooledTemporaryFile (em disco a partir de MEMORIA_SAIDA) e o devolve na posição 0.
+    `tempos` e `rastreio` como em salvar_planilha; o evento 'gravacao' leva modo='streaming'
+    (ou 'completa', sem STREAMING_SUPORTADO).
+    """
+    inicio = time.perf_counter()
+    saida = tempfile.SpooledTemporaryFile(max_size=MEMORIA_SAIDA) if destino is None else destino
+    if STREAMING_SUPORTADO:
+        modo = 'streaming'
+        wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+        with ZipFile(saida, "w", ZIP_DEFLATED, allowZip64=True) as archive:
+            _GravadorStreaming(wb, archive, ordem, preencher).save()
+    else:
+        modo = 'completa'
+        na_ordem = {id(ws) for ws in ordem}
+        for ws in list(ordem) + [ws for ws in wb.worksheets if id(ws) not in na_ordem]:
+            preencher(ws)
+        wb.save(saida)
+    if isinstance(saida, (str, os.PathLike)):
+        tamanho = os.path.getsize(saida)
+    else:
+        tamanho = saida.tell()
+        if destino is None:
+            saida.seek(0)
+    duracao = time.perf_counter() - inicio
+    if tempos is not None:
+        tempos["gravacao"] = duracao
+        tempos["bytes"] = tamanho
+    if rastreio is not None:
+        rastreio.registrar('gravacao', duracao, bytes=tamanho, abas=len(wb.sheetnames), modo=modo)
+    return saida
@@ -0,0 +1,123 @@
+import os
+import time
+
+from openpyxl.worksheet.copier import WorksheetCopy
+
+from services.excel_writer import preparar_planilha as prep_B, salvar_dados_multiplos as salvar_B
+from services.excel_writer import escrever_uc as uc_B, escrever_resumo as resumo_B
+from services.excel_writterA import preparar_planilha as prep_A, salvar_dados_A as salvar_A
+from services.excel_writterA import escrever_uc as uc_A, escrever_resumo as resumo_A, aba_geral
+from services.modelo_planilha import preparar_planilha_streaming, salvar_planilha_streaming
+
+# Grupo tarifário -> (preparação do modelo, writer)
+# A: Alta Tensão (Demanda e Postos Tarifários) | B: Baixa Tensão (Consumo Único)
+WRITERS = {"A": (prep_A, salvar_A), "B": (prep_B, salvar_B)}
+
+# Escrita por UC, para regravar só o que mudou: (UC, RESUMO, aba compartilhada entre UCs?)
+# No Grupo A todas as UCs escrevem nas mesmas linhas da aba GRUPO A (a última vence),
+# então a partir da primeira UC alterada todas as seguintes precisam ser regravadas.
+ESCRITA_POR_UC = {"A": (uc_A, resumo_A, True), "B": (uc_B, resumo_B, False)}
+
+# A partir de quantas abas de UC a planilha é gravada em streaming (memória constante,
+# sem snapshot para a regravação incremental)
+UCS_STREAMING = int(os.environ.get("BALANCO_STREAMING_UCS", 50))
+
+
+def gerar_planilha(grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias, tempos=None, rastreio=None):
+    """
+    Prepara o modelo e grava as faturas extraídas com o writer do grupo.
+    Com `rastreio`, registra 'carga' e 'clonagem' do modelo e um 'escrita_aba' por UC.
+    """
+    if grupo not in WRITERS:
+        raise ValueError(f"Grupo tarifário desconhecido: {grupo}")
+    preparar, salvar = WRITERS[grupo]
+    tempos = {} if tempos is None and rastreio is not None else tempos
+    wb = preparar(modelo, qtd_geradoras, qtd_beneficiarias, tempos=tempos)
+    if rastreio is not None:
+        rastreio.registrar('carga', tempos['carga'])
+        rastreio.registrar('clonagem', tempos['clonagem'], abas=len(wb.sheetnames))
+    return salvar(wb, dados_estruturados, rastreio=rastreio)
+
+
+def reescrever_ucs(grupo, wb, dados_estruturados, alteradas, rastreio=None):
+    """
+    Regrava sobre `wb` (resultado de uma execução anterior) as UCs nas posições
+    `alteradas` de `dados_estruturados` e depois o RESUMO. Só é equivalente a gerar do
+    zero quando cada UC alterada manteve todas as faturas que já tinha (ver
+    services.incremental). Devolve as posições efetivamente regravadas.
+    """
+    escrever_uc, escrever_resumo, compartilhada = ESCRITA_POR_UC[grupo]
+    posicoes = sorted(alteradas)
+    if compartilhada and posicoes:
+        posicoes = list(range(posicoes[0], len(dados_estruturados)))
+    extra = (aba_geral(wb),) if grupo == "A" else ()
+    for pos in posicoes:
+        inicio = time.perf_counter()
+        nome_aba = escrever_uc(wb, dados_estruturados[pos], *extra)
+        if rastreio is not None:
+            rastreio.registrar('escrita_aba', time.perf_counter() - inicio,
+                               aba=nome_aba, faturas=len(dados_estruturados[pos]['dados']), incremental=True)
+    escrever_resumo(wb, dados_estruturados)
+    return posicoes
+
+
+def usar_streaming(qtd_geradoras, qtd_beneficiarias) -> bool:
+    return qtd_geradoras + qtd_beneficiarias >= UCS_STREAMING
+
+
+def _aba_da_uc(wb, item):
+    if item['tipo'] == 'geradora':
+        if item['indice'] == 1 and "UC GERADORA" in wb.sheetnames:
+            return wb["UC GERADORA"]
+        nome = f"UC GERADORA {item['indice']}"
+    else:
+        nome = f"UC BENEF. {item['indice']}"
+    return wb[nome] if nome in wb.sheetnames else None
+
+
+def gerar_planilha_streaming(grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                             destino=None, tempos=None, rastreio=None):
+    """
+    Mesmo resultado de gerar_planilha + salvar_planilha, com memória constante: cada aba
+    de UC é copiada do modelo, escrita e gravada no .xlsx antes da próxima. As abas vão
+    na ordem das UCs em `dados_estruturados` (a aba GRUPO A, compartilhada, fica por
+    último e com a mesma "última UC vence"). Devolve o `destino` de salvar_planilha_streaming.
+    """
+    if grupo not in ESCRITA_POR_UC:
+        raise ValueError(f"Grupo tarifário desconhecido: {grupo}")
+    escrever_uc, escrever_resumo, _ = ESCRITA_POR_UC[grupo]
+    tempos = {} if tempos is None else tempos
+    wb, moldes = preparar_planilha_streaming(modelo, qtd_geradoras, qtd_beneficiarias, tempos=tempos)
+    if rastreio is not None:
+        rastreio.registrar('carga', tempos['carga'])
+        rastreio.registrar('clonagem', tempos['clonagem'], abas=len(wb.sheetnames), streaming=True)
+    extra = (aba_geral(wb),) if grupo == "A" else ()
+    escrever_resumo(wb, dados_estruturados)
+
+    # Plano: aba -> UCs escritas logo antes de gravá-la. UCs sem aba (no Grupo A ainda
+    # escrevem na GRUPO A) vão junto da próxima aba, para manter a ordem das escritas.
+    plano, pendentes = {}, []
+    for item in dados_estruturados:
+        pendentes.append(item)
+        ws = _aba_da_uc(wb, item)
+        if ws is not None and id(ws) not in plano:
+            plano[id(ws)] = (ws, pendentes)
+            pendentes = []
+    ordem = [ws for ws, _ in plano.values()]
+    restantes = [ws for ws in wb.worksheets if id(ws) not in plano]
+    if restantes:
+        plano[id(restantes[0])] = (restantes[0], pendentes)
+
+    def preencher(ws):
+        inicio = time.perf_counter()
+        if ws in moldes:
+            WorksheetCopy(moldes.pop(ws), ws).copy_worksheet()
+        _, itens = plano.get(id(ws), (ws, ()))
+        for item in itens:
+            nome_aba = escrever_uc(wb, item, *extra)
+            if rastreio is not None:
+                rastreio.registrar('escrita_aba', time.perf_counter() - inicio,
+                                   aba=nome_aba, faturas=len(item['dados']), streaming=True)
+            inicio = time.perf_counter()
+
+    return salvar_planilha_streaming(wb, ordem, preencher, destino=destino, tempos=tempos, rastreio=rastreio)
@@ -0,0 +1,115 @@
+"""
+Plano de escrita das planilhas.
+
+Os writers (services.excel_writer, services.excel_writterA) não gravam célula a célula:
+listam (aba, linha, coluna, valor) num PlanoEscrita e um único aplicador grava tudo.
+O aplicador resolve células mescladas por um índice montado uma vez por aba (a escrita
+vai para a célula inicial do intervalo, como no Excel), descarta escritas repetidas na
+mesma célula (vale a última, como na gravação sequencial) e grava linha a linha.
+
+O mesmo plano serve para um dry-run: `diferencas` lista o que mudaria no workbook sem
+gravar nada, e `registros` exporta o plano (JSON) para comparar duas versões.
+"""
+from typing import NamedTuple
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+
+
+class Escrita(NamedTuple):
+    aba: str
+    linha: int
+    coluna: int
+    valor: object
+
+
+def _coluna(coluna) -> int:
+    return coluna if isinstance(coluna, int) else column_index_from_string(coluna)
+
+
+class PlanoEscrita:
+    """Escritas na ordem em que os writers as pediram."""
+
+    def __init__(self):
+        self.escritas = []
+
+    def __len__(self):
+        return len(self.escritas)
+
+    def __iter__(self):
+        return iter(self.escritas)
+
+    def adicionar(self, aba, linha, coluna, valor):
+        """`aba` é a Worksheet ou o nome dela; `coluna` a letra ("B") ou o número (2)."""
+        self.escritas.append(Escrita(aba if isinstance(aba, str) else aba.title, linha, _coluna(coluna), valor))
+
+    def por_aba(self) -> dict:
+        """{aba: [escritas]}, mantendo a ordem das escritas dentro de cada aba."""
+        abas = {}
+        for escrita in self.escritas:
+            abas.setdefault(escrita.aba, []).append(escrita)
+        return abas
+
+    def registros(self) -> list:
+        """[{'aba', 'celula', 'valor'}] para exportar (dry-run, comparação entre versões)."""
+        return [{'aba': e.aba, 'celula': f"{get_column_letter(e.coluna)}{e.linha}", 'valor': e.valor}
+                for e in self.escritas]
+
+
+def indice_mescladas(ws) -> dict:
+    """{(linha, coluna): (linha, coluna) da célula inicial} para as células de intervalos mesclados."""
+    indice = {}
+    for intervalo in ws.merged_cells.ranges:
+        inicio = (intervalo.min_row, intervalo.min_col)
+        for linha in range(intervalo.min_row, intervalo.max_row + 1):
+            for coluna in range(intervalo.min_col, intervalo.max_col + 1):
+                indice[(linha, coluna)] = inicio
+    return indice
+
+
+def _consolidar(ws, escritas) -> dict:
+    """{(linha, coluna) gravável: valor}; escritas em célula mesclada vão para a inicial, vale a última."""
+    mescladas = indice_mescladas(ws) if ws.merged_cells.ranges else {}
+    celulas = {}
+    for escrita in escritas:
+        posicao = (escrita.linha, escrita.coluna)
+        celulas[mescladas.get(posicao, posicao)] = escrita.valor
+    return celulas
+
+
+def aplicar(wb, plano) -> int:
+    """Grava o plano no workbook (abas ausentes são ignoradas). Devolve quantas células foram gravadas."""
+    gravadas = 0
+    for nome_aba, escritas in plano.por_aba().items():
+        if nome_aba not in wb.sheetnames:
+            continue
+        ws = wb[nome_aba]
+        celulas = _consolidar(ws, escritas)
+        for linha, coluna in sorted(celulas):
+            ws.cell(row=linha, column=coluna).value = celulas[(linha, coluna)]
+        gravadas += len(celulas)
+    return gravadas
+
+
+def _valor_sem_criar(ws, linha, coluna):
+    # ws._cells é interno do openpyxl (3.1); sem ele, ws.cell() cria a célula vazia
+    celulas = getattr(ws, "_cells", None)
+    if celulas is None:
+        return ws.cell(row=linha, column=coluna).value
+    celula = celulas.get((linha, coluna))
+    return celula.value if celula is not None else None
+
+
+def diferencas(wb, plano) -> list:
+    """Dry-run: [{'aba', 'celula', 'atual', 'novo'}] das células que o plano mudaria, sem gravar."""
+    resultado = []
+    for nome_aba, escritas in plano.por_aba().items():
+        if nome_aba not in wb.sheetnames:
+            continue
+        ws = wb[nome_aba]
+        celulas = _consolidar(ws, escritas)
+        for linha, coluna in sorted(celulas):
+            atual = _valor_sem_criar(ws, linha, coluna)
+            if atual != celulas[(linha, coluna)]:
+                resultado.append({'aba': nome_aba, 'celula': f"{get_column_letter(coluna)}{linha}",
+                                  'atual': atual, 'novo': celulas[(linha, coluna)]})
+    return resultado
@@ -0,0 +1,70 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class Rastreio:
+    """
+    Registro dos tempos de uma execução do pipeline.
+
+    Cada evento é um dict com 'etapa', 'inicio_s' (relativo ao início do rastreio),
+    'duracao_s' e os detalhes informados (UC, arquivo, aba, bytes...). Os services
+    recebem `rastreio=None` e só registram quando um rastreio é passado.
+    """
+
+    def __init__(self, **contexto):
+        self.contexto = contexto
+        self.eventos = []
+        self._inicio = time.perf_counter()
+
+    @classmethod
+    def de_dict(cls, dados):
+        """Reconstrói um rastreio exportado por para_dict() (ex.: vindo de uma tarefa em segundo plano)."""
+        rastreio = cls(**dados.get('contexto', {}))
+        rastreio.eventos = list(dados.get('eventos', []))
+        return rastreio
+
+    def registrar(self, etapa, duracao, **detalhes):
+        self.eventos.append({
+            'etapa': etapa,
+            'inicio_s': round(time.perf_counter() - self._inicio - duracao, 4),
+            'duracao_s': round(duracao, 4),
+            **detalhes,
+        })
+
+    @contextmanager
+    def etapa(self, nome, **detalhes):
+        """Mede o bloco; o dict entregue pode receber detalhes descobertos durante a etapa."""
+        inicio = time.perf_counter()
+        try:
+            yield detalhes
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio, **detalhes)
+
+    def resumo(self) -> list:
+        """Totais por etapa, na ordem em que apareceram: [{'etapa', 'qtd', 'total_s', 'max_s'}]."""
+        totais = {}
+        for evento in self.eventos:
+            t = totais.setdefault(evento['etapa'], {'etapa': evento['etapa'], 'qtd': 0, 'total_s': 0.0, 'max_s': 0.0})
+            t['qtd'] += 1
+            t['total_s'] += evento['duracao_s']
+            t['max_s'] = max(t['max_s'], evento['duracao_s'])
+        for t in totais.values():
+            t['total_s'] = round(t['total_s'], 4)
+        return list(totais.values())
+
+    def mais_lentos(self, etapa, quantidade=5) -> list:
+        eventos = [e for e in self.eventos if e['etapa'] == etapa]
+        return sorted(eventos, key=lambda e: e['duracao_s'], reverse=True)[:quantidade]
+
+    def para_dict(self) -> dict:
+        return {
+            'contexto': self.contexto,
+            'duracao_total_s': round(time.perf_counter() - self._inicio, 4),
+            'resumo': self.resumo(),
+            'eventos': self.eventos,
+        }
+
+    def para_json(self) -> str:
+        return json.dumps(self.para_dict(), ensure_ascii=False, indent=2, default=str)
+
@@ -0,0 +1,198 @@
+"""
+Motor de rateio dos créditos de geração entre as UCs (SCEE).
+
+A partir das faturas de geradoras e beneficiárias monta matrizes UC x competência
+(consumo da rede, créditos recebidos, saldo) e a série de energia injetada pelas
+geradoras, e calcula os percentuais de rateio:
+
+- atual: participação de cada UC nos créditos recebidos no período;
+- proporcional: participação de cada UC no consumo do período;
+- ótimo: percentuais fixos que maximizam o consumo compensado no período, com os
+  créditos que sobram num mês acumulando para os seguintes (saldo).
+
+Tudo é calculado em numpy sobre as matrizes inteiras, sem laço por UC ou por mês.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from services.base_faturas import competencia
+from services.ingestao import eh_geradora
+from services.registros import expandir
+
+# Limite de elementos da matriz UC x passo x mês avaliada de uma vez na otimização
+_ELEMENTOS_POR_BLOCO = 4_000_000
+
+
+class SeriesRateio(NamedTuple):
+    ucs: list
+    geradora: np.ndarray        # (U,) bool
+    competencias: list          # [202501, ...]
+    consumo: np.ndarray         # (U, T) kWh consumidos da rede
+    credito: np.ndarray         # (U, T) créditos recebidos
+    geracao: np.ndarray         # (T,) energia injetada somando todas as geradoras
+    saldo_atual: np.ndarray     # (U,) saldo da fatura mais recente de cada UC
+
+
+def consumo_da_fatura(dados) -> float:
+    """kWh consumidos da rede: energia_ativa (Grupo B) ou c_p + c_fp + c_hr (Grupo A)."""
+    if "energia_ativa" in dados:
+        return float(dados.get("energia_ativa") or 0.0)
+    return float(sum(dados.get(posto) or 0.0 for posto in ("c_p", "c_fp", "c_hr")))
+
+
+def agrupar_por_uc(dados_estruturados) -> tuple:
+    """
+    ({uc: faturas}, UCs geradoras) a partir do formato dos writers
+    ([{'tipo', 'indice', 'dados'}], do app ou de rotear_por_uc).
+    """
+    por_uc, geradoras = {}, set()
+    for item in dados_estruturados:
+        for dados in item['dados']:
+            if dados and dados.get("uc"):
+                por_uc.setdefault(dados["uc"], []).append(expandir(dados))
+                if item['tipo'] == 'geradora':
+                    geradoras.add(dados["uc"])
+    return por_uc, geradoras
+
+
+def montar_series(faturas_por_uc: dict, geradoras=None) -> SeriesRateio:
+    """
+    `faturas_por_uc`: {uc: [dicionários dos mappers]}. `geradoras` (conjunto de UCs)
+    é opcional; sem ele, geradora é a UC com energia gerada (como no envio em massa).
+    Meses sem fatura de uma UC recebem a média dos meses conhecidos dela.
+    """
+    registros = [
+        (uc, comp, consumo_da_fatura(d), float(d.get("energia_gerada") or 0.0),
+         float(d.get("credito_recebido") or 0.0), float(d.get("saldo") or 0.0))
+        for uc, faturas in faturas_por_uc.items() for d in faturas
+        if (comp := competencia(d.get("ano"), d.get("mes"))) is not None
+    ]
+    if not registros:
+        raise ValueError("Nenhuma fatura com competência reconhecida para o rateio.")
+    tabela = pd.DataFrame(registros, columns=["uc", "competencia", "consumo", "gerada", "credito", "saldo"])
+    # Reemissões do mesmo mês: fica a última informada
+    tabela = tabela.drop_duplicates(["uc", "competencia"], keep="last")
+
+    ucs = sorted(tabela["uc"].unique())
+    competencias = sorted(tabela["competencia"].unique())
+    matriz = lambda coluna: tabela.pivot(index="uc", columns="competencia", values=coluna).reindex(
+        index=ucs, columns=competencias)
+
+    consumo = matriz("consumo")
+    consumo = consumo.T.fillna(consumo.mean(axis=1)).T.to_numpy()
+    gerada = matriz("gerada")
+    gerada = gerada.T.fillna(gerada.mean(axis=1)).T.to_numpy()
+    if geradoras is None:
+        mascara = np.array([eh_geradora(faturas_por_uc[uc]) for uc in ucs])
+    else:
+        mascara = np.array([uc in geradoras for uc in ucs])
+    saldo_atual = tabela.sort_values("competencia").groupby("uc")["saldo"].last().reindex(ucs).to_numpy()
+
+    return SeriesRateio(
+        ucs=list(ucs), geradora=mascara, competencias=[int(c) for c in competencias],
+        consumo=consumo, credito=matriz("credito").fillna(0.0).to_numpy(),
+        geracao=(gerada * mascara[:, None]).sum(axis=0), saldo_atual=saldo_atual,
+    )
+
+
+def compensacao(alocado, consumo, saldo_inicial=0.0) -> tuple:
+    """
+    Consumo compensado e saldo final com acúmulo de créditos, vetorizado nos eixos
+    iniciais (o último eixo é o tempo). O saldo segue b[t] = max(0, b[t-1] + alocado[t]
+    - consumo[t]), resolvido em forma fechada: b[t] = S[t] + max(b0, -min(S[..t])),
+    com S a soma acumulada de (alocado - consumo).
+    Devolve (compensado, saldo_final), com o formato dos eixos iniciais.
+    """
+    saldo_inicial = np.asarray(saldo_inicial, dtype=float)
+    acumulado = np.cumsum(alocado - consumo, axis=-1)
+    minimo = np.minimum(np.minimum.accumulate(acumulado, axis=-1)[..., -1], 0.0)
+    saldo_final = acumulado[..., -1] + np.maximum(saldo_inicial, -minimo)
+    compensado = saldo_inicial + alocado.sum(axis=-1) - saldo_final
+    return compensado, saldo_final
+
+
+def _maior_resto(pesos, total_passos) -> np.ndarray:
+    """Divide `total_passos` inteiros proporcionalmente a `pesos` (método do maior resto)."""
+    pesos = np.asarray(pesos, dtype=float)
+    if total_passos <= 0:
+        return np.zeros(len(pesos), dtype=int)
+    if pesos.sum() <= 0:
+        pesos = np.ones(len(pesos))
+    cotas = pesos / pesos.sum() * total_passos
+    passos = np.floor(cotas).astype(int)
+    faltam = total_passos - passos.sum()
+    passos[np.argsort(-(cotas - passos), kind="stable")[:faltam]] += 1
+    return passos
+
+
+def otimizar(series: SeriesRateio, passo=0.001, usar_saldo=False) -> np.ndarray:
+    """
+    Percentuais fixos (frações, somando 1, múltiplos de `passo`) que maximizam o consumo
+    compensado no período. O compensado de cada UC é côncavo na fração recebida, então
+    escolher os maiores ganhos marginais de todas as UCs, passo a passo, dá o ótimo:
+    cada UC é avaliada em todas as frações k * passo de uma vez (blocos de UCs para
+    limitar a memória). Créditos que nenhuma UC aproveitaria são divididos pelo consumo.
+    """
+    qtd_passos = int(round(1 / passo))
+    fracoes = np.arange(qtd_passos + 1) * passo
+    saldo = series.saldo_atual if usar_saldo else np.zeros(len(series.ucs))
+    qtd_ucs, qtd_meses = series.consumo.shape
+    bloco = max(1, _ELEMENTOS_POR_BLOCO // ((qtd_passos + 1) * qtd_meses))
+
+    ganhos = np.empty((qtd_ucs, qtd_passos))
+    for inicio in range(0, qtd_ucs, bloco):
+        fim = min(inicio + bloco, qtd_ucs)
+        alocado = fracoes[None, :, None] * series.geracao[None, None, :]  # (1, K+1, T)
+        compensado, _ = compensacao(alocado, series.consumo[inicio:fim, None, :], saldo[inicio:fim, None])
+        # Ganhos marginais não crescentes (garante a concavidade contra arredondamentos)
+        ganhos[inicio:fim] = np.minimum.accumulate(np.diff(compensado, axis=1), axis=1)
+
+    uteis = np.flatnonzero(ganhos.ravel() > 1e-9)
+    escolhidos = uteis[np.argsort(-ganhos.ravel()[uteis], kind="stable")[:qtd_passos]]
+    passos = np.bincount(escolhidos // qtd_passos, minlength=qtd_ucs)
+    passos += _maior_resto(series.consumo.sum(axis=1), qtd_passos - passos.sum())
+    return passos * passo
+
+
+def calcular_rateio(series: SeriesRateio, passo=0.001, usar_saldo=False) -> tuple:
+    """
+    Devolve (tabela por UC, resumo). A tabela traz os percentuais atual, proporcional e
+    ótimo, e o compensado, não compensado e saldo final de cada UC com o rateio ótimo;
+    o resumo compara o total não compensado de cada estratégia.
+    """
+    qtd_passos = int(round(1 / passo))
+    saldo = series.saldo_atual if usar_saldo else np.zeros(len(series.ucs))
+    consumo_total = series.consumo.sum(axis=1)
+    credito_total = series.credito.sum(axis=1)
+    estrategias = {
+        'atual': _maior_resto(credito_total, qtd_passos) * passo if credito_total.sum() > 0 else None,
+        'proporcional': _maior_resto(consumo_total, qtd_passos) * passo,
+        'otimo': otimizar(series, passo=passo, usar_saldo=usar_saldo),
+    }
+
+    resumo = {'geracao_kwh': float(series.geracao.sum()), 'consumo_kwh': float(consumo_total.sum()),
+              'meses': len(series.competencias), 'ucs': len(series.ucs)}
+    resultados = {}
+    for nome, fracoes in estrategias.items():
+        if fracoes is None:
+            continue
+        compensado, saldo_final = compensacao(fracoes[:, None] * series.geracao[None, :], series.consumo, saldo)
+        resultados[nome] = (compensado, saldo_final)
+        resumo[f'nao_compensado_{nome}_kwh'] = float((consumo_total - compensado).sum())
+
+    compensado, saldo_final = resultados['otimo']
+    tabela = pd.DataFrame({
+        'uc': series.ucs,
+        'tipo': np.where(series.geradora, 'geradora', 'beneficiaria'),
+        'consumo_kwh': consumo_total,
+        'credito_recebido_kwh': credito_total,
+        'percentual_atual': np.round(estrategias['atual'] * 100, 4) if estrategias['atual'] is not None else np.nan,
+        'percentual_proporcional': np.round(estrategias['proporcional'] * 100, 4),
+        'percentual_otimo': np.round(estrategias['otimo'] * 100, 4),
+        'compensado_kwh': compensado,
+        'nao_compensado_kwh': consumo_total - compensado,
+        'saldo_final_kwh': saldo_final,
+    })
+    return tabela, resumo
@@ -0,0 +1,186 @@
+"""
+Registros compactos das faturas, para guardar muitas em memória (cache da sessão,
+lotes de arquivo com dezenas de milhares de faturas).
+
+Os mappers continuam devolvendo dicionários (é o formato dos writers, do cache em disco
+e do JSON das tarefas). `compactar` troca um dicionário por um registro com __slots__,
+com o ano sempre inteiro de 4 dígitos e o histórico em colunas (array) em vez de uma
+lista de dicionários; `expandir` devolve exatamente o dicionário original. Dicionários
+que não seguem o formato de um dos grupos (layouts novos, faturas não reconhecidas)
+passam pelos dois sem mudança.
+
+Comparação de memória: python -m benchmarks.bench_memoria
+"""
+from array import array
+from dataclasses import dataclass, fields
+from typing import ClassVar
+
+from services.campos import SIGLAS_MESES
+from services.indice_meses import NUMERO_MES, ano_completo
+
+
+@dataclass(slots=True)
+class HistoricoB:
+    """Histórico de consumo do Grupo B: uma posição por mês listado na fatura."""
+    COLUNAS: ClassVar[tuple] = ("consumo",)
+    ANO_TEXTO: ClassVar[bool] = False
+    meses: array  # 1..12
+    anos: array   # como veio na fatura (24 ou 2025)
+    consumo: array
+
+
+@dataclass(slots=True)
+class HistoricoA:
+    """Histórico de demanda e consumo por posto do Grupo A."""
+    COLUNAS: ClassVar[tuple] = ("d_p", "d_fp", "d_hr", "c_p", "c_fp", "c_hr")
+    ANO_TEXTO: ClassVar[bool] = True
+    meses: array
+    anos: array
+    d_p: array
+    d_fp: array
+    d_hr: array
+    c_p: array
+    c_fp: array
+    c_hr: array
+
+
+def _historico_de_lista(classe, historico):
+    # array("d") aceitaria inteiros e o dicionário expandido não voltaria idêntico
+    tipo_ano = str if classe.ANO_TEXTO else int
+    if not all(type(h["ano"]) is tipo_ano and all(type(h[c]) is float for c in classe.COLUNAS) for h in historico):
+        raise TypeError("histórico fora do formato do mapper")
+    colunas = {
+        'meses': array("B", (NUMERO_MES[h["mes"]] for h in historico)),
+        'anos': array("H", (int(h["ano"]) for h in historico)),
+    }
+    for coluna in classe.COLUNAS:
+        colunas[coluna] = array("d", (h[coluna] for h in historico))
+    return classe(**colunas)
+
+
+def _historico_para_lista(serie) -> list:
+    colunas = [(coluna, getattr(serie, coluna)) for coluna in serie.COLUNAS]
+    return [
+        {
+            "mes": SIGLAS_MESES[mes - 1],
+            "ano": f"{ano:02d}" if serie.ANO_TEXTO else ano,
+            **{coluna: valores[pos] for coluna, valores in colunas},
+        }
+        for pos, (mes, ano) in enumerate(zip(serie.meses, serie.anos))
+    ]
+
+
+class _Fatura:
+    """Conversões comuns aos registros de fatura (as subclasses são dataclasses com slots)."""
+    __slots__ = ()
+    HISTORICO: ClassVar[type]
+    ANO_TEXTO: ClassVar[bool]
+
+    @classmethod
+    def de_dict(cls, dados):
+        campos = {f.name: dados[f.name] for f in fields(cls) if f.name not in ("ano", "historico", "layout")}
+        return cls(
+            ano=ano_completo(dados["ano"]) or 0,
+            historico=_historico_de_lista(cls.HISTORICO, dados["historico"]),
+            layout=dados.get("layout"),
+            **campos,
+        )
+
+    def para_dict(self) -> dict:
+        dados = {}
+        for f in fields(self):
+            valor = getattr(self, f.name)
+            if f.name == "ano":
+                valor = f"{valor % 100:02d}" if self.ANO_TEXTO else valor
+            elif f.name == "historico":
+                valor = _historico_para_lista(valor)
+            elif f.name == "layout" and valor is None:
+                continue
+            dados[f.name] = valor
+        return dados
+
+    def get(self, campo, padrao=None):
+        """Leitura pontual no formato do dicionário (ex.: item['dados'][0].get("uc"))."""
+        if campo in ("ano", "historico"):
+            return self.para_dict()[campo]
+        valor = getattr(self, campo, None) if campo in self.__slots__ else None
+        return padrao if valor is None else valor
+
+
+@dataclass(slots=True)
+class FaturaB(_Fatura):
+    HISTORICO: ClassVar[type] = HistoricoB
+    ANO_TEXTO: ClassVar[bool] = False
+    uc: str
+    mes: str
+    ano: int
+    endereco: str
+    titular: str
+    data_leitura_anterior: str
+    data_leitura_atual: str
+    medidor: str
+    leitura_anterior: int
+    leitura_atual: int
+    energia_ativa: float
+    energia_gerada: float
+    credito_recebido: float
+    saldo: float
+    valor_fatura: float
+    historico: HistoricoB
+    layout: str = None  # só no modo de detecção automática
+
+
+@dataclass(slots=True)
+class FaturaA(_Fatura):
+    HISTORICO: ClassVar[type] = HistoricoA
+    ANO_TEXTO: ClassVar[bool] = True
+    uc: str
+    mes: str
+    ano: int
+    endereco: str
+    titular: str
+    data_leitura_anterior: str
+    data_leitura_atual: str
+    c_p: float
+    c_fp: float
+    c_hr: float
+    d_p: float
+    d_fp: float
+    d_hr: float
+    credito_recebido: float
+    saldo: float
+    valor_fatura: float
+    energia_gerada: float
+    historico: HistoricoA
+    layout: str = None
+
+
+def _campos(classe) -> frozenset:
+    return frozenset(f.name for f in fields(classe))
+
+
+# Conjunto de chaves do dicionário -> registro (com e sem 'layout')
+_REGISTROS = {}
+for _classe in (FaturaA, FaturaB):
+    _REGISTROS[_campos(_classe)] = _classe
+    _REGISTROS[_campos(_classe) - {"layout"}] = _classe
+
+
+def compactar(dados):
+    """
+    Registro compacto equivalente ao dicionário, ou o próprio dicionário quando ele não
+    segue o formato de um grupo ou não voltaria idêntico (a conversão nunca perde dados).
+    """
+    classe = _REGISTROS.get(frozenset(dados)) if isinstance(dados, dict) else None
+    if classe is None:
+        return dados
+    try:
+        registro = classe.de_dict(dados)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return dados
+    return registro if registro.para_dict() == dados else dados
+
+
+def expandir(dados) -> dict:
+    """Dicionário no formato dos mappers/writers, a partir de um registro ou dicionário."""
+    return dados.para_dict() if isinstance(dados, _Fatura) else dados
@@ -0,0 +1,331 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from services.base_faturas import completar_com_base
+from services.extracao import AUTO, grupo_predominante, separar_grupo
+from services.ingestao import PastaEnvio, contar_ucs, ler_envio, rotear_por_uc
+from services.rastreio import Rastreio
+
+DIRETORIO_PADRAO = os.environ.get(
+    "BALANCO_TAREFAS_DIR", os.path.join(tempfile.gettempdir(), "essential_tarefas")
+)
+
+NA_FILA, EXECUTANDO, CONCLUIDA, ERRO = "na_fila", "executando", "concluida", "erro"
+# Ids são uuid4().hex; qualquer outra coisa (ex.: vinda da URL) é tarefa inexistente
+PADRAO_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class FilaTarefas:
+    """
+    Fila local de processamentos em segundo plano (threads, sem broker externo).
+
+    Cada tarefa tem uma pasta `<diretorio>/<id>/` com `status.json` (estado, progresso,
+    mensagem, detalhes) e, quando conclui, `resultado.xlsx` (ou `resultado.<extensao>`
+    quando os detalhes trazem 'extensao'). Por estar em disco, o resultado sobrevive a um
+    refresh do navegador e pode ser baixado depois por qualquer sessão que conheça o id. `max_simultaneas` limita quantas tarefas rodam ao mesmo
+    tempo somando todos os usuários; as demais esperam na fila.
+    Tarefas terminadas há mais de `validade_horas` são apagadas (pasta e status em
+    memória) na subida e, com o servidor no ar, a cada `intervalo_limpeza_s` no máximo,
+    quando uma tarefa é submetida ou consultada.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, max_simultaneas=2, validade_horas=24, intervalo_limpeza_s=600):
+        self.diretorio = diretorio
+        self.validade_s = validade_horas * 3600
+        self.intervalo_limpeza_s = intervalo_limpeza_s
+        self._executor = ThreadPoolExecutor(max_workers=max_simultaneas, thread_name_prefix="tarefa")
+        self._lock = threading.Lock()
+        self._status = {}
+        self._proxima_limpeza = 0.0
+        os.makedirs(diretorio, exist_ok=True)
+        self._recuperar()
+
+    # --- Persistência ---
+    def _pasta(self, id_tarefa):
+        return os.path.join(self.diretorio, id_tarefa)
+
+    def _gravar_status(self, id_tarefa, status):
+        # Escrita atômica: a página lê o status enquanto a tarefa atualiza o progresso
+        fd, tmp = tempfile.mkstemp(dir=self._pasta(id_tarefa), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(status, f, ensure_ascii=False, default=str)
+        os.replace(tmp, os.path.join(self._pasta(id_tarefa), "status.json"))
+
+    def _atualizar(self, id_tarefa, **campos):
+        with self._lock:
+            status = {**self._status[id_tarefa], **campos}
+            self._status[id_tarefa] = status
+        self._gravar_status(id_tarefa, status)
+
+    def _recuperar(self):
+        """Na subida do servidor: marca como interrompidas as tarefas que estavam rodando e descarta as vencidas."""
+        for nome in os.listdir(self.diretorio):
+            status = self._ler_status(nome)
+            if status is not None and status["estado"] in (NA_FILA, EXECUTANDO):
+                self._status[nome] = status
+                self._atualizar(nome, estado=ERRO, mensagem="Interrompida: o servidor foi reiniciado.")
+        self._expirar()
+
+    def _expirar(self):
+        """Apaga as tarefas vencidas que não estão rodando; no máximo uma varredura por intervalo_limpeza_s."""
+        agora = time.time()
+        with self._lock:
+            if agora < self._proxima_limpeza:
+                return
+            self._proxima_limpeza = agora + self.intervalo_limpeza_s
+        for nome in os.listdir(self.diretorio):
+            status = self._ler_status(nome)
+            if status is None or status["estado"] in (NA_FILA, EXECUTANDO):
+                continue
+            if agora - status.get("criada_em", 0) > self.validade_s:
+                with self._lock:
+                    self._status.pop(nome, None)
+                shutil.rmtree(self._pasta(nome), ignore_errors=True)
+
+    # --- API ---
+    def submeter(self, funcao, *args, descricao="", **kwargs) -> str:
+        """
+        Enfileira `funcao(*args, progresso=..., **kwargs)`, que deve devolver
+        (conteúdo .xlsx, detalhes JSON-serializáveis). O conteúdo pode ser bytes ou um
+        arquivo aberto (copiado aos poucos para a pasta da tarefa e fechado). `progresso(fracao, mensagem)`
+        pode ser chamado pela função para alimentar a barra da página.
+        """
+        self._expirar()
+        id_tarefa = uuid.uuid4().hex
+        os.makedirs(self._pasta(id_tarefa))
+        with self._lock:
+            self._status[id_tarefa] = {
+                "id": id_tarefa, "descricao": descricao, "estado": NA_FILA, "progresso": 0.0,
+                "mensagem": "Aguardando na fila...", "criada_em": time.time(),
+                "iniciada_em": None, "concluida_em": None, "detalhes": {},
+            }
+        self._gravar_status(id_tarefa, self._status[id_tarefa])
+        self._executor.submit(self._executar, id_tarefa, funcao, args, kwargs)
+        return id_tarefa
+
+    def _executar(self, id_tarefa, funcao, args, kwargs):
+        self._atualizar(id_tarefa, estado=EXECUTANDO, iniciada_em=time.time(), mensagem="Iniciando...")
+
+        def _progresso(fracao, mensagem=None):
+            campos = {"progresso": round(min(max(fracao, 0.0), 1.0), 4)}
+            if mensagem:
+                campos["mensagem"] = mensagem
+            self._atualizar(id_tarefa, **campos)
+
+        try:
+            conteudo, detalhes = funcao(*args, progresso=_progresso, **kwargs)
+            arquivo = f"resultado.{detalhes.get('extensao', 'xlsx')}"
+            with open(os.path.join(self._pasta(id_tarefa), arquivo), "wb") as f:
+                if hasattr(conteudo, "read"):
+                    with conteudo:
+                        shutil.copyfileobj(conteudo, f)
+                else:
+                    f.write(conteudo)
+            self._atualizar(id_tarefa, estado=CONCLUIDA, progresso=1.0, mensagem="Concluída.",
+                            concluida_em=time.time(), detalhes=detalhes, arquivo=arquivo)
+        except Exception as e:
+            self._atualizar(id_tarefa, estado=ERRO, mensagem=f"{type(e).__name__}: {e}", concluida_em=time.time())
+
+    def status(self, id_tarefa):
+        """Status da tarefa, ou None se ela não existe (ou o id não é de uma tarefa)."""
+        self._expirar()
+        return self._ler_status(id_tarefa)
+
+    def _ler_status(self, id_tarefa):
+        if not PADRAO_ID.fullmatch(id_tarefa or ""):
+            return None
+        with self._lock:
+            if id_tarefa in self._status:
+                return dict(self._status[id_tarefa])
+        try:
+            with open(os.path.join(self._pasta(id_tarefa), "status.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _arquivo_resultado(self, id_tarefa):
+        status = self._ler_status(id_tarefa)
+        if status is None:
+            return None
+        return os.path.join(self._pasta(id_tarefa), status.get("arquivo", "resultado.xlsx"))
+
+    def tem_resultado(self, id_tarefa) -> bool:
+        arquivo = self._arquivo_resultado(id_tarefa)
+        return arquivo is not None and os.path.exists(arquivo)
+
+    def resultado(self, id_tarefa):
+        if self._arquivo_resultado(id_tarefa) is None:
+            return None
+        try:
+            with open(self._arquivo_resultado(id_tarefa), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def encerrar(self, esperar=True):
+        self._executor.shutdown(wait=esperar)
+
+
+def congelar_arquivo(arquivo, pasta=None):
+    """Cópia em disco de um upload (services.ingestao.PastaEnvio), mantendo o nome."""
+    return (pasta or PastaEnvio()).gravar(arquivo)
+
+
+def congelar_envio(arquivos) -> list:
+    """Copia os arquivos de um envio em massa (ZIPs/PDFs) para uma mesma pasta em disco."""
+    pasta = PastaEnvio()
+    return [congelar_arquivo(a, pasta) for a in arquivos]
+
+
+def congelar_uploads(dados_processamento) -> list:
+    """
+    Copia os PDFs para uma pasta em disco própria da tarefa. Os UploadedFile do Streamlit
+    pertencem à sessão e não podem ser lidos por uma thread depois do rerun; em disco, a
+    tarefa não segura o lote em memória (a extração mapeia um PDF por vez). A pasta é
+    apagada quando a tarefa termina e solta os arquivos.
+    """
+    pasta = PastaEnvio()
+    return [{**item, 'arquivos': [congelar_arquivo(a, pasta) for a in item['arquivos']]}
+            for item in dados_processamento]
+
+
+def _progresso_extracao(progresso, rotulo):
+    def _ao_concluir(concluidos, total, item):
+        progresso(concluidos / (total + 1), f"{rotulo(item)}... ({concluidos}/{total} PDFs)")
+    return _ao_concluir
+
+
+def _rotulo_grupo(grupo_fatura) -> str:
+    return f"Grupo {grupo_fatura}" if grupo_fatura else "layout não reconhecido"
+
+
+def _grupo_detectado(dados_estruturados, rastreio) -> str:
+    grupo = grupo_predominante(dados_estruturados)
+    rastreio.contexto['grupo'] = grupo
+    return grupo
+
+
+def _usar_base(base, dados_estruturados, grupo, completar, rastreio) -> tuple:
+    """
+    Grava as faturas lidas na BaseFaturas e, com `completar`, acrescenta as guardadas
+    para os meses sem PDF novo. Devolve (dados_estruturados, faturas vindas da base).
+    """
+    if base is None:
+        return dados_estruturados, 0
+    with rastreio.etapa('base_faturas'):
+        base.gravar([dados for item in dados_estruturados for dados in item['dados']], grupo)
+        if not completar:
+            return dados_estruturados, 0
+        return completar_com_base(base, dados_estruturados, grupo)
+
+
+def _gerar_saida(sessao, formato, grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                 progresso, rastreio) -> tuple:
+    """(conteúdo, info): a planilha da sessão ('xlsx') ou a exportação tabular, sem openpyxl."""
+    if formato == "xlsx":
+        progresso(0.95, "Gravando dados no Excel...")
+        return sessao.gerar(grupo, modelo, dados_estruturados, qtd_geradoras, qtd_beneficiarias, rastreio=rastreio)
+    progresso(0.95, f"Exportando {formato.upper()}...")
+    # pandas só quando há exportação: o app importa este módulo a cada subida do servidor
+    from services.exportacao import exportar, tabela_faturas
+    with rastreio.etapa('exportacao', formato=formato) as detalhes:
+        tabela = tabela_faturas(dados_estruturados, grupo)
+        conteudo = exportar(tabela, formato)
+        detalhes.update(linhas=len(tabela), bytes=len(conteudo))
+    return conteudo, {'modo': 'exportacao', 'ucs_regravadas': 0, 'total_ucs': len(dados_estruturados),
+                      'linhas': len(tabela)}
+
+
+def processar_balanco(sessao, dados_processamento, grupo, modelo, qtd_geradoras, qtd_beneficiarias,
+                      processos=None, leitor=None, base=None, completar=False, formato="xlsx",
+                      progresso=None) -> tuple:
+    """
+    Tarefa do app: extração + planilha com a SessaoIncremental do usuário.
+    Devolve (conteúdo .xlsx, {'info', 'rastreio'}); `info` traz o modo da planilha
+    (completa, incremental, reaproveitada, streaming) e quantos PDFs já tinham sido lidos na sessão.
+    Com grupo AUTO, os detalhes trazem também 'outro_grupo' (faturas deixadas de fora).
+    Com `base` (BaseFaturas), as faturas lidas são gravadas nela e, com `completar`, os
+    meses sem PDF vêm da base ('da_base' em `info`).
+    Com `formato` "csv" ou "parquet" (services.exportacao), o resultado é a tabela de
+    faturas por UC e mês no lugar da planilha (modo 'exportacao'; `modelo` não é usado).
+    """
+    progresso = progresso or (lambda fracao, mensagem=None: None)
+    rastreio = Rastreio(grupo=grupo, geradoras=qtd_geradoras, beneficiarias=qtd_beneficiarias,
+                        processos=processos, leitor=leitor)
+    ao_concluir = _progresso_extracao(progresso, lambda item: f"Lendo faturas da {item['tipo']} {item['indice']}")
+
+    # Duas tarefas da mesma sessão não mexem no estado incremental ao mesmo tempo
+    with sessao.trava:
+        ja_lidas = sessao.cache.acertos
+        with rastreio.etapa('extracao_total'):
+            dados_estruturados = sessao.extrair(dados_processamento, grupo, max_workers=processos,
+                                                ao_concluir=ao_concluir, rastreio=rastreio, leitor=leitor)
+        info_extracao = {'lidas_na_sessao': sessao.cache.acertos - ja_lidas,
+                         'pdfs': sum(len(item['arquivos']) for item in dados_processamento)}
+        outro_grupo = []
+        if grupo == AUTO:
+            # A planilha é do grupo da maioria; as demais faturas são listadas para
+            # serem enviadas com o modelo do grupo delas (já ficam no cache da sessão)
+            grupo = _grupo_detectado(dados_estruturados, rastreio)
+            dados_estruturados, fora = separar_grupo(dados_estruturados, grupo)
+            outro_grupo = [
+                f"{getattr(dados_processamento[pos_item]['arquivos'][pos_arq], 'name', '')} ({_rotulo_grupo(g)})"
+                for pos_item, pos_arq, g in fora
+            ]
+        dados_estruturados, info_extracao['da_base'] = _usar_base(base, dados_estruturados, grupo, completar, rastreio)
+        conteudo, info = _gerar_saida(sessao, formato, grupo, modelo, dados_estruturados, qtd_geradoras,
+                                      qtd_beneficiarias, progresso, rastreio)
+    return conteudo, {'info': {**info, **info_extracao}, 'outro_grupo': outro_grupo,
+                      'rastreio': rastreio.para_dict(), 'extensao': formato}
+
+
+def processar_envio_em_massa(sessao, arquivos, grupo, modelo, processos=None, leitor=None, base=None,
+                             completar=False, formato="xlsx", progresso=None) -> tuple:
+    """
+    Tarefa do app para o envio em massa (ZIPs e/ou PDFs soltos): lê todas as faturas,
+    agrupa pelo número da UC, classifica geradoras/beneficiárias e gera a planilha com
+    as quantidades de UC encontradas. Os detalhes trazem também 'ucs', 'ignorados' e
+    (grupo AUTO) 'outro_grupo'. `base`, `completar` e `formato` como em processar_balanco.
+    """
+    progresso = progresso or (lambda fracao, mensagem=None: None)
+    progresso(0.0, "Abrindo os arquivos enviados...")
+    pdfs = ler_envio(arquivos)
+    if not pdfs:
+        raise ValueError("Nenhum PDF encontrado no envio.")
+    rastreio = Rastreio(grupo=grupo, processos=processos, leitor=leitor, envio_em_massa=True)
+    ao_concluir = _progresso_extracao(progresso, lambda item: "Lendo faturas")
+
+    with sessao.trava:
+        ja_lidas = sessao.cache.acertos
+        with rastreio.etapa('extracao_total'):
+            (lido,) = sessao.extrair([{'tipo': 'envio', 'indice': 1, 'arquivos': pdfs}], grupo,
+                                     max_workers=processos, ao_concluir=ao_concluir, rastreio=rastreio, leitor=leitor)
+        faturas, outro_grupo = lido['dados'], []
+        if grupo == AUTO:
+            # Faturas do outro grupo saem do envio; as sem layout reconhecido seguem e
+            # aparecem em 'ignorados' (sem número de UC)
+            grupo = _grupo_detectado([lido], rastreio)
+            outros = {pos_arq: g for _, pos_arq, g in separar_grupo([lido], grupo)[1] if g}
+            outro_grupo = [f"{pdfs[pos].name} ({_rotulo_grupo(g)})" for pos, g in outros.items()]
+            pdfs = [pdf for pos, pdf in enumerate(pdfs) if pos not in outros]
+            faturas = [dados for pos, dados in enumerate(faturas) if pos not in outros]
+        with rastreio.etapa('roteamento'):
+            dados_estruturados, ucs, ignorados = rotear_por_uc(pdfs, faturas)
+        if not dados_estruturados:
+            raise ValueError("Nenhuma fatura com número de UC reconhecido.")
+        dados_estruturados, da_base = _usar_base(base, dados_estruturados, grupo, completar, rastreio)
+        qtd_geradoras, qtd_beneficiarias = contar_ucs(dados_estruturados)
+        rastreio.contexto.update(geradoras=qtd_geradoras, beneficiarias=qtd_beneficiarias)
+        conteudo, info = _gerar_saida(sessao, formato, grupo, modelo, dados_estruturados, qtd_geradoras,
+                                      qtd_beneficiarias, progresso, rastreio)
+
+    info.update(lidas_na_sessao=sessao.cache.acertos - ja_lidas, pdfs=len(lido['dados']), da_base=da_base)
+    return conteudo, {'info': info, 'ucs': ucs, 'ignorados': ignorados, 'outro_grupo': outro_grupo,
+                      'rastreio': rastreio.para_dict(), 'extensao': formato}
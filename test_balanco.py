@@ -0,0 +1,55 @@
+import numpy as np
+
+from benchmarks.sintetico import gerar_lote
+from services.balanco import calcular_balanco, simular_saldo
+from services.rateio import agrupar_por_uc
+
+
+def _simulacao_mes_a_mes(credito, demanda, saldo_inicial, validade):
+    """Referência: lotes de crédito por mês, usados do mais antigo ao mais novo."""
+    lotes, compensado, expirado = [[0, saldo_inicial]], [], []
+    for t, (entrada, necessidade) in enumerate(zip(credito, demanda)):
+        lotes.append([t, entrada])
+        usado = 0.0
+        for lote in lotes:
+            parte = min(lote[1], necessidade - usado)
+            lote[1] -= parte
+            usado += parte
+        vencido = sum(lote[1] for lote in lotes if lote[0] <= t - validade)
+        lotes = [lote for lote in lotes if lote[0] > t - validade]
+        compensado.append(usado)
+        expirado.append(vencido)
+    return compensado, expirado, sum(lote[1] for lote in lotes)
+
+
+def test_saldo_com_expiracao_igual_a_simulacao_mes_a_mes():
+    rng = np.random.default_rng(3)
+    credito = rng.uniform(0, 10, (8, 30)) * (rng.random((8, 30)) < 0.7)
+    demanda, saldo = rng.uniform(0, 6, (8, 30)), rng.uniform(0, 20, 8)
+    for validade in (3, 5, 60):
+        compensado, saldo_mes, expirado = simular_saldo(credito, demanda, saldo, validade)
+        for u in range(8):
+            esperado, vencido, final = _simulacao_mes_a_mes(credito[u], demanda[u], saldo[u], validade)
+            assert np.allclose(compensado[u], esperado) and np.allclose(expirado[u], vencido)
+            assert np.isclose(saldo_mes[u, -1], final)
+
+
+def test_balanco_por_posto_das_faturas_sinteticas():
+    lote = gerar_lote("A", qtd_geradoras=1, qtd_beneficiarias=2, meses=12, semente=5)
+    por_uc, geradoras = agrupar_por_uc(
+        [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote])
+    balanco = calcular_balanco(por_uc, geradoras, fatores={"P": 2.0})
+
+    assert len(balanco.mensal) == 3 * 12 and set(balanco.postos['posto']) == {"FP", "HR", "P"}
+    assert np.isclose(balanco.resumo['percentual_rateio'].sum(), 100)
+    geracao = balanco.mensal.groupby('competencia')['geracao_kwh'].sum()
+    assert np.allclose(balanco.mensal.groupby('competencia')['credito_alocado_kwh'].sum(), geracao)
+    # Crédito que entra = compensado (em kWh de crédito) + expirado + saldo final
+    mensal, postos = balanco.mensal, balanco.postos
+    gasto = (postos['compensado_kwh'] * postos['posto'].map({"FP": 1.0, "HR": 1.0, "P": 2.0})).sum()
+    assert np.isclose(mensal['credito_alocado_kwh'].sum(),
+                      gasto + mensal['expirado_kwh'].sum() + balanco.resumo['saldo_final_kwh'].sum())
+    # Ponta só é compensada depois de fora ponta e reservado
+    compensado = postos.pivot_table(index=['uc', 'competencia'], columns='posto', values='compensado_kwh')
+    faturado = postos.pivot_table(index=['uc', 'competencia'], columns='posto', values='faturado_kwh')
+    assert np.allclose(faturado.loc[compensado['P'] > 0, ['FP', 'HR']], 0)
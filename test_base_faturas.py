@@ -0,0 +1,38 @@
+from benchmarks.sintetico import gerar_lote
+from services.base_faturas import BaseFaturas, competencia, completar_com_base
+from services.registros import compactar
+
+
+def test_grava_e_consulta_por_uc_e_periodo(tmp_path):
+    base = BaseFaturas(str(tmp_path / "base.sqlite3"))
+    lote_B = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=1, meses=12, semente=2)
+    lote_A = gerar_lote("A", qtd_geradoras=1, qtd_beneficiarias=0, meses=3, semente=3)
+    assert base.gravar([d for item in lote_B for d in item['esperados']], "B", cliente="Solar") == 24
+    # Registros compactos também são aceitos; sem UC/competência não entra
+    assert base.gravar([compactar({**d, 'layout': "A"}) for d in lote_A[0]['esperados']] + [{"uc": ""}], "A") == 3
+
+    uc = lote_B[0]['esperados'][0]['uc']
+    trimestre = base.consultar(ucs=[uc], de=202504, ate=202506)
+    assert [(d['mes'], d['ano']) for d in trimestre] == [("ABR", 2025), ("MAI", 2025), ("JUN", 2025)]
+    assert trimestre[0] == lote_B[0]['esperados'][3]
+    assert len(base.consultar(cliente="Solar")) == 24 and len(base.consultar(grupo="A")) == 3
+    assert base.consultar(ucs=[]) == []
+
+    # Reemissão do mesmo mês substitui a anterior
+    base.gravar([{**lote_B[0]['esperados'][0], "valor_fatura": 1.0}], "B")
+    assert base.consultar(ucs=[uc], ate=202501)[0]["valor_fatura"] == 1.0
+    assert base.competencias(uc)[:2] == [202501, 202502]
+
+
+def test_completa_meses_sem_pdf(tmp_path):
+    base = BaseFaturas(str(tmp_path / "base.sqlite3"))
+    (item,) = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=12, semente=8)
+    base.gravar(item['esperados'][:11], "B")
+    enviados = [{'tipo': 'geradora', 'indice': 1, 'dados': item['esperados'][9:]},
+                {'tipo': 'beneficiaria', 'indice': 1, 'dados': []}]
+
+    completados, da_base = completar_com_base(base, enviados, "B")
+    assert da_base == 9  # JAN..SET vêm da base; OUT, NOV e DEZ vieram no envio
+    assert sorted(competencia(d['ano'], d['mes']) for d in completados[0]['dados']) == list(range(202501, 202513))
+    assert completados[1] == enviados[1]
+    assert completar_com_base(base, enviados, "A")[1] == 0
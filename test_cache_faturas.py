@@ -0,0 +1,51 @@
+import os
+import time
+
+from services.cache_faturas import CacheFaturas
+
+
+def _tamanho(pasta):
+    return sum(e.stat().st_size for e in os.scandir(pasta))
+
+
+def test_descarta_os_menos_usados(tmp_path):
+    dados = {"uc": "x" * 100}
+    cache = CacheFaturas(str(tmp_path), limite_bytes=500)
+    for chave in "abcd":
+        cache.guardar(chave, "v1", None, dados)
+    # Datas de uso explícitas: a, b, c, d (do mais antigo ao mais recente)
+    agora = time.time()
+    for i, chave in enumerate("abcd"):
+        os.utime(tmp_path / f"{chave}-v1.json", (agora - 100 + i, agora - 100 + i))
+    assert cache.obter_dados("a", "v1") == dados  # o acerto torna "a" o mais recente
+
+    cache.guardar("e", "v1", None, dados)
+    assert sorted(os.listdir(tmp_path)) == ["a-v1.json", "c-v1.json", "d-v1.json", "e-v1.json"]
+    assert _tamanho(tmp_path) <= 500
+
+
+def test_limite_de_tamanho_sem_varrer_a_cada_gravacao(tmp_path, monkeypatch):
+    cache = CacheFaturas(str(tmp_path), limite_bytes=4000)
+    varreduras = []
+    podar = cache.podar
+    monkeypatch.setattr(cache, "podar", lambda: varreduras.append(1) or podar())
+    for i in range(10):
+        cache.guardar(f"{i:02d}", "v1", "texto " * 20, {"i": i})
+    assert varreduras == [1]  # só a primeira gravação varre a pasta
+
+    for i in range(10, 60):
+        cache.guardar(f"{i:02d}", "v1", "texto " * 20, {"i": i})
+        assert _tamanho(tmp_path) <= 4000
+    assert 1 < len(varreduras) < 20
+    assert cache.obter_dados("59", "v1") == {"i": 59}
+
+
+def test_contadores_de_acerto(tmp_path):
+    cache = CacheFaturas(str(tmp_path))
+    assert cache.estatisticas() == {"acertos": 0, "falhas": 0, "taxa_acerto": 0.0}
+    assert cache.obter_dados("pdf", "v1") is None
+    cache.guardar("pdf", "v1", "texto da fatura", {"uc": "1"})
+    assert cache.obter_dados("pdf", "v1") == {"uc": "1"}
+    assert cache.obter_dados("pdf", "v2") is None  # outra versão do mapper
+    assert cache.obter_texto("pdf") == "texto da fatura"  # texto não conta como consulta
+    assert cache.estatisticas() == {"acertos": 1, "falhas": 2, "taxa_acerto": 1 / 3}
@@ -0,0 +1,66 @@
+import time
+
+from benchmarks.sintetico import gerar_lote
+from services.base_faturas import BaseFaturas
+from services.cadastro_ucs import CadastroUCs, tokens
+
+
+def _fatura(uc, mes, ano, endereco, titular):
+    return {"uc": uc, "mes": mes, "ano": ano, "endereco": endereco, "titular": titular}
+
+
+def test_variantes_de_endereco_dao_os_mesmos_tokens():
+    referencia = tokens("RUA CEDROARANA, Q. E 3, L. 17, S/N")
+    assert referencia == ("RUA", "CEDROARANA", "QUADRA", "E", "3", "LOTE", "17")
+    assert tokens("R. Cedroarana QD E3 LT 017") == referencia
+    assert tokens("rua cedroarana quadra e-3 lote 17") == referencia
+
+
+def test_busca_aproximada_e_historico_de_titulares():
+    cadastro = CadastroUCs()
+    cadastro.atualizar([
+        _fatura("100", "JAN", 2025, "RUA CEDROARANA, Q. E 3, L. 17, S/N", "DANIELA LONDE RABELO"),
+        _fatura("200", "JAN", 2025, "RUA CEDROARANA, Q. E 4, L. 17, S/N", "JOAO PEREIRA"),
+        _fatura("300", "JAN", 2025, "AV. T-63, Q. B 2, L. 5", "MARIA DA SILVA"),
+        # Troca de titularidade da UC 100, enviada fora de ordem
+        _fatura("100", "MAR", 2025, "RUA CEDROARANA, Q. E 3, L. 17, S/N", "JOSE CARLOS"),
+        _fatura("100", "FEV", 2025, "RUA CEDROARANA, Q. E 3, L. 17, S/N", "DANIELA LONDE RABELO"),
+    ])
+
+    (melhor, pontos), *outras = cadastro.buscar_endereco("Cedrorana qd e3 lt 17")  # erro de digitação
+    assert melhor.uc == "100" and all(p < pontos for _, p in outras)
+    assert cadastro.buscar_endereco("R. Cedroarana QD E3 LT 017")[0][1] == 1.0
+    assert melhor.titular == "JOSE CARLOS"
+    assert melhor.titulares == (("DANIELA LONDE RABELO", 202501, 202502), ("JOSE CARLOS", 202503, 202503))
+    # O titular antigo continua achando a UC
+    assert [f.uc for f, _ in cadastro.buscar_titular("daniela londe")] == ["100"]
+    assert [f.uc for f, _ in cadastro.buscar_uc("3")] == ["300"]
+
+
+def test_sincroniza_com_a_base_so_o_que_e_novo(tmp_path):
+    base = BaseFaturas(str(tmp_path / "base.sqlite3"))
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=2, meses=3, semente=4)
+    base.gravar(lote[0]['esperados'], "B")
+    cadastro = CadastroUCs()
+    assert cadastro.sincronizar(base) == 1
+    base.gravar([d for item in lote[1:] for d in item['esperados']], "B")
+    assert cadastro.sincronizar(base) == 2 and len(cadastro) == 3
+    assert cadastro.sincronizar(base) == 0
+
+    esperado = lote[2]['esperados'][-1]
+    encontradas = [f.uc for f, _ in cadastro.buscar_endereco(esperado['endereco'], minimo=1.0)]
+    assert esperado['uc'] in encontradas
+    assert cadastro.ficha(esperado['uc']).titular == esperado['titular']
+
+
+def test_busca_em_milhares_de_ucs_leva_milissegundos():
+    cadastro = CadastroUCs()
+    ruas = ["RUA CEDROARANA", "AV. T-63", "RUA 24", "ALAMEDA DOS IPES", "RUA C-140"]
+    cadastro.atualizar(
+        _fatura(str(10**7 + i), "JAN", 2025, f"{ruas[i % 5]}, Q. {'ABCDE'[i // 5 % 5]} {i % 40}, L. {i % 30}", f"TITULAR {i}")
+        for i in range(20000)
+    )
+    inicio = time.perf_counter()
+    resultado = cadastro.buscar_endereco("R CEDROARANA QD A 10 LT 10")
+    assert time.perf_counter() - inicio < 0.05
+    assert resultado[0][1] == 1.0 and resultado[0][0].endereco.startswith("RUA CEDROARANA, Q. A 10, L. 10")
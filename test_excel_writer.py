@@ -1,21 +1,168 @@
-from services.excel_writer import escrever_uc_geradora
+from benchmarks.sintetico import gerar_lote
+from services.excel_writer import preparar_planilha, salvar_dados_multiplos
+from services.indice_meses import indexar_meses, linha_do_mes
+from services.pipeline import gerar_planilha
+
+MODELO = "BALANÇO_FINAL.xlsx"
 
 dados = {
     "mes": "JAN",
+    "ano": 2025,
     "data_leitura_anterior": "21/12/2024",
     "data_leitura_atual": "21/01/2025",
     "energia_gerada": 456.0,
     "credito_recebido": 436.0,
     "energia_ativa": 536,
     "valor_fatura": 154.04,
-    "saldo_kwh": 0.0,
+    "saldo": 0.0,
     "medidor": "13119425-9",
     "leitura_anterior": 15604,
     "leitura_atual": 16140,
+    "uc": "16676257",
+    "endereco": "RUA CEDROARANA, Q. E 3, L. 17",
 }
 
-escrever_uc_geradora(
-    "BALANÇO E COMPENSAÇÃO.xlsx",
-    dados
-)
 
+def _linha(ws, mes, ano=None):
+    return linha_do_mes(indexar_meses(ws, 5, 39, aceitar_data=False, texto_exato=True), mes, ano)
+
+
+def test_escreve_uc_geradora():
+    wb = preparar_planilha(MODELO, 1, 0)
+    salvar_dados_multiplos(wb, [{'tipo': 'geradora', 'indice': 1, 'dados': [dados]}])
+    ws = wb["UC GERADORA"]
+    linha = _linha(ws, "JAN", 2025)
+    assert linha
+    assert ws[f"I{linha}"].value == 456.0
+    assert ws[f"K{linha}"].value == 536
+    assert ws[f"R{linha}"].value == "13119425-9"
+
+
+def test_modelo_preparado_de_novo_sai_do_snapshot(monkeypatch):
+    from collections import OrderedDict
+    from services import modelo_planilha
+    monkeypatch.setattr(modelo_planilha, "_snapshots", OrderedDict())
+    preparar_planilha(MODELO, 1, 0)  # o modelo entra no cache e as abas são clonadas de um workbook restaurado
+    tempos = {}
+    frio = preparar_planilha(MODELO, 2, 3)
+    quente = preparar_planilha(MODELO, 2, 3, tempos=tempos)
+    assert tempos["clonagem"] == 0.0  # veio do snapshot
+    assert quente is not frio and quente.sheetnames == frio.sheetnames
+    for nome in ("UC GERADORA 2", "UC BENEF. 3"):
+        assert quente[nome].column_dimensions["A"].width == frio[nome].column_dimensions["A"].width
+    # Um workbook restaurado serve de novo: escreve e salva
+    salvar_dados_multiplos(quente, [{'tipo': 'geradora', 'indice': 2, 'dados': [dados]}])
+    assert modelo_planilha.salvar_planilha(preparar_planilha(MODELO, 2, 3))
+
+
+def test_lote_sintetico_grupo_b():
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=2, meses=12, semente=7)
+    estruturados = [
+        {'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote
+    ]
+    wb = gerar_planilha("B", MODELO, estruturados, 1, 2)
+    for item in lote:
+        aba = "UC GERADORA" if item['tipo'] == 'geradora' else f"UC BENEF. {item['indice']}"
+        ws = wb[aba]
+        for esperado in item['esperados']:
+            linha = _linha(ws, esperado["mes"], esperado["ano"])
+            assert ws[f"I{linha}"].value == esperado["energia_gerada"]
+            assert ws[f"B{linha}"].value == esperado["data_leitura_anterior"]
+
+
+def test_rastreio_do_pipeline():
+    from services.modelo_planilha import salvar_planilha
+    from services.rastreio import Rastreio
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=2, meses=3, semente=1)
+    estruturados = [
+        {'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote
+    ]
+    rastreio = Rastreio(grupo="B")
+    wb = gerar_planilha("B", MODELO, estruturados, 1, 2, rastreio=rastreio)
+    conteudo = salvar_planilha(wb, rastreio=rastreio)
+
+    etapas = {r['etapa']: r for r in rastreio.resumo()}
+    assert etapas['escrita_aba']['qtd'] == 3
+    assert {'carga', 'clonagem', 'gravacao'} <= set(etapas)
+    assert rastreio.mais_lentos('gravacao')[0]['bytes'] == len(conteudo)
+    assert '"contexto"' in rastreio.para_json()
+
+
+def test_linha_do_tempo_independe_da_ordem():
+    from services.linha_do_tempo import montar_linha_do_tempo
+    (item,) = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=12, semente=5)
+    faturas = item['esperados']
+    serie = montar_linha_do_tempo(faturas)
+    assert serie == montar_linha_do_tempo(faturas[::-1])
+    # 12 meses com fatura + o histórico do ano anterior, cada mês uma vez
+    assert len(serie) == len({(e['ano'], e['mes']) for e in serie}) == 24
+    assert all(e['fatura']["ano"] == 2025 for e in serie if e['fatura'])
+    # Reemissão do mesmo mês: vale a de leitura mais recente, qualquer que seja a ordem
+    reemitida = {**faturas[0], "valor_fatura": 1.0, "data_leitura_atual": "28/01/2025"}
+    for ordem in ([faturas[0], reemitida], [reemitida, faturas[0]]):
+        assert montar_linha_do_tempo(ordem)[-1]['fatura'] is reemitida
+
+    wbs = [gerar_planilha("B", MODELO, [{**item, 'dados': ordem}], 1, 0) for ordem in (faturas, faturas[::-1])]
+    valores = [list(wb["UC GERADORA"].iter_rows(values_only=True)) for wb in wbs]
+    assert valores[0] == valores[1]
+    ws = wbs[0]["UC GERADORA"]
+    # O consumo da própria fatura não é sobrescrito pelo histórico das faturas seguintes
+    for esperado in faturas:
+        assert ws[f"K{_linha(ws, esperado['mes'])}"].value == esperado["energia_ativa"]
+
+
+def test_streaming_igual_a_planilha_em_memoria(tmp_path, monkeypatch):
+    import io
+
+    import openpyxl
+
+    from benchmarks.sintetico import modelo_sintetico_A
+    from services.modelo_planilha import salvar_planilha
+    from services.pipeline import gerar_planilha_streaming
+
+    def _abas(arquivo):
+        wb = openpyxl.load_workbook(arquivo)
+        return {ws.title: (list(ws.iter_rows(values_only=True)), sorted(map(str, ws.merged_cells.ranges)))
+                for ws in wb}, wb.sheetnames
+
+    for grupo, modelo in (("B", MODELO), ("A", modelo_sintetico_A())):
+        lote = gerar_lote(grupo, qtd_geradoras=2, qtd_beneficiarias=4, meses=6, semente=3)
+        estruturados = [{'tipo': i['tipo'], 'indice': i['indice'], 'dados': i['esperados']} for i in lote]
+        # Uma beneficiária a mais que as UCs com fatura: a aba sai só com o modelo
+        esperado = _abas(io.BytesIO(salvar_planilha(gerar_planilha(grupo, modelo, estruturados, 2, 5))))
+        assert _abas(gerar_planilha_streaming(grupo, modelo, estruturados, 2, 5)) == esperado
+        destino = tmp_path / f"{grupo}.xlsx"
+        gerar_planilha_streaming(grupo, modelo, estruturados, 2, 5, destino=str(destino))
+        assert _abas(destino) == esperado
+        # openpyxl sem os internos do streaming: mesmo .xlsx, gravado do jeito comum
+        with monkeypatch.context() as m:
+            m.setattr("services.modelo_planilha.STREAMING_SUPORTADO", False)
+            assert _abas(gerar_planilha_streaming(grupo, modelo, estruturados, 2, 5)) == esperado
+
+
+def test_plano_de_escrita_resolve_mescladas_e_repetidas():
+    import openpyxl
+
+    from services.plano_escrita import PlanoEscrita, aplicar, diferencas
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.merge_cells("F7:H8")
+    ws["A1"] = "antigo"
+    plano = PlanoEscrita()
+    plano.adicionar(ws, 8, "G", "UC 1")        # célula mesclada: vai para F7
+    plano.adicionar(ws, 1, "A", "primeiro")
+    plano.adicionar(ws, 1, 1, "último")        # repetida: vale a última
+    plano.adicionar(ws, 3, "C", 10)
+    plano.adicionar("Inexistente", 1, "A", 0)
+
+    assert diferencas(wb, plano) == [
+        {'aba': ws.title, 'celula': "A1", 'atual': "antigo", 'novo': "último"},
+        {'aba': ws.title, 'celula': "C3", 'atual': None, 'novo': 10},
+        {'aba': ws.title, 'celula': "F7", 'atual': None, 'novo': "UC 1"},
+    ]
+    assert ws["A1"].value == "antigo" and (3, 3) not in ws._cells   # dry-run não grava nem cria células
+    assert aplicar(wb, plano) == 3
+    assert ws["F7"].value == "UC 1" and ws["A1"].value == "último"
+    assert diferencas(wb, plano) == []
+    assert plano.registros()[0] == {'aba': ws.title, 'celula': "G8", 'valor': "UC 1"}
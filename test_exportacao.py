@@ -0,0 +1,69 @@
+import io
+import time
+
+import pandas as pd
+
+from benchmarks.sintetico import gerar_lote, gerar_pdf
+from services.exportacao import exportar, formatos_disponiveis, tabela_faturas
+from services.incremental import SessaoIncremental
+from services.registros import compactar
+from services.tarefas import processar_balanco
+
+
+def _estruturados(lote):
+    return [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote]
+
+
+def test_uma_linha_por_uc_e_mes_com_postos_do_grupo_a():
+    lote = gerar_lote("A", qtd_geradoras=1, qtd_beneficiarias=2, meses=6, semente=8)
+    tabela = tabela_faturas(_estruturados(lote), "A")
+
+    assert not tabela.duplicated(['tipo', 'indice', 'competencia']).any()
+    assert {"c_p", "c_fp", "c_hr", "d_p", "d_fp", "d_hr"} <= set(tabela.columns)
+    assert "energia_ativa" not in tabela.columns
+    for item in lote:
+        linhas = tabela[(tabela['tipo'] == item['tipo']) & (tabela['indice'] == item['indice'])]
+        faturas = linhas[linhas['origem'] == "fatura"]
+        assert len(faturas) == len(item['esperados']) and set(linhas['uc']) == {item['esperados'][0]['uc']}
+        for esperado in item['esperados']:
+            linha = faturas[faturas['mes'] == esperado['mes']].iloc[0]
+            assert linha['c_fp'] == esperado['c_fp'] and linha['d_p'] == esperado['d_p']
+        # Meses só com histórico: consumo e demanda por posto, sem os campos da fatura
+        historico = linhas[linhas['origem'] == "historico"]
+        assert len(historico) and historico['c_p'].notna().all() and historico['valor_fatura'].isna().all()
+
+
+def test_grupo_b_csv_e_parquet():
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=1, meses=3, semente=9)
+    dados = _estruturados(lote)
+    dados[1]['dados'] = [compactar(d) for d in dados[1]['dados']]   # registros compactos também
+    tabela = tabela_faturas(dados, "B")
+    assert tabela.groupby(['tipo', 'indice'])['competencia'].apply(lambda c: c.is_monotonic_increasing).all()
+    esperado = lote[1]['esperados'][0]
+    linha = tabela[(tabela['tipo'] == "beneficiaria") & (tabela['mes'] == esperado['mes']) &
+                   (tabela['origem'] == "fatura")].iloc[0]
+    assert linha['energia_ativa'] == esperado['energia_ativa'] and linha['leitura_atual'] == esperado['leitura_atual']
+
+    lida = pd.read_csv(io.BytesIO(exportar(tabela, "csv")), sep=";", encoding="utf-8-sig", dtype={'uc': str})
+    assert lida['energia_ativa'].tolist() == tabela['energia_ativa'].tolist()
+    if "parquet" in formatos_disponiveis():
+        assert pd.read_parquet(io.BytesIO(exportar(tabela, "parquet"))).equals(tabela)
+
+
+def test_milhares_de_faturas_em_fracao_de_segundo():
+    lote = gerar_lote("A", qtd_geradoras=1, qtd_beneficiarias=249, meses=12, semente=1)
+    inicio = time.perf_counter()
+    conteudo = exportar(tabela_faturas(_estruturados(lote), "A"), "csv")
+    assert time.perf_counter() - inicio < 1.0
+    assert conteudo.count(b"\n") > 3000
+
+
+def test_tarefa_exporta_sem_modelo():
+    (item,) = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=2, semente=3)
+    pdfs = [io.BytesIO(gerar_pdf(texto)) for texto in item['textos']]
+    conteudo, detalhes = processar_balanco(
+        SessaoIncremental(), [{'tipo': 'geradora', 'indice': 1, 'arquivos': pdfs}], "B", None, 1, 0,
+        processos=1, formato="csv")
+    assert detalhes['extensao'] == "csv" and detalhes['info']['modo'] == 'exportacao'
+    tabela = pd.read_csv(io.BytesIO(conteudo), sep=";", encoding="utf-8-sig")
+    assert (tabela['origem'] == "fatura").sum() == 2 and detalhes['info']['linhas'] == len(tabela)
@@ -0,0 +1,241 @@
+from services.fatura_mapper import extrair_fatura as extrair_B
+from services.fatura_mapperA import extrair_fatura as extrair_A
+from benchmarks.legado_fatura_mapper import extrair_fatura as legado_B
+from benchmarks.legado_fatura_mapperA import extrair_fatura as legado_A
+
+with open("texto.txt", "r", encoding="utf-8") as f:
+    TEXTO = f.read()
+
+
+def test_fatura_grupo_b():
+    dados = extrair_B(TEXTO)
+    assert dados["uc"] == "16676257"
+    assert (dados["mes"], dados["ano"]) == ("DEZ", 2025)
+    assert dados["medidor"] == "13119425-9"
+    assert (dados["leitura_anterior"], dados["leitura_atual"]) == (20940, 21458)
+    assert dados["energia_ativa"] == 518.0
+    assert dados["energia_gerada"] == 608.0
+    assert dados["credito_recebido"] == 418.0
+    assert dados["valor_fatura"] == 141.32
+    assert dados["endereco"].startswith("RUA CEDROARANA, Q. E 3, L. 17")
+    # O "CNPJ/CPF:" do cabeçalho vem depois da tensão; o do canhoto só tem o nome antes
+    assert dados["titular"] == extrair_A(TEXTO)["titular"] == "DANIELA LONDE RABELO TAVEIRA"
+
+
+def _sem_campos_novos(dados):
+    # Campos extraídos depois da cópia congelada dos mappers
+    return {campo: valor for campo, valor in dados.items() if campo != "titular"}
+
+
+def _igual_ao_legado_B(texto):
+    novo, legado = _sem_campos_novos(extrair_B(texto)), legado_B(texto)
+    # O histórico só é lido depois do cabeçalho da tabela: o "DEZ/2025 14/01/2026" do
+    # cabeçalho da fatura deixou de virar um consumo de 14 kWh
+    assert legado['historico'][0] == {'mes': "DEZ", 'ano': 2025, 'consumo': 14.0}
+    assert novo.pop('historico') == legado.pop('historico')[1:]
+    assert novo == legado
+
+
+def test_motor_de_campos_igual_ao_legado():
+    _igual_ao_legado_B(TEXTO)
+    assert _sem_campos_novos(extrair_A(TEXTO)) == legado_A(TEXTO)
+    # Fallback da geração pelo bloco SCEE quando a linha de medição não existe
+    _igual_ao_legado_B(TEXTO.replace("ENERGIA GERAÇÃO - KWH ÚNICO", ""))
+
+
+def test_faturas_sinteticas():
+    from benchmarks.sintetico import gerar_lote
+    for grupo, extrair in (("A", extrair_A), ("B", extrair_B)):
+        for item in gerar_lote(grupo, qtd_geradoras=1, qtd_beneficiarias=2, meses=6, semente=3):
+            for texto, esperado in zip(item['textos'], item['esperados']):
+                dados = extrair(texto)
+                for campo, valor in esperado.items():
+                    if campo == "historico":
+                        assert dados[campo][-len(valor):] == valor
+                    else:
+                        assert dados[campo] == valor, (grupo, campo)
+
+
+def test_obrigatorios_encontrados():
+    from services.fatura_mapper import extrair_parcial
+    dados, faltando = extrair_parcial(TEXTO)
+    assert not faltando and dados == extrair_B(TEXTO)
+    # Sem a tabela de histórico e o total a leitura não pode parar
+    _, faltando = extrair_parcial(TEXTO[:TEXTO.find("TOTAL")])
+    assert "valor_fatura" in faltando
+
+
+def test_leitura_parcial_do_pdf():
+    import pytest
+    pytest.importorskip("reportlab")
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    from services.extracao import ler_ate_completar
+    item = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=1)[0]
+    texto, esperado = item['textos'][0], item['esperados'][0]
+
+    _, dados, tempos = ler_ate_completar(gerar_pdf(texto, paginas_extras=3), "B")
+    assert (tempos['paginas'], tempos['completo']) == (1, False)
+    assert dados["valor_fatura"] == esperado["valor_fatura"]
+
+    # Fatura sem o total: nunca fica completa, então lê todas as páginas
+    sem_total = "\n".join(l for l in texto.splitlines() if not l.startswith("TOTAL"))
+    _, _, tempos = ler_ate_completar(gerar_pdf(sem_total, paginas_extras=2), "B")
+    assert (tempos['paginas'], tempos['completo']) == (3, True)
+
+
+def test_scee_e_historico_na_segunda_pagina(monkeypatch):
+    from benchmarks.sintetico import gerar_lote
+    from services import extracao
+    item = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=1, semente=12)[0]
+    texto, esperado = item['textos'][0], item['esperados'][0]
+    linhas = texto.splitlines()
+    inicio, fim = next(i for i, l in enumerate(linhas) if l.startswith("INFORMAÇÕES DO SCEE")), \
+        next(i for i, l in enumerate(linhas) if l.startswith("TOTAL"))
+    # Cabeçalho com vencimento ("DEZ/2025 14/01/2026"), que também casa com o padrão do histórico
+    vencimento = f"{esperado['mes']}/{esperado['ano']} 14/01/2026 R$*********{esperado['valor_fatura']}"
+    primeira = "\n".join([vencimento] + linhas[:inicio] + linhas[fim:])
+    scee, tabela = linhas[inicio:inicio + 2], linhas[inicio + 2:fim]
+    # Páginas num iterador comum (sem close), como um leitor que não é gerador
+    monkeypatch.setattr(extracao, "paginas_pdf", lambda paginas, leitor=None: iter(paginas))
+
+    def _ler(*paginas):
+        _, dados, tempos = extracao.ler_ate_completar(list(paginas), "B")
+        return dados, tempos['paginas']
+
+    # SCEE e histórico na segunda página: a primeira não basta
+    dados, lidas = _ler(primeira, "\n".join(scee + tabela), "VERSO")
+    assert lidas == 2
+    assert (dados['credito_recebido'], dados['saldo']) == (esperado['credito_recebido'], esperado['saldo'])
+    assert dados['historico'] == esperado['historico']
+
+    # Histórico na primeira, só o bloco do SCEE na segunda: os itens "CONSUMO SCEE" o anunciam
+    dados, lidas = _ler(primeira + "\n" + "\n".join(scee[1:] + tabela), scee[0], "VERSO")
+    assert lidas == 2 and dados['credito_recebido'] == esperado['credito_recebido']
+
+    # Sem SCEE na fatura, crédito e saldo não seguram a leitura
+    dados, lidas = _ler(primeira + "\n" + "\n".join(tabela), "VERSO", "ANEXO")
+    assert lidas == 1 and dados['historico'] == esperado['historico']
+
+
+def test_leitores_de_pdf():
+    import pytest
+    pytest.importorskip("reportlab")
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    from services import leitores_pdf
+    from services.extracao import chave_cache, extrair_texto_pdf
+    item = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=1)[0]
+    pdf = gerar_pdf(item['textos'][0])
+    referencia = extrair_B(extrair_texto_pdf(pdf))
+    for leitor in leitores_pdf.disponiveis():
+        assert extrair_B(extrair_texto_pdf(pdf, leitor)) == referencia, leitor
+    assert chave_cache(pdf) == chave_cache(pdf, "pdfplumber") != chave_cache(pdf, "pdfium")
+    with pytest.raises(ValueError):
+        extrair_texto_pdf(pdf, "inexistente")
+
+
+def test_leitor_por_caminho_recebe_o_arquivo(tmp_path, monkeypatch):
+    from services import leitores_pdf
+    from services.extracao import processar_pdf
+    recebidos = []
+
+    def leitor(conteudo):
+        recebidos.append(conteudo)
+        yield TEXTO
+
+    monkeypatch.setitem(leitores_pdf.LEITORES, "pymupdf", (leitor, "fitz"))
+    monkeypatch.setitem(leitores_pdf.LEITORES, "pdfium", (leitor, "pypdfium2"))
+    caminho = tmp_path / "fatura.pdf"
+    caminho.write_bytes(b"%PDF-1.4")
+    # pymupdf abre o caminho (sem copiar o mmap para bytes); os demais leem o mmap
+    assert processar_pdf(str(caminho), "B", "pymupdf")[1] == extrair_B(TEXTO)
+    processar_pdf(str(caminho), "B", "pdfium")
+    assert recebidos[0] == str(caminho) and not isinstance(recebidos[1], (str, bytes))
+
+
+def test_deteccao_do_layout():
+    import types
+    from benchmarks.sintetico import gerar_lote
+    from services import extracao
+    texto_A = gerar_lote("A", qtd_geradoras=1, qtd_beneficiarias=0, meses=1)[0]['textos'][0]
+    assert extracao.classificar(TEXTO) == "B"
+    assert extracao.classificar(texto_A) == "A"
+    # Sem a linha "Classificação:", os marcadores de cada layout decidem
+    sem_linha = lambda t: "\n".join(l for l in t.splitlines() if not l.startswith("Classificação"))
+    assert extracao.classificar(sem_linha(TEXTO)) == "B"
+    assert extracao.classificar(sem_linha(texto_A)) == "A"
+    assert extracao.classificar("NOTA FISCAL SEM LAYOUT CONHECIDO") is None
+
+    # Layout novo do Grupo B: vence o genérico quando o marcador dele aparece
+    outra = types.SimpleNamespace(extrair_fatura=extrair_B, extrair_parcial=None, VERSAO_MAPPER="X-1",
+                                  MARCADORES=("DISTRIBUIDORA X",))
+    extracao.registrar_layout("X", "B", outra)
+    try:
+        assert extracao.classificar(TEXTO + "\nDISTRIBUIDORA X S/A") == "X"
+        assert extracao.classificar(TEXTO) == "B"
+        assert extracao.versao_cache(extracao.AUTO).endswith("X=X-1")
+    finally:
+        for registro in (extracao.MAPPERS, extracao.VERSOES, extracao.PARCIAIS,
+                         extracao.GRUPO_DO_LAYOUT, extracao.MARCADORES, extracao.MODULOS):
+            registro.pop("X")
+
+
+def test_lote_misto_detectado():
+    import pytest
+    pytest.importorskip("reportlab")
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    from services.extracao import AUTO, extrair_lote, grupo_predominante, separar_grupo
+    lote_A = gerar_lote("A", qtd_geradoras=1, qtd_beneficiarias=0, meses=1)[0]
+    lote_B = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=2)[0]
+    pdfs = [gerar_pdf(t) for t in lote_B['textos'] + lote_A['textos']]
+    (item,) = extrair_lote([{'tipo': 'geradora', 'indice': 1, 'arquivos': pdfs}], AUTO, max_workers=1)
+
+    assert [d['layout'] for d in item['dados']] == ["B", "B", "A"]
+    assert item['dados'][2] == {**extrair_A(lote_A['textos'][0]), 'layout': "A"}
+    assert grupo_predominante([item]) == "B"
+    (filtrado,), fora = separar_grupo([item], "B")
+    assert len(filtrado['dados']) == 2 and fora == [(0, 2, "A")]
+
+
+def test_lote_no_pool_na_ordem_de_entrada(monkeypatch):
+    import threading
+    import pytest
+    pytest.importorskip("reportlab")
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    from services import extracao
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=1, meses=3, semente=11)
+    entrada = [{'tipo': item['tipo'], 'indice': item['indice'], 'arquivos': [gerar_pdf(t) for t in item['textos']]}
+               for item in lote]
+    # Dois processos mesmo numa máquina de um núcleo
+    monkeypatch.setattr(extracao, "PDFS_ABERTOS", 2)
+    monkeypatch.setattr(extracao, "_vagas_pdf", threading.BoundedSemaphore(2))
+    chamadas = []
+    lidos = extracao.extrair_lote(entrada, "B", max_workers=2,
+                                  ao_concluir=lambda feitos, total, item: chamadas.append((feitos, total)))
+
+    assert [(i['tipo'], i['indice']) for i in lidos] == [(i['tipo'], i['indice']) for i in lote]
+    for lido, item in zip(lidos, lote):
+        assert [(d['uc'], d['mes'], d['valor_fatura']) for d in lido['dados']] == \
+               [(e['uc'], e['mes'], e['valor_fatura']) for e in item['esperados']]
+    assert chamadas == [(n, 6) for n in range(1, 7)]
+
+
+def test_lote_em_disco_igual_ao_em_memoria(tmp_path, monkeypatch):
+    import threading
+    import pytest
+    pytest.importorskip("reportlab")
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    from services import extracao
+    from services.ingestao import PastaEnvio
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=3, semente=6)[0]
+    pdfs = [gerar_pdf(t, paginas_extras=1) for t in lote['textos']]
+    pasta = PastaEnvio(str(tmp_path))
+    em_disco = [pasta.gravar(pdf, f"{i}.pdf") for i, pdf in enumerate(pdfs)]
+
+    (em_memoria,) = extracao.extrair_lote([{'tipo': 'geradora', 'indice': 1, 'arquivos': pdfs}], "B", max_workers=1)
+    # Dois processos, mas um único PDF aberto por vez: os caminhos vão para o pool e são mapeados lá
+    vagas = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(extracao, "_vagas_pdf", vagas)
+    (lido,) = extracao.extrair_lote([{'tipo': 'geradora', 'indice': 1, 'arquivos': em_disco}], "B", max_workers=2)
+    assert lido['dados'] == em_memoria['dados']
+    assert [d['valor_fatura'] for d in lido['dados']] == [e['valor_fatura'] for e in lote['esperados']]
+    assert vagas.acquire(blocking=False)  # todas as vagas devolvidas
@@ -0,0 +1,59 @@
+import io
+
+import openpyxl
+
+from benchmarks.sintetico import gerar_lote, modelo_sintetico_A
+from services.incremental import SessaoIncremental
+from services.modelo_planilha import salvar_planilha
+from services.pipeline import gerar_planilha
+
+
+def _valores(conteudo):
+    wb = openpyxl.load_workbook(io.BytesIO(conteudo))
+    return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb}
+
+
+def _estruturados(lote, meses):
+    return [{'tipo': i['tipo'], 'indice': i['indice'], 'dados': i['esperados'][:meses]} for i in lote]
+
+
+def _conferir(grupo, modelo):
+    lote = gerar_lote(grupo, qtd_geradoras=1, qtd_beneficiarias=2, meses=6, semente=11)
+    sessao = SessaoIncremental()
+
+    _, info = sessao.gerar(grupo, modelo, _estruturados(lote, 3), 1, 2)
+    assert info['modo'] == 'completa'
+
+    # Uma beneficiária ganha faturas: só ela (e o RESUMO) é regravada
+    dados = _estruturados(lote, 3)
+    dados[2]['dados'] = lote[2]['esperados']
+    conteudo, info = sessao.gerar(grupo, modelo, dados, 1, 2)
+    assert info['modo'] == 'incremental' and info['ucs_regravadas'] == 1
+    assert _valores(conteudo) == _valores(salvar_planilha(gerar_planilha(grupo, modelo, dados, 1, 2)))
+
+    assert sessao.gerar(grupo, modelo, dados, 1, 2) == (conteudo, {**info, 'modo': 'reaproveitada', 'ucs_regravadas': 0})
+
+    # Fatura removida: não dá para "desescrever", gera do zero
+    dados[0]['dados'] = dados[0]['dados'][1:]
+    _, info = sessao.gerar(grupo, modelo, dados, 1, 2)
+    assert info['modo'] == 'completa'
+
+
+def test_muitas_ucs_gravadas_em_streaming(monkeypatch):
+    monkeypatch.setattr("services.pipeline.UCS_STREAMING", 3)
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=2, meses=3, semente=2)
+    sessao = SessaoIncremental()
+    saida, info = sessao.gerar("B", "BALANÇO_FINAL.xlsx", _estruturados(lote, 3), 1, 2)
+    assert info['modo'] == 'streaming' and hasattr(saida, "read")
+    assert _valores(saida.read()) == _valores(
+        salvar_planilha(gerar_planilha("B", "BALANÇO_FINAL.xlsx", _estruturados(lote, 3), 1, 2)))
+    # Nada fica guardado para reaproveitar
+    assert sessao.gerar("B", "BALANÇO_FINAL.xlsx", _estruturados(lote, 3), 1, 2)[1]['modo'] == 'streaming'
+
+
+def test_incremental_grupo_b():
+    _conferir("B", "BALANÇO_FINAL.xlsx")
+
+
+def test_incremental_grupo_a():
+    _conferir("A", modelo_sintetico_A())
@@ -0,0 +1,32 @@
+import datetime
+
+import openpyxl
+
+from services.indice_meses import ano_completo, indexar_meses, linha_do_mes
+
+
+def _aba(valores):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for linha, valor in enumerate(valores, start=5):
+        ws.cell(linha, 1, valor)
+    return ws
+
+
+def test_meses_em_texto():
+    ws = _aba(["Jan", "Fev", "Março", "Abr"])
+    exato = indexar_meses(ws, 5, 40, aceitar_data=False, texto_exato=True)
+    flexivel = indexar_meses(ws, 5, 40)
+    assert linha_do_mes(exato, "FEV", 2025) == 6
+    assert linha_do_mes(exato, "MAR") is None  # "Março" não é o nome exato do modelo
+    assert linha_do_mes(flexivel, "MAR", 24) == 7
+
+
+def test_meses_em_data_respeitam_o_ano():
+    ws = _aba([datetime.datetime(2024, 12, 1), datetime.datetime(2025, 12, 1)])
+    indice = indexar_meses(ws, 5, 40, aceitar_texto=False)
+    assert linha_do_mes(indice, "DEZ", "25") == 6
+    assert linha_do_mes(indice, 12, 2024) == 5
+    # Sem o ano exato na planilha, cai na primeira linha do mês (comportamento anterior)
+    assert linha_do_mes(indice, "DEZ", 2030) == 5
+    assert ano_completo("00") is None
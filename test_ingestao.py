@@ -0,0 +1,67 @@
+import gc
+import io
+import os
+import zipfile
+
+from benchmarks.sintetico import gerar_lote
+from services.ingestao import ArquivoEmDisco, PastaEnvio, ler_envio, rotear_por_uc
+
+
+def _zip(arquivos):
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w") as zf:
+        for nome, conteudo in arquivos.items():
+            zf.writestr(nome, conteudo)
+    saida.seek(0)
+    saida.name = "faturas.zip"
+    return saida
+
+
+def test_ler_envio_zip_e_pdf_solto():
+    solto = io.BytesIO(b"%PDF solto")
+    solto.name = "avulsa.pdf"
+    pdfs = ler_envio([_zip({
+        "cliente/ger/jan.pdf": b"%PDF 1", "cliente/ben/fev.PDF": b"%PDF 2",
+        "cliente/leia-me.txt": b"x", "__MACOSX/cliente/._jan.pdf": b"lixo",
+    }), solto])
+    assert [p.name for p in pdfs] == ["faturas.zip/cliente/ger/jan.pdf", "faturas.zip/cliente/ben/fev.PDF", "avulsa.pdf"]
+    assert pdfs[1].getvalue() == b"%PDF 2"
+
+
+
+def test_envio_em_disco(tmp_path):
+    pasta = PastaEnvio(str(tmp_path))
+    solto = io.BytesIO(b"%PDF solto")
+    solto.name = "avulsa.pdf"
+    # ZIP já gravado em disco (congelado pela tarefa): os PDFs dele vão para a mesma pasta
+    envio = [pasta.gravar(_zip({"jan.pdf": b"%PDF 1", "fev.pdf": b"%PDF 2"})), solto]
+    pdfs = ler_envio(envio, pasta)
+    assert [p.name for p in pdfs] == ["faturas.zip/jan.pdf", "faturas.zip/fev.pdf", "avulsa.pdf"]
+    assert all(isinstance(p, ArquivoEmDisco) and os.path.dirname(p.caminho) == pasta.caminho for p in pdfs)
+    assert pdfs[1].getvalue() == b"%PDF 2" and pdfs[2].tamanho == len(b"%PDF solto")
+
+    # A pasta vive enquanto algum arquivo dela estiver em uso
+    caminho = pasta.caminho
+    del pasta, envio
+    gc.collect()
+    assert os.path.isdir(caminho)
+    del pdfs
+    gc.collect()
+    assert not os.path.exists(caminho)
+
+
+def test_rotear_por_uc():
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=2, meses=3, semente=4)
+    # Envio embaralhado: faturas de todas as UCs misturadas e fora de ordem, mais um PDF ilegível
+    faturas = [d for item in lote for d in reversed(item['esperados'])][::-1] + [{"uc": ""}]
+    arquivos = [io.BytesIO() for _ in faturas]
+    for i, arquivo in enumerate(arquivos):
+        arquivo.name = f"{i}.pdf"
+
+    dados, ucs, ignorados = rotear_por_uc(arquivos, faturas)
+    assert ignorados == [f"{len(faturas) - 1}.pdf"]
+    assert [(d['tipo'], d['indice']) for d in dados] == [('geradora', 1), ('beneficiaria', 1), ('beneficiaria', 2)]
+    assert ucs[0]['uc'] == lote[0]['esperados'][0]['uc']
+    assert sorted(u['uc'] for u in ucs[1:]) == [u['uc'] for u in ucs[1:]]
+    for item in dados:
+        assert [d['mes'] for d in item['dados']] == ["JAN", "FEV", "MAR"]
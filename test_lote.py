@@ -0,0 +1,58 @@
+import json
+import os
+
+import openpyxl
+import pytest
+
+pytest.importorskip("reportlab")
+
+import processar_lote
+from benchmarks.sintetico import gerar_lote, gerar_pdf
+from services.lote import descobrir_clientes, processar_cliente
+
+MODELO = os.path.abspath("BALANÇO_FINAL.xlsx")
+
+
+def _entrada(pasta, semente=9):
+    """<pasta>/Cliente Solar/<geradora_1 | beneficiaria_1>/*.pdf, com um PDF corrompido na geradora."""
+    for item in gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=1, meses=2, semente=semente):
+        pasta_uc = pasta / "Cliente Solar" / f"{item['tipo']}_{item['indice']}"
+        pasta_uc.mkdir(parents=True)
+        for mes, texto in enumerate(item['textos'], start=1):
+            (pasta_uc / f"{mes:02d}.pdf").write_bytes(gerar_pdf(texto))
+    (pasta / "Cliente Solar" / "geradora_1" / "03.pdf").write_bytes(b"%PDF-1.4 truncado")
+    return str(pasta)
+
+
+def test_processar_cliente_segue_apos_fatura_com_erro(tmp_path):
+    (cliente,) = descobrir_clientes(_entrada(tmp_path / "entrada"), "B", MODELO)
+    assert [(uc['tipo'], len(uc['arquivos'])) for uc in cliente['ucs']] == [('geradora', 3), ('beneficiaria', 2)]
+    saida, cache = str(tmp_path / "saida"), str(tmp_path / "cache")
+    os.makedirs(saida)
+
+    resumo = processar_cliente(cliente, saida, diretorio_cache=cache)
+    assert resumo['erro'] is None
+    assert resumo['saida'] == os.path.join(saida, "BALANCO_COMPENSAÇÃO_GRUPO_B_Cliente_Solar.xlsx")
+    assert resumo['ucs'] == {'geradoras': 1, 'beneficiarias': 1}
+    falhas = [a for a in resumo['arquivos'] if a.get('erro')]
+    assert [os.path.basename(a['arquivo']) for a in falhas] == ["03.pdf"]
+    lidas = [a for a in resumo['arquivos'] if not a.get('erro')]
+    assert [a['mes'] for a in lidas] == ["JAN", "FEV", "JAN", "FEV"]
+    assert {"UC GERADORA", "UC BENEF. 1"} <= set(openpyxl.load_workbook(resumo['saida']).sheetnames)
+
+    # De novo, com o cache: os PDFs válidos não são relidos e o corrompido continua com erro
+    de_novo = processar_cliente(cliente, saida, diretorio_cache=cache)
+    assert [a.get('cache') for a in de_novo['arquivos'] if not a.get('erro')] == [True] * 4
+    assert sum(1 for a in de_novo['arquivos'] if a.get('erro')) == 1
+
+
+def test_cli_grava_resumo_do_lote(tmp_path):
+    entrada, saida = _entrada(tmp_path / "entrada"), str(tmp_path / "saida")
+    codigo = processar_lote.main(["--entrada", entrada, "--grupo", "B", "--modelo", MODELO,
+                                  "--saida", saida, "--processos", "1"])
+    assert codigo == 0  # fatura com erro não derruba o cliente
+    with open(os.path.join(saida, "resumo_lote.json"), encoding="utf-8") as f:
+        resumo = json.load(f)
+    assert (resumo['total_clientes'], resumo['clientes_com_erro']) == (1, 0)
+    assert (resumo['total_faturas'], resumo['faturas_com_erro']) == (5, 1)
+    assert os.path.exists(resumo['clientes'][0]['saida'])
@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+
+from benchmarks.sintetico import gerar_lote
+from services.rateio import SeriesRateio, agrupar_por_uc, calcular_rateio, compensacao, montar_series
+
+
+def test_compensacao_igual_a_simulacao_mes_a_mes():
+    rng = np.random.default_rng(1)
+    alocado, consumo, saldo = rng.uniform(0, 10, (6, 24)), rng.uniform(0, 10, (6, 24)), rng.uniform(0, 5, 6)
+    compensado, saldo_final = compensacao(alocado, consumo, saldo)
+    for u in range(6):
+        credito, total = saldo[u], 0.0
+        for t in range(24):
+            usado = min(credito + alocado[u, t], consumo[u, t])
+            credito, total = credito + alocado[u, t] - usado, total + usado
+        assert np.isclose(total, compensado[u]) and np.isclose(credito, saldo_final[u])
+
+
+def test_rateio_das_faturas_sinteticas():
+    lote = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=4, meses=12, semente=5)
+    por_uc, geradoras = agrupar_por_uc(
+        [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': item['esperados']} for item in lote])
+    series = montar_series(por_uc, geradoras)
+    assert series.consumo.shape == (5, 12) and series.geradora.sum() == 1
+
+    tabela, resumo = calcular_rateio(series, passo=0.001)
+    for coluna in ("percentual_proporcional", "percentual_otimo"):
+        assert np.isclose(tabela[coluna].sum(), 100)
+        assert np.allclose(tabela[coluna] * 10, np.round(tabela[coluna] * 10))
+    assert resumo['nao_compensado_otimo_kwh'] <= resumo['nao_compensado_proporcional_kwh'] + 1e-6
+
+
+def test_centenas_de_ucs_em_varios_anos_em_menos_de_um_segundo():
+    rng = np.random.default_rng(0)
+    ucs, meses = 300, 72
+    consumo = rng.uniform(50, 800, (ucs, meses))
+    sazonal = 1 + 0.3 * np.sin(np.arange(meses) / 12 * 2 * np.pi)
+    series = SeriesRateio(
+        ucs=[str(u) for u in range(ucs)], geradora=np.zeros(ucs, bool), competencias=list(range(meses)),
+        consumo=consumo, credito=np.zeros((ucs, meses)),
+        geracao=consumo.sum() * 0.9 / meses * sazonal, saldo_atual=np.zeros(ucs),
+    )
+    inicio = time.perf_counter()
+    tabela, resumo = calcular_rateio(series, passo=0.001)
+    assert time.perf_counter() - inicio < 1.0
+    assert np.isclose(tabela['percentual_otimo'].sum(), 100)
+    assert resumo['nao_compensado_otimo_kwh'] < resumo['nao_compensado_proporcional_kwh']
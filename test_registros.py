@@ -0,0 +1,36 @@
+from benchmarks.sintetico import gerar_lote
+from services.excel_writer import preparar_planilha, salvar_dados_multiplos
+from services.extracao import MAPPERS
+from services.incremental import CacheSessao
+from services.registros import FaturaA, FaturaB, compactar, expandir
+
+
+def test_registros_voltam_identicos():
+    for grupo, classe in (("A", FaturaA), ("B", FaturaB)):
+        for texto in gerar_lote(grupo, qtd_geradoras=1, qtd_beneficiarias=0, meses=3)[0]['textos']:
+            for dados in (MAPPERS[grupo](texto), {**MAPPERS[grupo](texto), 'layout': grupo}):
+                registro = compactar(dados)
+                assert isinstance(registro, classe) and registro.ano == 2025
+                assert expandir(registro) == dados
+                assert registro.get("uc") == dados["uc"] and registro.get("ano") == dados["ano"]
+
+    # Fora do formato dos mappers: segue como dicionário
+    assert compactar({'layout': None}) == {'layout': None}
+    dados = MAPPERS["B"](gerar_lote("B", 1, 0, 1)[0]['textos'][0])
+    dados["historico"][0]["consumo"] = 518  # int: não voltaria idêntico de um array("d")
+    assert compactar(dados) is dados
+
+
+def test_writers_e_cache_aceitam_registros():
+    (item,) = gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=0, meses=4)
+    faturas = [MAPPERS["B"](texto) for texto in item['textos']]
+    planilhas = []
+    for dados in (faturas, [compactar(d) for d in faturas]):
+        wb = preparar_planilha("BALANÇO_FINAL.xlsx", 1, 0)
+        salvar_dados_multiplos(wb, [{'tipo': 'geradora', 'indice': 1, 'dados': dados}])
+        planilhas.append(list(wb["UC GERADORA"].iter_rows(values_only=True)))
+    assert planilhas[0] == planilhas[1]
+
+    cache = CacheSessao()
+    cache.guardar("pdf", "B-1", None, faturas[0])
+    assert cache.obter_dados("pdf", "B-1") == faturas[0]
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from services.tarefas import CONCLUIDA, ERRO, EXECUTANDO, FilaTarefas
+
+
+def _esperar(fila, id_tarefa, limite=10):
+    fim = time.time() + limite
+    while time.time() < fim:
+        status = fila.status(id_tarefa)
+        if status['estado'] in (CONCLUIDA, ERRO):
+            return status
+        time.sleep(0.02)
+    raise AssertionError("tarefa não terminou")
+
+
+def _tarefa(valor, progresso=None):
+    progresso(0.5, "metade")
+    return valor, {'tamanho': len(valor)}
+
+
+def _falha(progresso=None):
+    raise ValueError("modelo inválido")
+
+
+def test_fila_conclui_e_persiste(tmp_path):
+    fila = FilaTarefas(str(tmp_path), max_simultaneas=1)
+    ok = fila.submeter(_tarefa, b"xlsx", descricao="teste")
+    erro = fila.submeter(_falha)
+    assert _esperar(fila, ok)['detalhes'] == {'tamanho': 4}
+    assert fila.resultado(ok) == b"xlsx"
+    assert "modelo inválido" in _esperar(fila, erro)['mensagem']
+    fila.encerrar()
+
+    # Outra instância (ex.: servidor reiniciado) enxerga o resultado em disco
+    outra = FilaTarefas(str(tmp_path))
+    assert outra.status(ok)['estado'] == CONCLUIDA
+    assert outra.resultado(ok) == b"xlsx"
+    outra.encerrar()
+
+
+def test_resultado_em_arquivo(tmp_path):
+    import tempfile
+
+    def _em_arquivo(progresso=None):
+        saida = tempfile.SpooledTemporaryFile(max_size=4)
+        saida.write(b"xlsx grande")
+        saida.seek(0)
+        return saida, {}
+
+    fila = FilaTarefas(str(tmp_path), max_simultaneas=1)
+    id_tarefa = fila.submeter(_em_arquivo)
+    assert _esperar(fila, id_tarefa)['estado'] == CONCLUIDA
+    assert fila.tem_resultado(id_tarefa) and fila.resultado(id_tarefa) == b"xlsx grande"
+    assert not fila.tem_resultado("inexistente")
+    # Resultado com outra extensão (exportação CSV/Parquet)
+    csv = fila.submeter(lambda progresso=None: (b"uc;mes\n", {'extensao': 'csv'}))
+    assert _esperar(fila, csv)['arquivo'] == "resultado.csv" and fila.resultado(csv) == b"uc;mes\n"
+    fila.encerrar()
+
+
+def test_concorrencia_limitada(tmp_path):
+    fila = FilaTarefas(str(tmp_path), max_simultaneas=1)
+    liberar = threading.Event()
+
+    def _bloqueada(progresso=None):
+        liberar.wait(5)
+        return b"", {}
+
+    primeira = fila.submeter(_bloqueada)
+    segunda = fila.submeter(_bloqueada)
+    time.sleep(0.1)
+    assert fila.status(primeira)['estado'] == EXECUTANDO
+    assert fila.status(segunda)['estado'] == "na_fila"
+
+    # Reinício com tarefas pendentes: ficam marcadas como interrompidas
+    reiniciada = FilaTarefas(str(tmp_path))
+    assert reiniciada.status(segunda)['estado'] == ERRO
+    liberar.set()
+    fila.encerrar()
+    reiniciada.encerrar()
+
+
+def test_tarefas_vencidas_expiram_com_o_servidor_no_ar(tmp_path):
+    import os
+    fila = FilaTarefas(str(tmp_path), max_simultaneas=1, validade_horas=0.2 / 3600, intervalo_limpeza_s=0)
+    antiga = fila.submeter(_tarefa, b"xlsx")
+    _esperar(fila, antiga)
+    time.sleep(0.3)
+    nova = fila.submeter(_tarefa, b"xlsx")  # submeter também faz a limpeza
+    assert fila.status(antiga) is None and not os.path.exists(tmp_path / antiga)
+    assert antiga not in fila._status
+    assert os.path.exists(tmp_path / nova)
+    fila.encerrar()
+
+
+def test_id_que_nao_e_de_tarefa(tmp_path):
+    fila = FilaTarefas(str(tmp_path / "tarefas"))
+    (tmp_path / "status.json").write_text('{"estado": "concluida"}')
+    for id_tarefa in ("..", "../tarefas", "0" * 31, "A" * 32, "", "0" * 32):
+        assert fila.status(id_tarefa) is None
+        assert not fila.tem_resultado(id_tarefa) and fila.resultado(id_tarefa) is None
+    fila.encerrar()
+
+
+def test_app_sobe_sem_openpyxl_pandas_nem_pdfplumber():
+    # Os módulos que o app.py importa no topo; os pesados só quando o processamento começa
+    from benchmarks.bench_app import medir_importacao, modulos_do_app
+    assert medir_importacao(modulos_do_app())['pesados'] == []
+
+
+def test_envio_em_massa_em_csv_sem_openpyxl(tmp_path):
+    import subprocess
+    import sys
+    import pytest
+    pytest.importorskip("reportlab")
+    from benchmarks.sintetico import gerar_lote, gerar_pdf
+    from services.exportacao import formatos_disponiveis
+    if "csv" not in formatos_disponiveis():
+        pytest.skip("exportação requer pandas")
+    for item in gerar_lote("B", qtd_geradoras=1, qtd_beneficiarias=1, meses=1, semente=4):
+        (tmp_path / f"{item['tipo']}.pdf").write_bytes(gerar_pdf(item['textos'][0]))
+    # Interpretador novo: nada importado antes pelos outros testes
+    codigo = (
+        "import glob, sys\n"
+        "from services.incremental import SessaoIncremental\n"
+        "from services.tarefas import congelar_envio, processar_envio_em_massa\n"
+        f"arquivos = [open(p, 'rb') for p in sorted(glob.glob({str(tmp_path)!r} + '/*.pdf'))]\n"
+        "conteudo, detalhes = processar_envio_em_massa(SessaoIncremental(), congelar_envio(arquivos), 'B', None,\n"
+        "                                              processos=1, formato='csv')\n"
+        "print(len(detalhes['ucs']), 'openpyxl' in sys.modules, 'services.pipeline' in sys.modules)\n"
+    )
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    assert saida.stdout.split() == ["2", "False", "False"]
+
@@ -0,0 +1,58 @@
+import io
+import mmap
+from contextlib import contextmanager
+
+
+def ler_bytes(arquivo) -> bytes:
+    """Aceita bytes, UploadedFile do Streamlit (ou qualquer file-like) e caminhos."""
+    if isinstance(arquivo, (bytes, bytearray)):
+        return bytes(arquivo)
+    if hasattr(arquivo, "getvalue"):
+        return arquivo.getvalue()
+    if hasattr(arquivo, "read"):
+        return arquivo.read()
+    with open(arquivo, "rb") as f:
+        return f.read()
+
+
+@contextmanager
+def mapear(caminho):
+    """
+    Conteúdo do arquivo mapeado em memória (mmap, só leitura). As páginas vêm do disco
+    conforme são lidas e ficam no cache do sistema, fora do heap do processo. Arquivo
+    vazio (não mapeável) vem como b"".
+    """
+    with open(caminho, "rb") as f:
+        try:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""
+            return
+        with mapa:
+            yield mapa
+
+
+class LeituraMapeada(io.RawIOBase):
+    """File-like (read/seek/tell) sobre um mmap, para bibliotecas que exigem um io.IOBase."""
+
+    def __init__(self, mapa):
+        super().__init__()
+        self.mapa = mapa
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        dados = self.mapa.read(len(destino))
+        destino[:len(dados)] = dados
+        return len(dados)
+
+    def seek(self, posicao, referencia=io.SEEK_SET):
+        self.mapa.seek(posicao, referencia)
+        return self.mapa.tell()
+
+    def tell(self):
+        return self.mapa.tell()
@@ -0,0 +1,54 @@
+"""Trechos de interface e recursos comuns às páginas (rateio, balanço, titularidade)."""
+import streamlit as st
+
+from services.extracao import AUTO, extrair_lote
+from services.ingestao import PastaEnvio, ler_envio, rotear_por_uc
+from services.rateio import agrupar_por_uc
+# Os mesmos recursos do app.py (uma base e um cache por servidor)
+from utils.recursos import obter_base_faturas, obter_cache_faturas, obter_cadastro_ucs
+
+
+def _ler_envio(arquivos) -> tuple:
+    """({uc: faturas}, geradoras, arquivos ignorados) de um envio de PDFs/ZIPs."""
+    # Em disco: a extração mapeia um PDF por vez; a pasta some com a lista
+    pdfs = ler_envio(arquivos, PastaEnvio())
+    with st.spinner(f"Lendo {len(pdfs)} faturas..."):
+        (lido,) = extrair_lote([{'tipo': 'envio', 'indice': 1, 'arquivos': pdfs}], AUTO,
+                               cache=obter_cache_faturas())
+    dados_estruturados, _, ignorados = rotear_por_uc(pdfs, lido['dados'])
+    return (*agrupar_por_uc(dados_estruturados), ignorados)
+
+
+def escolher_faturas() -> tuple:
+    """
+    Origem das faturas da página: a base local (UCs e período) ou um envio de PDFs/ZIPs
+    lido na hora (grupo detectado pela fatura). Devolve ({uc: faturas}, geradoras), com
+    geradoras None quando vêm da base (a UC com geração é a geradora).
+    O envio lido fica na sessão, pelos ids dos uploads: mudar um parâmetro da página
+    não copia, nem relê os PDFs de novo.
+    """
+    origem = st.radio("Origem das faturas", ["Base de faturas", "Envio de PDFs/ZIP"], horizontal=True)
+    faturas_por_uc, geradoras = {}, None
+
+    if origem == "Base de faturas":
+        base = obter_base_faturas()
+        ucs_guardadas = base.ucs()
+        if not ucs_guardadas:
+            st.info("A base ainda não tem faturas. Processe um balanço ou envie os PDFs aqui.")
+        ucs = st.multiselect("UCs", ucs_guardadas, default=ucs_guardadas)
+        coluna_de, coluna_ate = st.columns(2)
+        de = coluna_de.number_input("De (AAAAMM)", min_value=0, value=0, step=1)
+        ate = coluna_ate.number_input("Até (AAAAMM)", min_value=0, value=0, step=1)
+        for dados in base.consultar(ucs=ucs, de=de or None, ate=ate or None):
+            faturas_por_uc.setdefault(dados["uc"], []).append(dados)
+    else:
+        arquivos = st.file_uploader("Faturas (PDFs ou ZIPs)", type=["pdf", "zip"], accept_multiple_files=True)
+        if arquivos:
+            ids = tuple(arquivo.file_id for arquivo in arquivos)
+            lido = st.session_state.get("envio_paginas")
+            if lido is None or lido[0] != ids:
+                lido = st.session_state["envio_paginas"] = (ids, *_ler_envio(arquivos))
+            _, faturas_por_uc, geradoras, ignorados = lido
+            if ignorados:
+                st.warning("Arquivos sem número de UC reconhecido (ignorados): " + ", ".join(ignorados))
+    return faturas_por_uc, geradoras
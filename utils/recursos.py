@@ -0,0 +1,50 @@
+"""
+Recursos do servidor, compartilhados por todas as sessões e páginas (st.cache_resource).
+
+Ficam num módulo e não no script da página: o Streamlit executa o app.py inteiro a cada
+rerun e refaria os decoradores, e app e páginas teriam cada um a sua instância da base
+e do cache. Nada aqui importa openpyxl, pandas ou pdfplumber: os writers, a exportação
+e os leitores de PDF só são carregados quando um processamento começa.
+"""
+import os
+
+import streamlit as st
+
+from services.base_faturas import BaseFaturas
+from services.cache_faturas import CacheFaturas
+from services.cadastro_ucs import CadastroUCs
+from services.tarefas import FilaTarefas
+from utils.arquivos import ler_bytes
+
+LOGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo3.png")
+
+
+@st.cache_resource
+def obter_cache_faturas():
+    # Reenvios do mesmo PDF não passam pelo pdfplumber
+    return CacheFaturas()
+
+
+@st.cache_resource
+def obter_base_faturas():
+    # Faturas já extraídas, por UC e competência: completa meses sem PDF novo
+    return BaseFaturas()
+
+
+@st.cache_resource
+def obter_cadastro_ucs():
+    # Cada página o sincroniza com a base antes de usar
+    return CadastroUCs()
+
+
+@st.cache_resource
+def obter_fila_tarefas():
+    # Uma fila por servidor: o limite de processamentos simultâneos vale para todos os usuários
+    return FilaTarefas(max_simultaneas=int(os.environ.get("BALANCO_TAREFAS_SIMULTANEAS", 2)))
+
+
+@st.cache_resource
+def obter_logo() -> bytes:
+    """Logo (sidebar e ícone da aba) lido uma vez por processo, não a cada rerun."""
+    return ler_bytes(LOGO)
+